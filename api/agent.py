@@ -2,10 +2,17 @@ import os
 import requests
 import json
 import logging
-import urllib.parse
 import time
 from datetime import datetime
 
+import context_providers
+import event_ranker
+import intent_router
+import penny_client
+import reply_cache
+import session_store
+import telemetry
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,15 +22,20 @@ def main(req):
     Azure Function to proxy requests to Penny Hugging Face Space.
     Handles Gradio API format conversion and queue management.
     Also detects weather queries and fetches weather data.
+    Send "stream": true (SSE) or "stream": "ndjson" to receive the reply as it is generated.
+    "history" is optional when a session_id is sent; the server keeps the conversation.
+    Per-stage timings are returned in the Server-Timing header ("timings": true adds them to the body).
     """
+    timer = telemetry.StageTimer("agent")
     try:
         # Get request body
         body = req.get_json() or {}
+        want_timings = bool(body.get("timings"))
         
         # Extract parameters from request
         message = body.get("message", "")
         city = body.get("city", "Norfolk, VA")
-        history = body.get("history", [])
+        history = body.get("history")
         session_id = body.get("session_id") or f"session_{hash(str(req))}"
         
         if not message:
@@ -32,122 +44,46 @@ def main(req):
                 "body": json.dumps({"error": "Message is required"})
             }, 400
         
-        # Check if message is asking about weather or events
-        weather_keywords = ["weather", "temperature", "temp", "forecast", "rain", "snow", "sunny", "cloudy", "how hot", "how cold", "what's the weather"]
-        event_keywords = ["event", "activities", "things to do", "what's happening", "recommendations", "suggest", "outdoor", "indoor"]
-        message_lower = message.lower()
-        is_weather_query = any(keyword in message_lower for keyword in weather_keywords)
-        is_event_query = any(keyword in message_lower for keyword in event_keywords)
+        # Clients may send only the new turn; the history then comes from the
+        # server-side session store. Either way it is trimmed to a token budget.
+        with timer.stage("session"):
+            if history is None:
+                history = session_store.load_history(session_id)
+            history = session_store.trim_history(history)
+        
+        # Route the message to intents (weather, events, ...) and the context
+        # sources they need, e.g. event questions get weather and events
+        with timer.stage("intent"):
+            route = intent_router.route(message)
+        sources = route.providers
         
-        # Fetch weather data (for weather queries or event recommendations)
-        # Also fetch events if user is asking about events/activities
+        # Fetch context (weather for weather queries and event recommendations,
+        # events for event queries) concurrently under one deadline
         weather_info = None
         events_info = None
+        context_parts = []
+        user_message = message
         
-        if is_weather_query or is_event_query:
-            try:
-                # Parse city from "City, State" format
-                city_parts = city.split(",")
-                city_name = city_parts[0].strip() if city_parts else "Norfolk"
-                state_name = city_parts[1].strip() if len(city_parts) > 1 else ""
-                
-                # For Azure Functions, call the weather function directly
-                # We'll import and call the weather function's logic
-                # Or make an HTTP request to the weather endpoint
-                
-                # In Azure Functions, we can call other functions using the function app URL
-                # Get the function app URL from environment
-                function_app_url = os.environ.get("WEBSITE_HOSTNAME", "")
-                
-                if function_app_url and function_app_url != "localhost":
-                    # Production - construct full URL to weather function
-                    protocol = "https" if "azurewebsites.net" in function_app_url or "azurestaticapps.net" in function_app_url else "http"
-                    weather_url = f"{protocol}://{function_app_url}/api/weather?city={urllib.parse.quote(city_name)}&state={urllib.parse.quote(state_name)}"
-                else:
-                    # Local development - Azure Functions Core Tools uses port 7071
-                    weather_url = f"http://localhost:7071/api/weather?city={urllib.parse.quote(city_name)}&state={urllib.parse.quote(state_name)}"
-                
-                logger.info(f"Fetching weather from: {weather_url}")
-                
-                # Make request to weather API
-                weather_response = requests.get(weather_url, timeout=10)
-                if weather_response.ok:
-                    weather_info = weather_response.json()
-                    logger.info(f"Weather data fetched: {weather_info.get('temperature')}°F for {city_name}")
-                else:
-                    logger.warning(f"Weather API returned {weather_response.status_code}: {weather_response.text[:200]}")
-            except Exception as e:
-                logger.warning(f"Failed to fetch weather data: {str(e)}")
+        if sources:
+            # Parse city from "City, State" format
+            city_name, state_name = context_providers.split_city(city)
+            source_timings = {}
+            with timer.stage("context"):
+                context = context_providers.gather_context(city_name, state_name, sources, timings=source_timings)
+            for name, duration_ms in source_timings.items():
+                timer.record(name, duration_ms)
+            weather_info = context.get("weather")
+            events_info = context.get("events")
+            
+            # Mock weather is never passed to Penny
+            if weather_info and weather_info.get("_is_mock"):
                 weather_info = None
             
-            # If we have weather info, enhance the message to Penny
-            if weather_info and not weather_info.get("_is_mock"):
-                weather_text = f"Current weather in {city}: {weather_info.get('temperature')}°F, {weather_info.get('description')}. Feels like {weather_info.get('feels_like')}°F. Humidity: {weather_info.get('humidity')}%. Wind: {weather_info.get('wind_speed')} mph."
-                
-                # If event query, also fetch events for weather-based recommendations
-                if is_event_query:
-                    try:
-                        # Parse city from "City, State" format
-                        city_parts = city.split(",")
-                        city_name = city_parts[0].strip() if city_parts else "Norfolk"
-                        state_name = city_parts[1].strip() if len(city_parts) > 1 else ""
-                        
-                        # Get function app URL
-                        function_app_url = os.environ.get("WEBSITE_HOSTNAME", "")
-                        
-                        if function_app_url and function_app_url != "localhost":
-                            protocol = "https" if "azurewebsites.net" in function_app_url or "azurestaticapps.net" in function_app_url else "http"
-                            events_url = f"{protocol}://{function_app_url}/api/events?city={urllib.parse.quote(city_name)}&state={urllib.parse.quote(state_name)}&limit=5"
-                        else:
-                            events_url = f"http://localhost:7071/api/events?city={urllib.parse.quote(city_name)}&state={urllib.parse.quote(state_name)}&limit=5"
-                        
-                        logger.info(f"Fetching events from: {events_url}")
-                        events_response = requests.get(events_url, timeout=10)
-                        if events_response.ok:
-                            events_data = events_response.json()
-                            events_info = events_data.get("events", [])
-                            logger.info(f"Found {len(events_info)} events for recommendations")
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch events: {str(e)}")
-                        events_info = None
-                
-                # Build context message
-                context_parts = [f"[Weather Context: {weather_text}]"]
-                
-                if events_info and len(events_info) > 0:
-                    # Suggest events based on weather
-                    temp = weather_info.get('temperature', 70)
-                    condition = weather_info.get('description', '').lower()
-                    
-                    # Weather-based event recommendations
-                    if temp >= 70 and ('sunny' in condition or 'clear' in condition):
-                        weather_note = "Perfect weather for outdoor events!"
-                    elif temp >= 60 and ('partly' in condition or 'clear' in condition):
-                        weather_note = "Nice weather for outdoor activities."
-                    elif temp < 50 or 'rain' in condition or 'snow' in condition:
-                        weather_note = "Consider indoor events due to weather."
-                    else:
-                        weather_note = "Check event details for indoor/outdoor status."
-                    
-                    # Format events list with dates
-                    events_list = []
-                    for e in events_info[:3]:
-                        event_date = e.get('date', '')
-                        try:
-                            if event_date:
-                                date_obj = datetime.fromisoformat(event_date.replace('Z', '+00:00'))
-                                date_str = date_obj.strftime('%b %d at %I:%M %p')
-                            else:
-                                date_str = "TBD"
-                        except:
-                            date_str = "TBD"
-                        events_list.append(f"- {e.get('title', 'Event')} on {date_str} at {e.get('location', 'TBD')}")
-                    
-                    context_parts.append(f"[Upcoming Events in {city}: {weather_note}\n" + "\n".join(events_list) + "]")
-                
-                enhanced_message = f"{message}\n\n" + "\n\n".join(context_parts)
-                message = enhanced_message
-                logger.info("Enhanced message with weather and events data")
+            with timer.stage("prompt"):
+                context_parts = build_context_parts(city, weather_info, events_info)
+            if context_parts:
+                message = f"{message}\n\n" + "\n\n".join(context_parts)
+                logger.info(f"Enhanced message with context: {', '.join(sources)}")
         
         # Get Hugging Face token from environment
         # Token should be set in Azure Static Web App → Configuration → Environment variables
@@ -163,89 +99,137 @@ def main(req):
         # Log token status (without exposing the actual token)
         logger.info(f"HF_TOKEN found: {HF_TOKEN[:10]}...{HF_TOKEN[-4:] if len(HF_TOKEN) > 14 else '***'}")
         
-        # Penny Hugging Face Space URL
-        # Space: pythonprincess/Penny_V2.2
-        # URL: https://huggingface.co/spaces/pythonprincess/Penny_V2.2
-        PENNY_SPACE_URL = os.environ.get("PENNY_SPACE_URL", "https://pythonprincess-penny-v2-2.hf.space")
-        
-        # Use /run/predict endpoint (most reliable for Gradio)
-        # This endpoint works with proper authentication
-        predict_endpoint = f"{PENNY_SPACE_URL}/run/predict"
+        # Keep the Space warm when PENNY_KEEPALIVE_SECONDS is set (no-op otherwise)
+        penny_client.start_keepalive(HF_TOKEN)
         
-        # Prepare Gradio API request
-        # Gradio expects: { fn_index, data: [message, city, history], session_hash, event_data }
-        gradio_payload = {
-            "fn_index": 1,  # chat_with_penny_sync function index
-            "data": [
-                message,
-                city,
-                history
-            ],
-            "session_hash": session_id,
-            "event_data": None
-        }
+        # Opt-in reply cache for repeated first-turn questions. The key includes a
+        # fingerprint of the injected context, so changed weather/events always miss.
+        with timer.stage("cache"):
+            cache = reply_cache.get_cache() if not history else None
+            cache_key = reply_cache.make_key(user_message, city, context_parts) if cache else None
+            cached = cache.get(cache_key) if cache else None
+        stream_format = body.get("stream")
         
-        # Headers for Hugging Face Space
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {HF_TOKEN}" if HF_TOKEN else None
-        }
-        # Remove None values
-        headers = {k: v for k, v in headers.items() if v is not None}
-        
-        logger.info(f"Calling Penny Space: {predict_endpoint}")
-        logger.info(f"Payload: {json.dumps(gradio_payload, indent=2)}")
+        if cached:
+            response_data, history_array, bot_reply = cached
+            logger.info("Serving Penny reply from cache")
+            session_store.save_history(session_id, history_array)
+            timer.finish()
+            if stream_format:
+                stream_format = "ndjson" if stream_format == "ndjson" else "sse"
+                return {
+                    "statusCode": 200,
+                    "headers": {
+                        "Content-Type": "application/x-ndjson" if stream_format == "ndjson" else "text/event-stream",
+                        "Cache-Control": "no-cache",
+                        "X-Cache": "HIT",
+                        "Server-Timing": timer.server_timing(),
+                        "Access-Control-Allow-Origin": "*",
+                        "Access-Control-Allow-Methods": "POST, OPTIONS",
+                        "Access-Control-Allow-Headers": "Content-Type"
+                    },
+                    "body": iter([
+                        format_stream_event({"type": "token", "delta": bot_reply}, stream_format),
+                        format_stream_event({
+                            "type": "done",
+                            "data": response_data,
+                            "response": bot_reply,
+                            "history": history_array,
+                            "session_id": session_id
+                        }, stream_format)
+                    ])
+                }, 200
+            return {
+                "statusCode": 200,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "X-Cache": "HIT",
+                    "Server-Timing": timer.server_timing(),
+                    "Access-Control-Allow-Origin": "*",
+                    "Access-Control-Allow-Methods": "POST, OPTIONS",
+                    "Access-Control-Allow-Headers": "Content-Type"
+                },
+                "body": json.dumps(with_timings({
+                    "data": response_data,
+                    "response": bot_reply,
+                    "history": history_array,
+                    "session_id": session_id
+                }, timer, want_timings))
+            }, 200
         
-        # Make request to Gradio API
-        # Use /run/predict with authentication - this should work
-        response = requests.post(
-            predict_endpoint,
-            headers=headers,
-            json=gradio_payload,
-            timeout=60  # Gradio can take time
-        )
+        # Streaming mode: relay Penny's reply token by token via the Gradio queue
+        # "stream": true / "sse" -> text/event-stream, "ndjson" -> application/x-ndjson
+        if stream_format:
+            stream_format = "ndjson" if stream_format == "ndjson" else "sse"
+            timer.finish()
+            return {
+                "statusCode": 200,
+                "headers": {
+                    "Content-Type": "application/x-ndjson" if stream_format == "ndjson" else "text/event-stream",
+                    "Cache-Control": "no-cache",
+                    "X-Accel-Buffering": "no",
+                    "Server-Timing": timer.server_timing(),
+                    "Access-Control-Allow-Origin": "*",
+                    "Access-Control-Allow-Methods": "POST, OPTIONS",
+                    "Access-Control-Allow-Headers": "Content-Type"
+                },
+                "body": stream_reply(message, city, history, session_id, HF_TOKEN, stream_format, cache_key)
+            }, 200
         
-        if not response.ok:
-            error_text = response.text
-            logger.error(f"Penny API error: {response.status_code} - {error_text}")
+        # Call Penny through /run/predict (most reliable for Gradio)
+        try:
+            with timer.stage("penny"):
+                response_data, history_array, bot_reply = penny_client.predict(message, city, history, session_id, HF_TOKEN)
+        except penny_client.PennyUnavailableError as e:
+            # Space asleep/starting or circuit open: answer immediately instead of holding the worker
+            logger.warning(f"Penny unavailable ({e.reason}), retry after {e.retry_after}s")
             return {
-                "statusCode": response.status_code,
+                "statusCode": 503,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Retry-After": str(e.retry_after),
+                    "Server-Timing": timer.server_timing(),
+                    "Access-Control-Allow-Origin": "*"
+                },
                 "body": json.dumps({
-                    "error": f"Penny API error: {response.status_code}",
-                    "details": error_text
+                    "error": e.details,
+                    "status": e.reason,
+                    "retry_after": e.retry_after,
+                    "session_id": session_id
                 })
-            }, response.status_code
-        
-        result = response.json()
+            }, 503
+        except penny_client.PennyAPIError as e:
+            return {
+                "statusCode": e.status_code,
+                "body": json.dumps({
+                    "error": f"Penny API error: {e.status_code}",
+                    "details": e.details
+                })
+            }, e.status_code
         
-        # Gradio returns: { data: [chatbot_history, cleared_message] }
-        # chatbot_history is array of [user_msg, bot_msg] tuples
-        response_data = result.get("data", result)
+        session_store.save_history(session_id, history_array)
+        if cache_key and bot_reply != penny_client.NO_RESPONSE:
+            cache.set(cache_key, (response_data, history_array, bot_reply))
         
-        # Extract history and bot message
-        if isinstance(response_data, list) and len(response_data) > 0:
-            history_array = response_data[0] if isinstance(response_data[0], list) else []
-            last_message = history_array[-1] if history_array else None
-            bot_reply = last_message[1] if last_message and len(last_message) > 1 else "I'm sorry, I didn't get a response."
-        else:
-            bot_reply = "I'm sorry, I didn't get a response."
-            history_array = history
+        timer.finish()
+        logger.info(f"Agent timings: {timer.server_timing()}")
         
         # Return in format expected by frontend
         return {
             "statusCode": 200,
             "headers": {
                 "Content-Type": "application/json",
+                "Server-Timing": timer.server_timing(),
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Methods": "POST, OPTIONS",
                 "Access-Control-Allow-Headers": "Content-Type"
             },
-            "body": json.dumps({
+            "body": json.dumps(with_timings({
                 "data": response_data,
                 "response": bot_reply,
                 "history": history_array,
                 "session_id": session_id
-            })
+            }, timer, want_timings))
         }, 200
         
     except requests.exceptions.Timeout:
@@ -266,3 +250,95 @@ def main(req):
             "statusCode": 500,
             "body": json.dumps({"error": f"Internal server error: {str(e)}"})
         }, 500
+
+
+def stream_reply(message: str, city: str, history, session_id: str, token: str, stream_format: str = "sse", cache_key: str = None):
+    """
+    Generator producing the streaming response body.
+    Emits "queue" and "token" events while Penny generates, then a final "done"
+    event carrying the same {data, response, history, session_id} payload as the
+    non-streaming response. Errors are reported as an "error" event.
+    """
+    started = time.perf_counter()
+    first_token = True
+    try:
+        for event in penny_client.stream(message, city, history, session_id, token):
+            if event["type"] == "token" and first_token:
+                first_token = False
+                telemetry.observe("agent_penny_first_token", (time.perf_counter() - started) * 1000)
+            if event["type"] == "done":
+                telemetry.observe("agent_penny_stream", (time.perf_counter() - started) * 1000)
+                session_store.save_history(session_id, event["history"])
+                cache = reply_cache.get_cache()
+                if cache_key and cache and event["response"] != penny_client.NO_RESPONSE:
+                    cache.set(cache_key, (event["data"], event["history"], event["response"]))
+                event = {
+                    "type": "done",
+                    "data": event["data"],
+                    "response": event["response"],
+                    "history": event["history"],
+                    "session_id": session_id
+                }
+            yield format_stream_event(event, stream_format)
+    except penny_client.PennyUnavailableError as e:
+        yield format_stream_event({"type": "error", "error": e.details, "status": e.reason, "retry_after": e.retry_after}, stream_format)
+    except penny_client.PennyAPIError as e:
+        yield format_stream_event({"type": "error", "error": f"Penny API error: {e.status_code}", "details": e.details}, stream_format)
+    except requests.exceptions.Timeout:
+        logger.error("Streaming request to Penny Space timed out")
+        yield format_stream_event({"type": "error", "error": "Request to Penny timed out"}, stream_format)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Streaming request error: {str(e)}")
+        yield format_stream_event({"type": "error", "error": f"Failed to connect to Penny: {str(e)}"}, stream_format)
+
+
+def with_timings(payload: dict, timer, include: bool):
+    """Add the optional "timings" field to a response payload"""
+    if include:
+        payload["timings"] = timer.as_dict()
+    return payload
+
+
+def format_stream_event(event: dict, stream_format: str = "sse"):
+    """Encode one stream event as an SSE frame or an NDJSON line"""
+    if stream_format == "ndjson":
+        return json.dumps(event) + "\n"
+    payload = {k: v for k, v in event.items() if k != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def build_context_parts(city: str, weather_info, events_info):
+    """
+    Build the bracketed context blocks appended to the user's message.
+    Weather and events are independent: either may be missing.
+    """
+    context_parts = []
+    
+    if weather_info:
+        weather_text = f"Current weather in {city}: {weather_info.get('temperature')}°F, {weather_info.get('description')}. Feels like {weather_info.get('feels_like')}°F. Humidity: {weather_info.get('humidity')}%. Wind: {weather_info.get('wind_speed')} mph."
+        context_parts.append(f"[Weather Context: {weather_text}]")
+    
+    if events_info and len(events_info) > 0:
+        # Rank events by how well each suits the weather expected at its start time
+        city_name, state_name = context_providers.split_city(city)
+        weather_note = event_ranker.weather_note(weather_info)
+        ranked = event_ranker.rank(events_info, city_name, state_name, weather_info, limit=3)
+        
+        # Format events list with dates
+        events_list = []
+        for e in ranked:
+            event_date = e.get('date', '')
+            try:
+                if event_date:
+                    date_obj = datetime.fromisoformat(event_date.replace('Z', '+00:00'))
+                    date_str = date_obj.strftime('%b %d at %I:%M %p')
+                else:
+                    date_str = "TBD"
+            except:
+                date_str = "TBD"
+            reason = event_ranker.describe(e)
+            events_list.append(f"- {e.get('title', 'Event')} on {date_str} at {e.get('location', 'TBD')}" + (f" ({reason})" if reason else ""))
+        
+        context_parts.append(f"[Upcoming Events in {city}: {weather_note}\n" + "\n".join(events_list) + "]")
+    
+    return context_parts
@@ -0,0 +1,225 @@
+import os
+import re
+import sys
+import json
+import math
+import zlib
+import heapq
+import struct
+import logging
+import threading
+from array import array
+from collections import Counter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Local full-text search with BM25 ranking.
+#
+# An inverted index over the event/document schema (title, description,
+# category, location), built from the same JSON the Azure Search upload script
+# ingests. Field weights are applied by counting a term once per weight unit
+# (title x3, category x2), a cheap BM25F approximation. The index is saved as
+# one compact file:
+#
+#   b"BM25" version:u8 | header_len:u32 | postings_len:u32 | zlib(JSON header) | postings
+#
+# The header holds the stored documents, document lengths and, for every term,
+# the offset and count of its postings; postings are little-endian uint32
+# (doc id, term frequency) pairs. It serves /api/search and keyword event
+# queries, either in front of Azure Search or instead of it.
+#
+# Build from the command line:
+#   python bm25_index.py build ../scripts/events_template.json events.bm25
+#
+# Configure with:
+#   BM25_INDEX_PATH        - events index file (without it, EVENT_INDEX_SNAPSHOT_PATH is indexed in memory)
+#   BM25_INDEX_PATH_<TYPE> - index file for another /api/search index type (e.g. BM25_INDEX_PATH_DOCUMENTS)
+#   SEARCH_BACKEND         - "hybrid" (default): local first, Azure Search when it has no hits;
+#                            "local": never call Azure Search; "azure": ignore the local index
+
+MAGIC = b"BM25"
+VERSION = 1
+K1 = 1.2
+B = 0.75
+FIELD_WEIGHTS = {"title": 3, "category": 2, "location": 1, "description": 1}
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the this to with".split()
+)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str):
+    """Lowercase alphanumeric tokens without stopwords"""
+    return [token for token in _TOKEN_RE.findall((text or "").lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring over stored documents"""
+
+    def __init__(self, docs, doc_lengths, terms, postings):
+        self.docs = docs                # stored documents, by doc id
+        self.doc_lengths = doc_lengths  # array("I") of weighted token counts
+        self.terms = terms              # term -> [offset, count] into postings (in pairs)
+        self.postings = postings        # array("I") of doc id, tf, doc id, tf, ...
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+    def __len__(self):
+        return len(self.docs)
+
+    @classmethod
+    def build(cls, documents, fields=FIELD_WEIGHTS):
+        docs = []
+        doc_lengths = array("I")
+        index = {}
+        for doc in documents:
+            counts = Counter()
+            for field, weight in fields.items():
+                for token in tokenize(doc.get(field)):
+                    counts[token] += weight
+            doc_id = len(docs)
+            docs.append(doc)
+            doc_lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                index.setdefault(token, []).append((doc_id, tf))
+
+        terms = {}
+        postings = array("I")
+        for token in sorted(index):
+            terms[token] = [len(postings) // 2, len(index[token])]
+            for doc_id, tf in index[token]:
+                postings.append(doc_id)
+                postings.append(tf)
+        return cls(docs, doc_lengths, terms, postings)
+
+    def save(self, path: str):
+        header = zlib.compress(json.dumps({
+            "docs": self.docs,
+            "doc_lengths": list(self.doc_lengths),
+            "terms": self.terms
+        }, separators=(",", ":")).encode("utf-8"))
+        postings = array("I", self.postings)
+        if sys.byteorder == "big":
+            postings.byteswap()
+        blob = postings.tobytes()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<BII", VERSION, len(header), len(blob)))
+            f.write(header)
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "rb") as f:
+            if f.read(4) != MAGIC:
+                raise ValueError(f"{path} is not a BM25 index")
+            version, header_len, postings_len = struct.unpack("<BII", f.read(9))
+            if version != VERSION:
+                raise ValueError(f"Unsupported BM25 index version {version}")
+            header = json.loads(zlib.decompress(f.read(header_len)))
+            postings = array("I")
+            postings.frombytes(f.read(postings_len))
+        if sys.byteorder == "big":
+            postings.byteswap()
+        return cls(header["docs"], array("I", header["doc_lengths"]), header["terms"], postings)
+
+    def search(self, query: str, limit: int = 10, offset: int = 0, where=None):
+        """
+        (score, doc) pairs for the best matches, highest score first.
+        An empty query or "*" matches every document with score 1.0.
+        where(doc) -> bool filters candidates before ranking.
+        """
+        tokens = tokenize(query) if query and query.strip() != "*" else []
+        if not tokens:
+            matches = (doc for doc in self.docs if where is None or where(doc))
+            return [(1.0, doc) for doc in list(matches)[offset:offset + limit]]
+
+        scores = {}
+        total = len(self.docs)
+        for token in set(tokens):
+            entry = self.terms.get(token)
+            if not entry:
+                continue
+            start, count = entry
+            idf = math.log(1 + (total - count + 0.5) / (count + 0.5))
+            for i in range(start * 2, (start + count) * 2, 2):
+                doc_id, tf = self.postings[i], self.postings[i + 1]
+                norm = K1 * (1 - B + B * self.doc_lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+
+        candidates = (
+            (score, doc_id) for doc_id, score in scores.items()
+            if where is None or where(self.docs[doc_id])
+        )
+        best = heapq.nlargest(offset + limit, candidates)
+        return [(round(score, 4), self.docs[doc_id]) for score, doc_id in best[offset:]]
+
+
+def load_documents(path: str):
+    """Documents from a JSON file in the upload format (a list, or {"value": [...]})"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("value", []) if isinstance(data, dict) else data
+
+
+_indexes = {}  # index type -> (source (path, mtime), BM25Index)
+_lock = threading.Lock()
+
+
+def _index_path(index_type: str):
+    path = os.environ.get(f"BM25_INDEX_PATH_{index_type.upper()}")
+    if path or index_type != "events":
+        return path, False
+    if os.environ.get("BM25_INDEX_PATH"):
+        return os.environ["BM25_INDEX_PATH"], False
+    snapshot = os.environ.get("EVENT_INDEX_SNAPSHOT_PATH")
+    return snapshot, bool(snapshot)
+
+
+def get_index(index_type: str = "events"):
+    """The BM25 index for an index type (reloaded when its source file changes), or None"""
+    path, from_snapshot = _index_path(index_type)
+    if not path:
+        return None
+    cached = _indexes.get(index_type)
+    try:
+        source = (path, os.path.getmtime(path))
+    except OSError:
+        return cached[1] if cached else None
+    if cached and cached[0] == source:
+        return cached[1]
+    with _lock:
+        cached = _indexes.get(index_type)
+        if cached and cached[0] == source:
+            return cached[1]
+        try:
+            index = BM25Index.build(load_documents(path)) if from_snapshot else BM25Index.load(path)
+        except (OSError, ValueError, KeyError, struct.error, zlib.error) as e:
+            logger.warning(f"Could not load BM25 index from {path}: {str(e)}")
+            return cached[1] if cached else None
+        _indexes[index_type] = (source, index)
+        logger.info(f"Loaded {index_type} BM25 index from {path} ({len(index)} documents)")
+        return index
+
+
+def search_backend():
+    """The configured SEARCH_BACKEND: hybrid, local or azure"""
+    return (os.environ.get("SEARCH_BACKEND") or "hybrid").strip().lower()
+
+
+def search(query: str, limit: int = 10, offset: int = 0, where=None, index_type: str = "events"):
+    """Ranked (score, doc) pairs from the local index, or None when no index is configured"""
+    index = get_index(index_type)
+    if index is None:
+        return None
+    return index.search(query, limit, offset, where)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        print("Usage: python bm25_index.py build <documents.json> <index.bm25>")
+        sys.exit(1)
+    built = BM25Index.build(load_documents(sys.argv[2]))
+    built.save(sys.argv[3])
+    print(f"Indexed {len(built)} documents, {len(built.terms)} terms -> {sys.argv[3]} ({os.path.getsize(sys.argv[3])} bytes)")
@@ -0,0 +1,87 @@
+import time
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker.
+    closed    - calls pass; consecutive failures are counted
+    open      - calls are rejected until reset_timeout has passed
+    half_open - a single probe call is let through; success closes, failure re-opens.
+                A probe with no result after probe_timeout is abandoned and another is allowed.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 probe_timeout: float = 120.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may proceed now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"Circuit {self.name} half-open, probing")
+            # Half-open: only one probe at a time (unless the last one was lost)
+            if self._probe_in_flight and time.monotonic() - self._probe_started_at < self.probe_timeout:
+                return False
+            if self._probe_in_flight:
+                logger.warning(f"Circuit {self.name} probe timed out after {self.probe_timeout}s, probing again")
+            self._probe_in_flight = True
+            self._probe_started_at = time.monotonic()
+            return True
+
+    def retry_after(self):
+        """Seconds until the breaker will allow a probe (0 if closed)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0
+            return max(1, int(self.reset_timeout - (time.monotonic() - self.opened_at)) + 1)
+
+    def release_probe(self):
+        """Give back a half-open probe slot without recording a result"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Circuit {self.name} opened after {self.failures} failure(s)")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {"name": self.name, "state": self.state, "failures": self.failures}
@@ -0,0 +1,159 @@
+import os
+import requests
+import logging
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import weather
+import events
+from env_config import env_float
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Context providers used by the agent to enrich messages sent to Penny.
+#
+# By default ("local" mode) the providers call the weather/events logic
+# in-process, so a chat turn does not pay for an extra HTTP round trip and a
+# second function invocation. "remote" mode keeps the old behaviour of calling
+# our own /api/weather and /api/events endpoints over HTTP, which is useful when
+# the agent is deployed separately from the other functions.
+#
+# Configure with:
+#   CONTEXT_PROVIDER_MODE      - "local" (default) or "remote"
+#   CONTEXT_PROVIDER_BASE_URL  - base URL for remote mode (e.g. https://myapp.azurestaticapps.net)
+#                                Defaults to WEBSITE_HOSTNAME, or localhost:7071 for local development.
+#   CONTEXT_DEADLINE_SECONDS   - overall deadline for gathering context for one chat turn (default 6)
+
+REMOTE_TIMEOUT = 10
+DEFAULT_CONTEXT_DEADLINE = 6.0
+
+# Shared pool for concurrent context gathering. Sources that miss the deadline
+# keep running in the background and their results are simply dropped.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="context")
+
+
+def get_provider_mode():
+    """Return the configured provider mode ("local" or "remote")"""
+    mode = (os.environ.get("CONTEXT_PROVIDER_MODE") or "local").strip().lower()
+    if mode not in ("local", "remote"):
+        logger.warning(f"Unknown CONTEXT_PROVIDER_MODE '{mode}', using local")
+        mode = "local"
+    return mode
+
+
+def split_city(city: str):
+    """Split a "City, State" string into (city, state)"""
+    city_parts = (city or "").split(",")
+    city_name = city_parts[0].strip() or "Norfolk"
+    state_name = city_parts[1].strip() if len(city_parts) > 1 else ""
+    return city_name, state_name
+
+
+def get_weather_context(city: str, state: str = ""):
+    """Get current weather for a city as a dict, or None if unavailable"""
+    if get_provider_mode() == "remote":
+        return _remote_get("weather", {"city": city, "state": state})
+    return weather.get_weather(city, state)
+
+
+def get_events_context(city: str, state: str = "", limit: int = 20):
+    """
+    Get upcoming events for a city as a list, or None if unavailable.
+    The agent ranks these candidates against the weather (event_ranker) and keeps the best few.
+    """
+    if get_provider_mode() == "remote":
+        data = _remote_get("events", {"city": city, "state": state, "limit": limit})
+        return data.get("events", []) if data else None
+    return events.get_events(city, state, limit)
+
+
+# Registered context sources: name -> callable(city, state) returning the context (or None)
+CONTEXT_SOURCES = {
+    "weather": get_weather_context,
+    "events": get_events_context,
+}
+
+
+def get_context_deadline():
+    """Return the overall context deadline in seconds"""
+    return env_float("CONTEXT_DEADLINE_SECONDS", DEFAULT_CONTEXT_DEADLINE)
+
+
+def gather_context(city: str, state: str, sources, deadline: float = None, timings: dict = None):
+    """
+    Fetch several context sources concurrently under one overall deadline.
+    Returns a dict of source name -> result. A source that fails or does not
+    finish in time maps to None without affecting the others.
+    If a timings dict is passed, it receives source name -> duration in ms for
+    every source that finished before the deadline.
+    """
+    if deadline is None:
+        deadline = get_context_deadline()
+
+    results = {}
+    futures = {}
+    for name in sources:
+        provider = CONTEXT_SOURCES.get(name)
+        if not provider:
+            logger.warning(f"Unknown context source: {name}")
+            results[name] = None
+            continue
+        futures[_executor.submit(_timed_call, provider, city, state)] = name
+
+    started = time.monotonic()
+    done, not_done = wait(futures, timeout=deadline)
+
+    for future in done:
+        name = futures[future]
+        try:
+            results[name], duration_ms = future.result()
+            if timings is not None:
+                timings[name] = duration_ms
+        except Exception as e:
+            logger.warning(f"Failed to fetch {name} context: {str(e)}")
+            results[name] = None
+
+    for future in not_done:
+        name = futures[future]
+        logger.warning(f"{name} context missed the {deadline}s deadline, continuing without it")
+        results[name] = None
+
+    logger.info(f"Gathered context {sorted(n for n, r in results.items() if r is not None)} in {time.monotonic() - started:.2f}s")
+    return results
+
+
+def _timed_call(provider, city: str, state: str):
+    """Run one context source and return (result, duration in ms)"""
+    started = time.perf_counter()
+    result = provider(city, state)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def _function_app_base_url():
+    """Resolve the base URL of the function app for remote mode"""
+    base_url = os.environ.get("CONTEXT_PROVIDER_BASE_URL")
+    if base_url:
+        return base_url.rstrip("/")
+
+    function_app_url = os.environ.get("WEBSITE_HOSTNAME", "")
+    if function_app_url and function_app_url != "localhost":
+        # Production - construct full URL to the function app
+        protocol = "https" if "azurewebsites.net" in function_app_url or "azurestaticapps.net" in function_app_url else "http"
+        return f"{protocol}://{function_app_url}"
+
+    # Local development - Azure Functions Core Tools uses port 7071
+    return "http://localhost:7071"
+
+
+def _remote_get(function_name: str, params: dict):
+    """Call one of our own functions over HTTP and return the decoded JSON (or None)"""
+    url = f"{_function_app_base_url()}/api/{function_name}?{urllib.parse.urlencode(params)}"
+    logger.info(f"Fetching {function_name} context from: {url}")
+
+    response = requests.get(url, timeout=REMOTE_TIMEOUT)
+    if not response.ok:
+        logger.warning(f"{function_name} API returned {response.status_code}: {response.text[:200]}")
+        return None
+    return response.json()
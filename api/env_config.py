@@ -0,0 +1,37 @@
+import os
+
+# Environment variable parsing shared by the API modules.
+#
+# Each module documents its own variables in its header comment; these helpers
+# only turn the raw strings into values. Unset, empty or malformed values fall
+# back to the default instead of raising, so a typo in the app settings never
+# takes a function down.
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off")
+
+
+def env_int(name: str, default: int):
+    """Integer setting, or default when unset or not an integer"""
+    try:
+        return int(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float):
+    """Float setting, or default when unset or not a number"""
+    try:
+        return float(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+def env_flag(name: str, default: bool = False):
+    """Boolean setting ("1/true/yes/on" or "0/false/no/off"), or default when unset or unrecognized"""
+    value = (os.environ.get(name) or "").strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return default
@@ -0,0 +1,182 @@
+import re
+import json
+import base64
+import time
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from event_index import parse_event_time
+from env_config import env_float
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Multi-source event aggregation.
+#
+# Every registered source adapter is queried at the same time under one shared
+# deadline. Each source's events are ordered by start time and the lists are
+# combined with a k-way merge, then cross-source duplicates (same normalized
+# title, venue and start minute) are dropped, keeping the copy from the source
+# registered first. Adding a source (an iCal feed, Facebook events, ...) is one
+# register_source() call.
+#
+# Pages are resumed with an opaque cursor holding the window start and each
+# source's position (an index offset or an Azure Search skip), so the next page
+# continues every source exactly where the previous merge stopped. The cursor
+# also records the start time of the last event returned: a source that missed
+# an earlier page's deadline resumes from its old position, and its events dated
+# before that time are skipped, so pages never go back in time. A new
+# window starts at the current time floored to WINDOW_GRANULARITY_SECONDS, so
+# repeated first-page requests get the same cursor and therefore the same ETag.
+#
+# Configure with:
+#   EVENTS_DEADLINE_SECONDS - overall time budget for all sources (default 8)
+
+DEFAULT_DEADLINE_SECONDS = 8.0
+WINDOW_GRANULARITY_SECONDS = 300
+
+EVENT_SOURCES = {}  # name -> {"fetch": fetch(city, state, limit, days_ahead, ...), "enabled": callable or None}
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="event-source")
+
+
+def register_source(name: str, fetch, enabled=None):
+    """
+    Add (or replace) an event source. fetch(city, state, limit, days_ahead, offset=0,
+    start=None, fields=None, near=None) returns up to limit events in the /api/events shape,
+    skipping the first offset events of the window that begins at start (epoch seconds);
+    fields, when given, lists the event fields the caller needs, and near=(lat, lon, radius_mi)
+    asks for events within that radius instead of in the city. enabled() returning False
+    skips the source.
+    """
+    EVENT_SOURCES[name] = {"fetch": fetch, "enabled": enabled}
+
+
+def get_deadline():
+    return env_float("EVENTS_DEADLINE_SECONDS", DEFAULT_DEADLINE_SECONDS)
+
+
+def _normalize(text: str):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split())
+
+
+def dedupe_key(event: dict):
+    """Normalized title, venue and start time (to the minute)"""
+    start = parse_event_time(event.get("date"))
+    return (
+        _normalize(event.get("title")),
+        _normalize(event.get("location")),
+        int(start // 60) if start is not None else event.get("date")
+    )
+
+
+def _start_key(event: dict):
+    start = parse_event_time(event.get("date"))
+    return start if start is not None else float("inf")
+
+
+def window_start(now: float = None):
+    """Start (epoch seconds) of a new page window: now, floored to WINDOW_GRANULARITY_SECONDS"""
+    now = time.time() if now is None else now
+    return float(int(now) // WINDOW_GRANULARITY_SECONDS * WINDOW_GRANULARITY_SECONDS)
+
+
+def encode_cursor(state: dict):
+    """Opaque page cursor (URL-safe base64 of compact JSON)"""
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    Cursor -> {"t": window start, "o": {source: offset}, "a": start of the last event returned or None};
+    raises ValueError if it is malformed
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offsets = {str(name): int(offset) for name, offset in state["o"].items()}
+        after = state.get("a")
+        return {"t": float(state["t"]), "o": offsets, "a": float(after) if after is not None else None}
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+
+
+def aggregate(city: str, state: str = "", limit: int = 10, days_ahead: int = 30,
+              deadline: float = None, cursor: str = None, fields=None, near=None):
+    """
+    One page of upcoming events from every enabled source, merged by start time and deduplicated.
+    Returns (events, next_cursor); next_cursor is None once every source is exhausted.
+    Sources that fail or miss the deadline are left out of the page.
+    """
+    if deadline is None:
+        deadline = get_deadline()
+    page = decode_cursor(cursor) if cursor else {"t": window_start(), "o": {}, "a": None}
+    offsets = page["o"]
+    after = page["a"]
+
+    futures = {}
+    for name, source in EVENT_SOURCES.items():
+        enabled = source.get("enabled")
+        if enabled and not enabled():
+            continue
+        future = _executor.submit(
+            source["fetch"], city, state, limit, days_ahead,
+            offset=offsets.get(name, 0), start=page["t"], fields=fields, near=near
+        )
+        futures[future] = name
+
+    started = time.monotonic()
+    done, not_done = wait(futures, timeout=deadline)
+    for future in not_done:
+        logger.warning(f"Event source {futures[future]} missed the {deadline}s deadline, continuing without it")
+
+    # Per-source lists in registration order, so ties and duplicates favour earlier sources
+    order = list(EVENT_SOURCES)
+    lists = {}
+    stale = {}
+    for future in sorted(done, key=lambda f: order.index(futures[f])):
+        name = futures[future]
+        try:
+            events = future.result() or []
+        except Exception as e:
+            logger.warning(f"Event source {name} failed: {str(e)}")
+            continue
+        logger.info(f"Event source {name} returned {len(events)} events")
+        lists[name] = sorted(events, key=_start_key)
+        # Events dated before the last one already returned come from a source that missed an
+        # earlier deadline; they are consumed without being returned so pages stay in date order
+        stale[name] = sum(1 for event in lists[name] if after is not None and _start_key(event) < after)
+
+    tagged = [[(name, event) for event in events[stale[name]:]] for name, events in lists.items()]
+    merged = []
+    seen = set()
+    consumed = dict(stale)
+    for name, event in heapq.merge(*tagged, key=lambda entry: _start_key(entry[1])):
+        key = dedupe_key(event)
+        if key in seen:
+            # Duplicates still advance their source's position so they do not reappear on the next page
+            consumed[name] += 1
+            continue
+        if len(merged) >= limit:
+            break
+        seen.add(key)
+        merged.append(event)
+        consumed[name] += 1
+
+    # A source may have more events if it filled its page or was not fully consumed
+    has_more = any(
+        consumed[name] < len(events) or len(events) >= limit
+        for name, events in lists.items()
+    )
+    next_cursor = None
+    if has_more:
+        next_offsets = dict(offsets)
+        for name, count in consumed.items():
+            next_offsets[name] = offsets.get(name, 0) + count
+        # Dateless events sort last and do not move the position in time
+        last = _start_key(merged[-1]) if merged else float("inf")
+        next_cursor = encode_cursor({"t": page["t"], "o": next_offsets, "a": last if last != float("inf") else after})
+
+    logger.info(f"Aggregated {len(merged)} events from {len(lists)} sources in {time.monotonic() - started:.2f}s")
+    return merged, next_cursor
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import heapq
+import bisect
+import itertools
+import logging
+import threading
+import requests
+from datetime import datetime, timezone
+
+import geo
+import geocode_cache
+from env_config import env_flag, env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# In-memory event index.
+#
+# Upcoming events are loaded in bulk - from a JSON snapshot in the
+# scripts/events_template.json format, or by paging through the Azure Search
+# events index - and partitioned by city/state with each partition sorted by
+# start time. A days_ahead window is then two binary searches and limit is a
+# slice, so /api/events no longer queries Azure Search per request. The index
+# is reloaded in the background every EVENT_INDEX_REFRESH_SECONDS; Azure Search
+# is only hit on cold start and on refresh.
+#
+# Events with coordinates (lat/lon, or the location_geo point added at upload;
+# otherwise the city's cached geocode) are also bucketed into a fixed lat/lon
+# grid, so "events near me" reads only the cells around the circle and refines
+# the candidates with the haversine distance.
+#
+# Configure with:
+#   EVENT_INDEX_SNAPSHOT_PATH     - JSON file of events (events_template.json format); takes precedence over Azure Search
+#   EVENT_INDEX_REFRESH_SECONDS   - reload interval (default 900)
+#   EVENT_INDEX_ENABLED           - "false" to query Azure Search per request as before (default on)
+#   EVENT_INDEX_RETRY_SECONDS     - after a failed cold load, how long to serve per-request queries before retrying (default 300)
+#   AZURE_SEARCH_ENDPOINT / AZURE_SEARCH_KEY / AZURE_SEARCH_INDEX_EVENTS - snapshot source
+
+SEARCH_API_VERSION = "2023-07-01-Preview"
+SNAPSHOT_PAGE_SIZE = 1000
+GRID_DEGREES = 0.25  # ~17 mi of latitude per cell
+
+
+def _partition_key(city: str, state: str = ""):
+    return f"{(city or '').strip().lower()}|{(state or '').strip().lower()}"
+
+
+def parse_event_time(value):
+    """Event date string -> UTC epoch seconds, or None (naive dates are taken as UTC)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def event_coordinates(item: dict):
+    """(lat, lon) from lat/lon, a GeoJSON location_geo point, or the city's geocode; None if unknown"""
+    coords = geo.parse_coordinates(item.get("lat"), item.get("lon"))
+    if coords:
+        return coords
+    point = item.get("location_geo") or {}
+    if isinstance(point, dict) and len(point.get("coordinates") or []) == 2:
+        coords = geo.parse_coordinates(point["coordinates"][1], point["coordinates"][0])
+        if coords:
+            return coords
+    if item.get("city"):
+        return geocode_cache.lookup(item.get("city"), item.get("state") or "")
+    return None
+
+
+def normalize_event(item: dict, source: str):
+    """Index document (Azure Search or events_template.json) -> the /api/events event shape"""
+    coords = event_coordinates(item)
+    return {
+        "id": item.get("id", ""),
+        "title": item.get("title", "Untitled Event"),
+        "description": item.get("description", ""),
+        "date": item.get("date", ""),
+        "location": item.get("location", ""),
+        "city": item.get("city", ""),
+        "state": item.get("state", ""),
+        "category": item.get("category", "General"),
+        "url": item.get("url", ""),
+        "lat": coords[0] if coords else None,
+        "lon": coords[1] if coords else None,
+        "source": item.get("source") or source
+    }
+
+
+class EventIndex:
+    """
+    Events partitioned by city/state, each partition as parallel sorted lists of start times
+    and events, plus the same layout per grid cell for radius queries
+    """
+
+    def __init__(self, events=(), source: str = ""):
+        self.source = source
+        self.loaded_at = time.time()
+        partitions = {}
+        cells = {}
+        for event in events:
+            start = parse_event_time(event.get("date"))
+            if start is None:
+                continue
+            partitions.setdefault(_partition_key(event.get("city"), event.get("state")), []).append((start, event))
+            if event.get("lat") is not None and event.get("lon") is not None:
+                cells.setdefault(geo.grid_cell(event["lat"], event["lon"], GRID_DEGREES), []).append((start, event))
+        self._partitions = {key: self._sorted(entries) for key, entries in partitions.items()}
+        self._cells = {cell: self._sorted(entries) for cell, entries in cells.items()}
+
+    @staticmethod
+    def _sorted(entries):
+        entries.sort(key=lambda entry: entry[0])
+        return [start for start, _ in entries], [event for _, event in entries]
+
+    def __len__(self):
+        return sum(len(starts) for starts, _ in self._partitions.values())
+
+    def _window(self, key, start: float, end: float, buckets=None):
+        starts, events = (self._partitions if buckets is None else buckets).get(key, ((), ()))
+        lo = bisect.bisect_left(starts, start)
+        hi = bisect.bisect_right(starts, end)
+        return [(starts[i], events[i]) for i in range(lo, hi)]
+
+    def query(self, city: str, state: str = "", start: float = None, end: float = None, limit: int = 10, offset: int = 0):
+        """
+        Events in [start, end] (epoch seconds) for a city, earliest first, skipping the
+        first offset matches (the index position a page cursor resumes from); no state matches every state.
+        """
+        start = time.time() if start is None else start
+        end = float("inf") if end is None else end
+        if state:
+            keys = [_partition_key(city, state)]
+        else:
+            prefix = _partition_key(city)
+            keys = [key for key in self._partitions if key.startswith(prefix)]
+        windows = [self._window(key, start, end) for key in keys]
+        merged = heapq.merge(*windows, key=lambda entry: entry[0]) if len(windows) > 1 else (windows[0] if windows else [])
+        return [dict(event) for _, event in itertools.islice(merged, offset, offset + limit)]
+
+    def query_near(self, lat: float, lon: float, radius_mi: float, start: float = None, end: float = None,
+                   limit: int = 10, offset: int = 0):
+        """Events within radius_mi of a point in [start, end], earliest first, each with distance_mi"""
+        start = time.time() if start is None else start
+        end = float("inf") if end is None else end
+        windows = []
+        for cell in geo.grid_cells_within(lat, lon, radius_mi, GRID_DEGREES):
+            window = []
+            for event_start, event in self._window(cell, start, end, self._cells):
+                distance = geo.haversine_mi(lat, lon, event["lat"], event["lon"])
+                if distance <= radius_mi:
+                    window.append((event_start, event, distance))
+            if window:
+                windows.append(window)
+        merged = heapq.merge(*windows, key=lambda entry: entry[0])
+        return [
+            dict(event, distance_mi=round(distance, 1))
+            for _, event, distance in itertools.islice(merged, offset, offset + limit)
+        ]
+
+    def stats(self):
+        return {
+            "source": self.source,
+            "events": len(self),
+            "partitions": len(self._partitions),
+            "grid_cells": len(self._cells),
+            "age_seconds": round(time.time() - self.loaded_at, 1)
+        }
+
+
+def load_snapshot_file(path: str):
+    """Events from a JSON file in the events_template.json format"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    items = data.get("value", data.get("events", [])) if isinstance(data, dict) else data
+    return [normalize_event(item, "Event Snapshot") for item in items]
+
+
+def load_azure_search_snapshot(endpoint: str, key: str, index: str):
+    """All upcoming events from the Azure Search events index, paged"""
+    search_url = f"{endpoint}/indexes/{index}/docs/search?api-version={SEARCH_API_VERSION}"
+    headers = {
+        "Content-Type": "application/json",
+        "api-key": key
+    }
+    current_date_iso = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    events = []
+    skip = 0
+    while True:
+        search_body = {
+            "search": "*",
+            "filter": f"date ge {current_date_iso}",
+            "orderby": "date asc",
+            "top": SNAPSHOT_PAGE_SIZE,
+            "skip": skip
+        }
+        response = requests.post(search_url, headers=headers, json=search_body, timeout=30)
+        response.raise_for_status()
+        page = response.json().get("value", [])
+        events.extend(normalize_event(item, "Azure Search") for item in page)
+        if len(page) < SNAPSHOT_PAGE_SIZE:
+            break
+        skip += SNAPSHOT_PAGE_SIZE
+    return events
+
+
+def is_enabled():
+    """True when an index source is configured and the index is not switched off"""
+    if not env_flag("EVENT_INDEX_ENABLED", True):
+        return False
+    return bool(os.environ.get("EVENT_INDEX_SNAPSHOT_PATH") or search_config())
+
+
+def search_config():
+    endpoint = os.environ.get("AZURE_SEARCH_ENDPOINT")
+    key = os.environ.get("AZURE_SEARCH_KEY") or os.environ.get("AZURE_SEARCH_API_KEY")
+    index = os.environ.get("AZURE_SEARCH_INDEX_EVENTS")
+    return (endpoint, key, index) if endpoint and key and index else None
+
+
+def build_index():
+    """Load a fresh EventIndex from the configured source"""
+    snapshot_path = os.environ.get("EVENT_INDEX_SNAPSHOT_PATH")
+    if snapshot_path:
+        return EventIndex(load_snapshot_file(snapshot_path), f"file:{snapshot_path}")
+    config = search_config()
+    if config:
+        return EventIndex(load_azure_search_snapshot(*config), "azure_search")
+    return None
+
+
+_index = None
+_lock = threading.Lock()
+_refreshing = False
+_failed_at = 0.0  # time of the last failed load, for the cold-start backoff
+
+
+def _refresh():
+    global _index, _refreshing, _failed_at
+    try:
+        index = build_index()
+        if index is not None:
+            _index = index
+            _failed_at = 0.0
+            logger.info(f"Event index loaded: {index.stats()}")
+    except Exception as e:
+        _failed_at = time.time()
+        logger.warning(f"Event index refresh failed, keeping previous index: {str(e)}")
+    finally:
+        _refreshing = False
+
+
+def _in_backoff():
+    """True while a failed cold load is backing off (callers query Azure Search per request instead)"""
+    return time.time() - _failed_at < env_int("EVENT_INDEX_RETRY_SECONDS", 300)
+
+
+def refresh_now():
+    """
+    Reload the index synchronously (e.g. after a sync job wrote new events).
+    The new index is built without holding the lock, so requests keep using the old one meanwhile.
+    """
+    global _index, _failed_at
+    if not is_enabled():
+        return
+    try:
+        index = build_index()
+    except Exception as e:
+        logger.warning(f"Event index refresh failed, keeping previous index: {str(e)}")
+        return
+    if index is not None:
+        with _lock:
+            _index = index
+            _failed_at = 0.0
+        logger.info(f"Event index loaded: {index.stats()}")
+
+
+def get_index():
+    """
+    The current EventIndex, or None if it cannot be loaded.
+    Cold start loads synchronously; an expired index is served while one background refresh runs.
+    After a failed cold load, None is returned without retrying for EVENT_INDEX_RETRY_SECONDS.
+    """
+    global _refreshing
+    if not is_enabled():
+        return None
+    if _index is None:
+        if _in_backoff():
+            return None
+        with _lock:
+            if _index is None and not _in_backoff():
+                _refreshing = True
+                _refresh()
+        return _index
+    if time.time() - _index.loaded_at > env_int("EVENT_INDEX_REFRESH_SECONDS", 900):
+        with _lock:
+            if not _refreshing:
+                _refreshing = True
+                threading.Thread(target=_refresh, name="event-index-refresh", daemon=True).start()
+    return _index
+
+
+def query(city: str, state: str = "", days_ahead: int = 30, limit: int = 10, offset: int = 0, start: float = None,
+          near=None):
+    """
+    Upcoming events from the index (window starting at start, default now), or None when the
+    index is unavailable. near=(lat, lon, radius_mi) searches by distance instead of city/state.
+    """
+    index = get_index()
+    if index is None:
+        return None
+    start = time.time() if start is None else start
+    end = start + days_ahead * 86400
+    if near:
+        return index.query_near(near[0], near[1], near[2], start, end, limit, offset)
+    return index.query(city, state, start, end, limit, offset)
+
+
+def stats():
+    return _index.stats() if _index is not None else None
@@ -0,0 +1,232 @@
+import re
+import math
+import time
+import logging
+from array import array
+
+import forecast_store
+from event_index import parse_event_time
+from env_config import env_float
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Weather-aware event recommendations.
+#
+# Every candidate event is classified as indoor or outdoor from its category,
+# venue and description (keyword evidence, venue and category weighted above
+# free text), then scored against the weather expected at its start time: the
+# stored hourly forecast for the event's market when one covers that hour, the
+# current conditions otherwise. Outdoor events gain in good weather and drop
+# with heat, cold, rain and wind; indoor events are steady and gain a little
+# when it is bad outside. Sooner events get a small boost.
+#
+# Scoring runs column-wise over the whole candidate set (one array per input),
+# so ranking a few hundred events is a handful of list passes. Used by the
+# agent's prompt builder and by /api/events?sort=recommended.
+#
+# Configure with:
+#   RECOMMEND_IDEAL_TEMP_F    - most comfortable outdoor temperature (default 72)
+#   RECOMMEND_HORIZON_HOURS   - how quickly the "sooner is better" boost decays (default 168)
+
+OUTDOOR_TERMS = {
+    "outdoor": 3, "outdoors": 3, "open-air": 3, "park": 2, "beach": 2, "garden": 2, "gardens": 2,
+    "festival": 1, "fair": 1, "market": 1, "farmers": 2, "waterfront": 2, "harbor": 1, "trail": 2,
+    "hike": 2, "hiking": 2, "run": 1, "5k": 2, "10k": 2, "marathon": 2, "race": 1, "parade": 2,
+    "picnic": 2, "fireworks": 2, "stadium": 1, "field": 1, "amphitheater": 2, "pavilion": 1,
+    "lawn": 2, "plaza": 1, "boardwalk": 2, "kayak": 2, "paddle": 2, "bike": 1, "cycling": 1,
+    "sports": 1, "golf": 2, "zoo": 1, "rooftop": 1, "patio": 1, "street": 1, "block": 1, "camping": 2
+}
+INDOOR_TERMS = {
+    "indoor": 3, "indoors": 3, "museum": 2, "theater": 2, "theatre": 2, "gallery": 2, "library": 2,
+    "hall": 1, "arena": 1, "center": 1, "centre": 1, "auditorium": 2, "cinema": 2, "film": 1,
+    "movie": 1, "conference": 2, "convention": 2, "workshop": 1, "class": 1, "lecture": 2,
+    "seminar": 2, "webinar": 3, "online": 3, "virtual": 3, "bar": 1, "brewery": 1, "restaurant": 1,
+    "cafe": 1, "club": 1, "lounge": 1, "ballroom": 2, "hotel": 1, "church": 1, "studio": 1,
+    "comedy": 1, "opera": 2, "symphony": 1, "exhibit": 1, "exhibition": 1, "aquarium": 2, "mall": 2
+}
+FIELD_WEIGHTS = {"category": 2.0, "location": 2.0, "title": 1.0, "description": 0.5}
+WET_WORDS = ("rain", "shower", "drizzle", "storm", "thunder")
+SNOW_WORDS = ("snow", "sleet", "ice", "blizzard")
+_WORD_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)?")
+
+
+def classify(event: dict):
+    """("indoor" | "outdoor" | "unknown", probability the event is outdoors)"""
+    outdoor = indoor = 0.0
+    for field, weight in FIELD_WEIGHTS.items():
+        for word in _WORD_RE.findall((event.get(field) or "").lower()):
+            outdoor += OUTDOOR_TERMS.get(word, 0) * weight
+            indoor += INDOOR_TERMS.get(word, 0) * weight
+    if not outdoor and not indoor:
+        return "unknown", 0.5
+    # Logistic on the evidence difference: one strong term is decisive, weak mixed evidence stays near 0.5
+    probability = 1 / (1 + math.exp(-(outdoor - indoor) / 2))
+    if probability >= 0.6:
+        return "outdoor", probability
+    if probability <= 0.4:
+        return "indoor", probability
+    return "unknown", probability
+
+
+def _current_values(weather: dict):
+    """Current conditions (the /api/weather shape) -> forecast-style values, or None"""
+    if not weather or weather.get("_is_mock") or weather.get("temperature") is None:
+        return None
+    description = (weather.get("description") or "").lower()
+    return {
+        "temp_f": float(weather.get("temperature")),
+        "wind_mph": float(weather.get("wind_speed") or 0),
+        "chance_of_rain": 80.0 if any(word in description for word in WET_WORDS) else 0.0,
+        "chance_of_snow": 80.0 if any(word in description for word in SNOW_WORDS) else 0.0,
+        "description": weather.get("description") or ""
+    }
+
+
+def expected_weather(events, starts, city: str = "", state: str = "", weather: dict = None):
+    """
+    Column-wise weather at each event's start: (known, temp_f, precip, wind_mph, descriptions),
+    where precip is the larger of the rain/snow chance (0-1) and known[i] == 0 means no data.
+    The event's market forecast is used where it covers the start, then the current conditions.
+    """
+    count = len(events)
+    known = array("b", bytes(count))
+    temp = array("f", bytes(4 * count))
+    precip = array("f", bytes(4 * count))
+    wind = array("f", bytes(4 * count))
+    descriptions = [""] * count
+
+    # Group rows by market so each forecast is interpolated once for all its events
+    groups = {}
+    for i, event in enumerate(events):
+        if starts[i] is None:
+            continue
+        market = forecast_store.find_market(event.get("city") or city, event.get("state") or state) \
+            or forecast_store.find_market(lat=event.get("lat"), lon=event.get("lon"))
+        if market is not None:
+            groups.setdefault((market["city"], market["state"]), []).append(i)
+
+    for (market_city, market_state), rows in groups.items():
+        forecast = forecast_store.get_forecast(market_city, market_state)
+        if forecast is None:
+            continue
+        covered, columns, texts = forecast.at_many([starts[i] for i in rows])
+        for j, i in enumerate(rows):
+            if covered[j]:
+                known[i] = 1
+                temp[i] = columns["temp_f"][j]
+                precip[i] = max(columns["chance_of_rain"][j], columns["chance_of_snow"][j]) / 100
+                wind[i] = columns["wind_mph"][j]
+                descriptions[i] = texts[j]
+
+    current = _current_values(weather)
+    if current is not None:
+        fallback_precip = max(current["chance_of_rain"], current["chance_of_snow"]) / 100
+        for i in range(count):
+            if not known[i]:
+                known[i] = 1
+                temp[i] = current["temp_f"]
+                precip[i] = fallback_precip
+                wind[i] = current["wind_mph"]
+                descriptions[i] = current["description"]
+    return known, temp, precip, wind, descriptions
+
+
+def score_events(events, city: str = "", state: str = "", weather: dict = None, now: float = None):
+    """
+    Scores (0-1, higher is better) for events, plus the per-event details used to explain them.
+    weather is the current conditions for the city (used where no forecast covers an event).
+    """
+    now = time.time() if now is None else now
+    ideal = env_float("RECOMMEND_IDEAL_TEMP_F", 72.0)
+    horizon = env_float("RECOMMEND_HORIZON_HOURS", 168.0)
+
+    starts = [parse_event_time(event.get("date")) for event in events]
+    labels, probabilities = [], array("f")
+    for event in events:
+        label, probability = classify(event)
+        labels.append(label)
+        probabilities.append(probability)
+    known, temp, precip, wind, descriptions = expected_weather(events, starts, city, state, weather)
+
+    # Outdoor suitability 0-1: comfort falls off 30°F either side of ideal, rain/snow and wind over 15 mph cut it
+    comfort = [max(0.0, 1 - abs(t - ideal) / 30) for t in temp]
+    calm = [1 - 0.5 * min(1.0, max(0.0, w - 15) / 20) for w in wind]
+    suitability = [
+        c * (1 - p) * m if k else 0.5
+        for c, p, m, k in zip(comfort, precip, calm, known)
+    ]
+    fit = [
+        p * s + (1 - p) * (0.6 + 0.4 * (1 - s))
+        for p, s in zip(probabilities, suitability)
+    ]
+    soonness = [
+        math.exp(-max(0.0, start - now) / 3600 / horizon) if start is not None else 0.0
+        for start in starts
+    ]
+    scores = array("f", (0.75 * f + 0.25 * s for f, s in zip(fit, soonness)))
+
+    details = [
+        {
+            "setting": labels[i],
+            "forecast": {
+                "temperature": round(temp[i]),
+                "precipitation_chance": round(precip[i] * 100),
+                "wind_speed": round(wind[i]),
+                "description": descriptions[i]
+            } if known[i] else None
+        }
+        for i in range(len(events))
+    ]
+    return scores, details
+
+
+def rank(events, city: str = "", state: str = "", weather: dict = None, limit: int = None):
+    """
+    Events ordered best first, each copied with a "recommendation" entry
+    ({score, setting, forecast}); ties keep the input (date) order.
+    """
+    events = list(events or [])
+    if not events:
+        return []
+    started = time.monotonic()
+    scores, details = score_events(events, city, state, weather)
+    order = sorted(range(len(events)), key=lambda i: -scores[i])
+    if limit is not None:
+        order = order[:limit]
+    ranked = [
+        dict(events[i], recommendation=dict(details[i], score=round(scores[i], 3)))
+        for i in order
+    ]
+    logger.info(f"Ranked {len(events)} events for {city or 'all cities'} in {(time.monotonic() - started) * 1000:.1f}ms")
+    return ranked
+
+
+def describe(event: dict):
+    """Short explanation of a ranked event's recommendation, e.g. "outdoor, 74°F, partly cloudy" """
+    recommendation = event.get("recommendation") or {}
+    parts = [recommendation["setting"]] if recommendation.get("setting") not in (None, "unknown") else []
+    forecast = recommendation.get("forecast")
+    if forecast:
+        parts.append(f"{forecast['temperature']}°F")
+        if forecast["precipitation_chance"] >= 30:
+            parts.append(f"{forecast['precipitation_chance']}% chance of rain")
+        elif forecast.get("description"):
+            parts.append(forecast["description"].lower())
+    return ", ".join(parts)
+
+
+def weather_note(weather: dict):
+    """One-line hint on indoor vs outdoor plans for the current conditions"""
+    current = _current_values(weather)
+    if current is None:
+        return "Check event details for indoor/outdoor status."
+    comfort = max(0.0, 1 - abs(current["temp_f"] - env_float("RECOMMEND_IDEAL_TEMP_F", 72.0)) / 30)
+    suitability = comfort * (1 - max(current["chance_of_rain"], current["chance_of_snow"]) / 100)
+    if suitability >= 0.75:
+        return "Perfect weather for outdoor events!"
+    if suitability >= 0.5:
+        return "Nice weather for outdoor activities."
+    if suitability < 0.3:
+        return "Consider indoor events due to weather."
+    return "Check event details for indoor/outdoor status."
@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+import requests
+from datetime import datetime, timedelta, timezone
+
+import quota
+import event_index
+from markets import MARKETS
+from env_config import env_flag, env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Incremental Eventbrite ingestion into the events index.
+#
+# For every market, events changed since the market's stored high-water mark
+# are pulled from Eventbrite (all result pages), normalized to the events
+# schema and merged into wherever the event index reads from: the local JSON
+# snapshot (EVENT_INDEX_SNAPSHOT_PATH) or the Azure Search events index via
+# mergeOrUpload. The high-water mark is the latest "changed" timestamp seen
+# and is kept in SQLite, so each run only transfers what changed. Results come
+# in start-date order, so a run that stops early (page cap, quota) records the
+# start date it reached and the next run resumes from there; the mark only
+# advances once a pass has covered the whole window. While the
+# sync is enabled, /api/events stops calling Eventbrite live and reads only
+# from the index; without a snapshot path or Azure Search index to write to,
+# the sync stays off and live calls continue.
+#
+# Run once from the command line (cron, WebJob) with:
+#   python eventbrite_sync.py
+#
+# Configure with:
+#   EVENTBRITE_SYNC_ENABLED     - "true" to run the in-process scheduler and stop live Eventbrite calls
+#   EVENTBRITE_SYNC_SECONDS     - interval between runs (default 1800)
+#   EVENTBRITE_SYNC_DAYS_AHEAD  - how far ahead to ingest (default 60)
+#   EVENTBRITE_SYNC_STATE_PATH  - SQLite file for high-water marks (default: <tmp>/eventbrite_sync.db)
+#   EVENTBRITE_API_TOKEN, EVENT_INDEX_SNAPSHOT_PATH or AZURE_SEARCH_* - source and target
+
+SEARCH_URL = "https://www.eventbriteapi.com/v3/events/search/"
+SEARCH_API_VERSION = "2023-07-01-Preview"
+UPLOAD_BATCH_SIZE = 1000
+MAX_PAGES = 20
+RADIUS_MI = 25
+
+
+def sync_target():
+    """("local", snapshot path) or ("azure", (endpoint, key, index)) for the synced events, or None"""
+    snapshot_path = os.environ.get("EVENT_INDEX_SNAPSHOT_PATH")
+    if snapshot_path:
+        return "local", snapshot_path
+    azure_target = event_index.search_config()
+    return ("azure", azure_target) if azure_target else None
+
+
+def is_enabled():
+    """True when scheduled sync replaces live Eventbrite calls (it needs a token and an index target)"""
+    return (env_flag("EVENTBRITE_SYNC_ENABLED") and bool(os.environ.get("EVENTBRITE_API_TOKEN"))
+            and sync_target() is not None)
+
+
+class SyncState:
+    """Per-market high-water marks in SQLite"""
+
+    def __init__(self, path: str = None):
+        self._lock = threading.Lock()
+        try:
+            self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, timeout=5)
+        except sqlite3.Error as e:
+            logger.warning(f"Sync state at {path} unavailable ({str(e)}), using memory only")
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        # changed: high-water mark; resume_start/pending: progress of an unfinished pass
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS high_water (market TEXT PRIMARY KEY, changed TEXT, synced_at REAL,"
+            " resume_start TEXT, pending TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(high_water)")}
+        for column in ("resume_start", "pending"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE high_water ADD COLUMN {column} TEXT")
+        self._conn.commit()
+
+    def get(self, market: str):
+        """(high-water mark, resume start, pending mark) for a market; all None before the first run"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT changed, resume_start, pending FROM high_water WHERE market = ?", (market,)
+            ).fetchone()
+        return (row[0] or None, row[1], row[2]) if row else (None, None, None)
+
+    def set(self, market: str, changed: str, resume_start: str = None, pending: str = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO high_water (market, changed, synced_at, resume_start, pending)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (market, changed or "", time.time(), resume_start, pending)
+            )
+            self._conn.commit()
+
+    def snapshot(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT market, changed, synced_at, resume_start FROM high_water").fetchall()
+        return {
+            market: {"high_water": changed, "synced_at": synced_at, "resume_start": resume_start}
+            for market, changed, synced_at, resume_start in rows
+        }
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_state():
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                path = os.environ.get("EVENTBRITE_SYNC_STATE_PATH") or os.path.join(tempfile.gettempdir(), "eventbrite_sync.db")
+                _state = SyncState(path)
+    return _state
+
+
+def normalize(event: dict, market: dict):
+    """Eventbrite event -> events schema record (lat/lon kept for the spatial index)"""
+    venue = event.get("venue") or {}
+    address = venue.get("address") or {}
+    description = (event.get("description") or {}).get("text") or ""
+    lat = venue.get("latitude") or address.get("latitude")
+    lon = venue.get("longitude") or address.get("longitude")
+    return {
+        "id": f"eventbrite-{event.get('id', '')}",
+        "title": (event.get("name") or {}).get("text") or "Untitled Event",
+        "description": description[:200] + "..." if len(description) > 200 else description,
+        "date": (event.get("start") or {}).get("utc", ""),
+        "location": (venue.get("name") or "") if isinstance(venue.get("name"), str) else (venue.get("name") or {}).get("text", ""),
+        "city": address.get("city") or market["city"],
+        "state": address.get("region") or market["state"],
+        "category": ", ".join(cat.get("name", "") for cat in (event.get("category") or {}).get("subcategories", [])[:2]) or "General",
+        "url": event.get("url", ""),
+        "lat": float(lat) if lat not in (None, "") else None,
+        "lon": float(lon) if lon not in (None, "") else None,
+        "source": "Eventbrite"
+    }
+
+
+def fetch_changed(market: dict, since: str = None, resume_start: str = None):
+    """
+    (records, newest changed timestamp, next_start) for a market's upcoming events changed after since,
+    starting at resume_start (default now). next_start is None when the window was covered; when paging
+    stops early (quota, page cap) it is the start date reached, for the next run to resume from.
+    """
+    token = os.environ.get("EVENTBRITE_API_TOKEN")
+    now = datetime.now(timezone.utc)
+    window_start = now.strftime("%Y-%m-%dT%H:%M:%SZ")
+    if resume_start and resume_start > window_start:
+        window_start = resume_start
+    params = {
+        "location.latitude": market["lat"],
+        "location.longitude": market["lon"],
+        "location.within": f"{RADIUS_MI}mi",
+        "start_date.range_start": window_start,
+        "start_date.range_end": (now + timedelta(days=env_int("EVENTBRITE_SYNC_DAYS_AHEAD", 60))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "expand": "venue,category",
+        "status": "live",
+        "order_by": "start_asc",
+        "page": 1
+    }
+    if since:
+        params["date_modified.range_start"] = since
+    headers = {
+        "Authorization": f"Bearer {token}"
+    }
+
+    records = []
+    newest = since
+    reached = None  # start date of the last event fetched
+    for _ in range(MAX_PAGES):
+        if not quota.acquire("eventbrite"):
+            logger.warning(f"Eventbrite quota exhausted during sync of {market['city']}, {market['state']}")
+            return records, newest, reached or window_start
+        response = requests.get(SEARCH_URL, params=params, headers=headers, timeout=15)
+        response.raise_for_status()
+        data = response.json()
+        for event in data.get("events", []):
+            records.append(normalize(event, market))
+            changed = event.get("changed")
+            if changed and (newest is None or changed > newest):
+                newest = changed
+            reached = (event.get("start") or {}).get("utc") or reached
+        if not data.get("pagination", {}).get("has_more_items"):
+            return records, newest, None
+        params["page"] += 1
+    logger.info(f"Eventbrite sync of {market['city']}, {market['state']} reached {MAX_PAGES} pages, resuming from {reached}")
+    return records, newest, reached or window_start
+
+
+def merge_local(records, path: str):
+    """Merge records into the JSON snapshot by id, dropping past events; returns the stored count"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = []
+    # Same layouts as event_index.load_snapshot_file: a list, {"value": [...]} or {"events": [...]}
+    key = None
+    if isinstance(data, dict):
+        key = "value" if "value" in data else "events"
+    existing = data.get(key, []) if key else data
+    by_id = {event.get("id"): event for event in existing}
+    for record in records:
+        by_id[record["id"]] = dict(by_id.get(record["id"], {}), **record)
+    now = time.time()
+    kept = [
+        event for event in by_id.values()
+        if (event_index.parse_event_time(event.get("date")) or now) >= now - 86400
+    ]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(data, **{key: kept}) if key else kept, f)
+    os.replace(tmp_path, path)
+    return len(kept)
+
+
+def merge_azure(records, endpoint: str, key: str, index: str):
+    """mergeOrUpload records into the Azure Search events index; returns the number accepted"""
+    url = f"{endpoint}/indexes/{index}/docs/index?api-version={SEARCH_API_VERSION}"
+    headers = {
+        "Content-Type": "application/json",
+        "api-key": key
+    }
+    accepted = 0
+    for i in range(0, len(records), UPLOAD_BATCH_SIZE):
+        batch = []
+        for record in records[i:i + UPLOAD_BATCH_SIZE]:
+            doc = {k: v for k, v in record.items() if k not in ("lat", "lon", "source")}
+            if record.get("lat") is not None and record.get("lon") is not None:
+                doc["location_geo"] = {"type": "Point", "coordinates": [record["lon"], record["lat"]]}
+            doc["@search.action"] = "mergeOrUpload"
+            batch.append(doc)
+        response = requests.post(url, headers=headers, json={"value": batch}, timeout=30)
+        response.raise_for_status()
+        results = response.json().get("value", [])
+        accepted += sum(1 for result in results if result.get("status"))
+        for result in results:
+            if not result.get("status"):
+                logger.warning(f"Azure Search rejected {result.get('key')}: {result.get('errorMessage')}")
+    return accepted
+
+
+def sync_all():
+    """One incremental sync of every market. Returns per-market counts."""
+    if not os.environ.get("EVENTBRITE_API_TOKEN"):
+        logger.warning("EVENTBRITE_API_TOKEN not set, skipping Eventbrite sync")
+        return {}
+    target = sync_target()
+    if target is None:
+        logger.warning("No event index target configured (EVENT_INDEX_SNAPSHOT_PATH or AZURE_SEARCH_*), skipping sync")
+        return {}
+
+    state = get_state()
+    summary = {}
+    changed_any = False
+    for market in MARKETS:
+        market_key = f"{market['city']}|{market['state']}"
+        since, resume_start, pending = state.get(market_key)
+        try:
+            records, newest, next_start = fetch_changed(market, since, resume_start)
+            if records:
+                if target[0] == "local":
+                    merge_local(records, target[1])
+                else:
+                    merge_azure(records, *target[1])
+                changed_any = True
+            # The mark only advances once a whole pass is stored; until then keep the
+            # newest change seen so far and where to resume
+            if pending and (newest is None or pending > newest):
+                newest = pending
+            if next_start is None:
+                if newest != since or resume_start:
+                    state.set(market_key, newest)
+            else:
+                state.set(market_key, since, next_start, newest)
+            summary[market_key] = len(records)
+        except Exception as e:
+            logger.error(f"Eventbrite sync failed for {market_key}: {str(e)}")
+            summary[market_key] = None
+    logger.info(f"Eventbrite sync finished: {summary}")
+    if changed_any:
+        event_index.refresh_now()
+    return summary
+
+
+_scheduler_thread = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler():
+    """Start the background sync loop once per process (when sync is enabled)"""
+    global _scheduler_thread
+    if _scheduler_thread is not None or not is_enabled():
+        return
+    with _scheduler_lock:
+        if _scheduler_thread is not None:
+            return
+        interval = env_int("EVENTBRITE_SYNC_SECONDS", 1800)
+
+        def run():
+            while True:
+                try:
+                    sync_all()
+                except Exception as e:
+                    logger.error(f"Eventbrite sync scheduler error: {str(e)}", exc_info=True)
+                time.sleep(interval)
+
+        _scheduler_thread = threading.Thread(target=run, name="eventbrite-sync", daemon=True)
+        _scheduler_thread.start()
+
+
+def stats():
+    return {"enabled": is_enabled(), "markets": get_state().snapshot()}
+
+
+if __name__ == "__main__":
+    result = sync_all()
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if all(count is not None for count in result.values()) else 1)
@@ -2,156 +2,91 @@ import os
 import requests
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+import geo
+import bm25_index
+import event_aggregator
+import event_index
+import event_ranker
+import eventbrite_sync
+import http_cache
+import quota
+import weather
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Fields an event can be projected to with ?fields=
+EVENT_FIELDS = ("id", "title", "description", "date", "location", "city", "state", "category", "url", "lat", "lon", "distance_mi", "source", "recommendation")
+EVENTBRITE_PAGE_SIZE = 50
+DEFAULT_RADIUS_MI = 25
+MAX_RADIUS_MI = 100
+RECOMMEND_POOL_SIZE = 200  # candidates ranked for ?sort=recommended
+SORT_ORDERS = ("date", "recommended")
+
 def main(req):
     """
     Azure Function for fetching public city events.
     Supports multiple event sources: Eventbrite, Facebook Events, Google Calendar, and Azure Search.
+    Pagination: pass the response's next_cursor back as ?cursor= for the following page.
+    Projection: ?fields=title,date,location,url returns only those fields.
+    Near me: ?lat=..&lon=..&radius_mi=.. (default 25, max 100) returns events within the radius,
+    each with distance_mi, instead of matching city/state.
+    Keyword search: ?q=jazz ranks matching events by relevance instead of date.
+    Recommendations: ?sort=recommended orders events by how well they suit the forecast
+    at their start time (indoor/outdoor), each with a "recommendation" entry.
     """
     try:
+        # Background Eventbrite ingestion, when enabled, keeps the index current
+        eventbrite_sync.start_scheduler()
+
         # Get query parameters
         city = req.params.get("city") or "Norfolk"
         state = req.params.get("state") or ""
         limit = int(req.params.get("limit") or "10")
         days_ahead = int(req.params.get("days_ahead") or "30")  # How many days in the future
-        
-        events = []
-        
-        # Priority 1: Try Azure Search Events Index (if configured)
-        search_endpoint = os.environ.get("AZURE_SEARCH_ENDPOINT")
-        search_key = os.environ.get("AZURE_SEARCH_KEY") or os.environ.get("AZURE_SEARCH_API_KEY")
-        events_index = os.environ.get("AZURE_SEARCH_INDEX_EVENTS")
-        
-        if search_endpoint and search_key and events_index:
-            try:
-                # Search for events in the city
-                search_url = f"{search_endpoint}/indexes/{events_index}/docs/search?api-version=2023-07-01-Preview"
-                headers = {
+        cursor = req.params.get("cursor") or None
+        try:
+            fields = parse_fields(req.params.get("fields"))
+            near = parse_near(req.params.get("lat"), req.params.get("lon"), req.params.get("radius_mi"))
+            query = (req.params.get("q") or "").strip() or None
+            sort = (req.params.get("sort") or "date").strip().lower()
+            if sort not in SORT_ORDERS:
+                raise ValueError(f"Unknown sort '{sort}'; use one of: {', '.join(SORT_ORDERS)}")
+            if sort == "recommended":
+                events, next_cursor = get_recommended_page(city, state, limit, days_ahead, cursor, near, query)
+            else:
+                events, next_cursor = get_events_page(city, state, limit, days_ahead, cursor, fields, near, query)
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "headers": {
                     "Content-Type": "application/json",
-                    "api-key": search_key
-                }
-                
-                # Build filter for city and future dates
-                filters = []
-                if city:
-                    filters.append(f"city eq '{city}'")
-                if state:
-                    filters.append(f"state eq '{state}'")
-                
-                # Filter for future events (events from now onwards)
-                current_date_iso = datetime.now().isoformat() + "Z"
-                filters.append(f"date ge {current_date_iso}")
-                
-                search_body = {
-                    "search": "*",
-                    "filter": " and ".join(filters) if filters else None,
-                    "top": limit,
-                    "orderby": "date asc"  # Show upcoming events first
-                }
-                
-                # Remove None values
-                search_body = {k: v for k, v in search_body.items() if v is not None}
-                
-                logger.info(f"Searching Azure Search for events in {city}, {state}")
-                response = requests.post(search_url, headers=headers, json=search_body, timeout=10)
-                response.raise_for_status()
-                search_results = response.json()
-                
-                if search_results.get("value"):
-                    for item in search_results["value"]:
-                        events.append({
-                            "id": item.get("id", ""),
-                            "title": item.get("title", "Untitled Event"),
-                            "description": item.get("description", ""),
-                            "date": item.get("date", ""),
-                            "location": item.get("location", ""),
-                            "city": item.get("city", city),
-                            "state": item.get("state", state),
-                            "category": item.get("category", "General"),
-                            "url": item.get("url", ""),
-                            "source": "Azure Search"
-                        })
-                    logger.info(f"Found {len(events)} events from Azure Search")
-            except Exception as e:
-                logger.warning(f"Azure Search events error: {str(e)}")
-        
-        # Priority 2: Try Eventbrite API (if configured)
-        eventbrite_token = os.environ.get("EVENTBRITE_API_TOKEN")
-        if eventbrite_token and len(events) < limit:
-            try:
-                # Eventbrite API
-                # First, search for the city location
-                location_query = f"{city}, {state}" if state else city
-                search_url = "https://www.eventbriteapi.com/v3/events/search/"
-                params = {
-                    "q": location_query,
-                    "location.address": location_query,
-                    "location.within": "25mi",  # 25 mile radius
-                    "start_date.range_start": datetime.now().isoformat(),
-                    "start_date.range_end": (datetime.now() + timedelta(days=days_ahead)).isoformat(),
-                    "expand": "venue",
-                    "status": "live",
-                    "order_by": "start_asc"
-                }
-                
-                headers = {
-                    "Authorization": f"Bearer {eventbrite_token}"
-                }
-                
-                logger.info(f"Fetching events from Eventbrite for {location_query}")
-                response = requests.get(search_url, params=params, headers=headers, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                
-                for event in data.get("events", [])[:limit - len(events)]:
-                    start = event.get("start", {})
-                    venue = event.get("venue", {})
-                    
-                    events.append({
-                        "id": f"eventbrite-{event.get('id', '')}",
-                        "title": event.get("name", {}).get("text", "Untitled Event"),
-                        "description": event.get("description", {}).get("text", "")[:200] + "..." if event.get("description", {}).get("text") else "",
-                        "date": start.get("utc", ""),
-                        "location": venue.get("name", {}).get("text", "") if venue else "",
-                        "city": city,
-                        "state": state,
-                        "category": ", ".join([cat.get("name", "") for cat in event.get("category", {}).get("subcategories", [])[:2]]),
-                        "url": event.get("url", ""),
-                        "source": "Eventbrite"
-                    })
-                
-                logger.info(f"Found {len(events)} total events (including Eventbrite)")
-            except Exception as e:
-                logger.warning(f"Eventbrite API error: {str(e)}")
-        
-        # Priority 3: Try Facebook Events (if configured)
-        # Note: Facebook Events API requires app approval and is more complex
-        # For now, we'll skip this and use mock data as fallback
+                    "Access-Control-Allow-Origin": "*"
+                },
+                "body": json.dumps({"error": str(e)})
+            }, 400
         
-        # If no events found, return mock/example events
-        if len(events) == 0:
-            logger.info("No events found from APIs, returning example events")
-            events = get_example_events(city, state, limit)
-        
-        return {
-            "statusCode": 200,
-            "headers": {
+        return http_cache.json_response(
+            req,
+            {
+                "events": project_fields(events, fields),
+                "city": city,
+                "state": state,
+                "count": len(events),
+                "near": {"lat": near[0], "lon": near[1], "radius_mi": near[2]} if near else None,
+                "next_cursor": next_cursor
+            },
+            "events",
+            {
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Methods": "GET, OPTIONS",
                 "Access-Control-Allow-Headers": "Content-Type"
             },
-            "body": json.dumps({
-                "events": events,
-                "city": city,
-                "state": state,
-                "count": len(events)
-            })
-        }, 200
+            fallback=all(event.get("source") == "Example" for event in events)
+        )
         
     except Exception as e:
         logger.error(f"Events error: {str(e)}", exc_info=True)
@@ -164,6 +99,332 @@ def main(req):
             "body": json.dumps({"error": str(e)})
         }, 500
 
+def get_events(city: str = "Norfolk", state: str = "", limit: int = 10, days_ahead: int = 30):
+    """
+    Fetch upcoming events for a city as a list of dicts.
+    Shared by the HTTP handler below and by the agent, which calls it in-process.
+    All registered sources are queried concurrently and merged by date (see event_aggregator).
+    Falls back to example events when no source returns anything.
+    """
+    return get_events_page(city, state, limit, days_ahead)[0]
+
+def get_events_page(city: str, state: str = "", limit: int = 10, days_ahead: int = 30, cursor: str = None, fields=None,
+                    near=None, query: str = None):
+    """
+    One page of events plus the cursor for the next page (None on the last page).
+    fields is passed to the sources so they can skip unneeded data (see project_fields);
+    near=(lat, lon, radius_mi) searches by distance instead of city/state;
+    query switches to keyword search (see search_events).
+    Raises ValueError for a malformed cursor.
+    """
+    if query:
+        return search_events(query, city, state, limit, days_ahead, cursor, fields, near)
+
+    events, next_cursor = event_aggregator.aggregate(
+        city, state, limit, days_ahead, cursor=cursor, fields=fields, near=near
+    )
+
+    # If no events found, return mock/example events (first page only). Example events have
+    # no coordinates, so a radius query with no hits stays empty instead.
+    if len(events) == 0 and not cursor and not near:
+        logger.info("No events found from APIs, returning example events")
+        events = get_example_events(city, state, limit)
+    
+    return events, next_cursor
+
+def get_recommended_page(city: str, state: str = "", limit: int = 10, days_ahead: int = 30, cursor: str = None,
+                         near=None, query: str = None):
+    """
+    One page of events ranked by weather suitability (see event_ranker), as (events, next_cursor).
+    Up to RECOMMEND_POOL_SIZE upcoming events (or keyword matches) are ranked; pages are
+    slices of that ranking, and the cursor pins the window start so every page ranks the same pool.
+    """
+    page = event_aggregator.decode_cursor(cursor) if cursor else {"t": event_aggregator.window_start(), "o": {}}
+    offset = page["o"].get("recommended", 0)
+    pool_cursor = event_aggregator.encode_cursor({"t": page["t"], "o": {}})
+    # Sources get no field projection: classification needs category, venue and description
+    pool, _ = get_events_page(city, state, RECOMMEND_POOL_SIZE, days_ahead, pool_cursor, None, near, query)
+    if not pool and not cursor and not near:
+        pool = get_example_events(city, state, limit)
+    # Current conditions cover events beyond the stored forecast (cached, and ignored if mock)
+    current = weather.get_weather(city, state, near[0], near[1]) if near else weather.get_weather(city, state)
+    ranked = event_ranker.rank(pool, city, state, current)
+    events = ranked[offset:offset + limit]
+    has_more = offset + limit < len(ranked)
+    next_cursor = event_aggregator.encode_cursor({"t": page["t"], "o": {"recommended": offset + limit}}) if has_more else None
+    return events, next_cursor
+
+def search_events(query: str, city: str, state: str = "", limit: int = 10, days_ahead: int = 30, cursor: str = None,
+                  fields=None, near=None):
+    """
+    Upcoming events matching a keyword query, best match first, as (events, next_cursor).
+    Ranked by the local BM25 index when one is configured, otherwise by Azure Search full-text;
+    like /api/search, SEARCH_BACKEND=hybrid also falls through to Azure Search when the local
+    index has no hits, "local" never calls Azure Search and "azure" skips the local index.
+    """
+    page = event_aggregator.decode_cursor(cursor) if cursor else {"t": event_aggregator.window_start(), "o": {}}
+    offset = page["o"].get("search", 0)
+    window_end = page["t"] + days_ahead * 86400
+
+    def where(doc):
+        start = event_index.parse_event_time(doc.get("date"))
+        if start is None or not page["t"] <= start <= window_end:
+            return False
+        if near:
+            coords = event_index.event_coordinates(doc)
+            return bool(coords) and geo.haversine_mi(near[0], near[1], coords[0], coords[1]) <= near[2]
+        return ((not city or (doc.get("city") or "").lower() == city.lower())
+                and (not state or (doc.get("state") or "").lower() == state.lower()))
+
+    # One extra hit tells us whether there is a next page
+    backend = bm25_index.search_backend()
+    hits = bm25_index.search(query, limit + 1, offset, where) if backend != "azure" else None
+    if hits is not None and (hits or backend == "local"):
+        events = []
+        for _, doc in hits[:limit]:
+            event = event_index.normalize_event(doc, "Local Search")
+            if near and event["lat"] is not None:
+                event["distance_mi"] = round(geo.haversine_mi(near[0], near[1], event["lat"], event["lon"]), 1)
+            events.append(event)
+        has_more = len(hits) > limit
+        logger.info(f"Found {len(events)} events for '{query}' in the local search index")
+    else:
+        events = fetch_from_azure_search(city, state, limit, days_ahead, offset, page["t"], fields, near, query)
+        has_more = len(events) >= limit
+
+    next_cursor = event_aggregator.encode_cursor({"t": page["t"], "o": {"search": offset + len(events)}}) if has_more else None
+    return events, next_cursor
+
+def parse_fields(value: str):
+    """?fields=title,date -> ["title", "date"], or None for all fields. Raises ValueError for unknown fields."""
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in EVENT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown event fields: {', '.join(unknown)}. Allowed: {', '.join(EVENT_FIELDS)}")
+    return fields or None
+
+def parse_near(lat, lon, radius_mi):
+    """(lat, lon, radius_mi) for a radius query, or None without coordinates. Raises ValueError for bad input."""
+    if lat in (None, "") and lon in (None, ""):
+        return None
+    coords = geo.parse_coordinates(lat, lon)
+    if not coords:
+        raise ValueError("lat and lon must both be valid coordinates")
+    try:
+        radius = float(radius_mi) if radius_mi not in (None, "") else DEFAULT_RADIUS_MI
+    except ValueError:
+        raise ValueError("radius_mi must be a number")
+    if radius <= 0:
+        raise ValueError("radius_mi must be positive")
+    return coords[0], coords[1], min(radius, MAX_RADIUS_MI)
+
+def project_fields(events, fields):
+    """Reduce each event to the requested fields"""
+    if not fields:
+        return events
+    return [{field: event.get(field, "") for field in fields} for event in events]
+
+def fetch_from_azure_search(city: str, state: str, limit: int, days_ahead: int, offset: int = 0, start: float = None,
+                            fields=None, near=None, query: str = None):
+    """
+    Events from the local event index (snapshot of Azure Search or a JSON file, refreshed
+    in the background), or straight from Azure Search when the index is disabled or could not load.
+    offset is the index position or Azure Search skip; fields becomes the $select list;
+    near uses the index's spatial grid, or a geo.distance filter on location_geo remotely.
+    A keyword query always goes to Azure Search and is ranked by relevance.
+    """
+    indexed = None if query else event_index.query(city, state, days_ahead, limit, offset, start, near)
+    if indexed is not None:
+        logger.info(f"Found {len(indexed)} events in the local event index")
+        return indexed
+
+    events = []
+    search_endpoint = os.environ.get("AZURE_SEARCH_ENDPOINT")
+    search_key = os.environ.get("AZURE_SEARCH_KEY") or os.environ.get("AZURE_SEARCH_API_KEY")
+    events_index = os.environ.get("AZURE_SEARCH_INDEX_EVENTS")
+
+    if search_endpoint and search_key and events_index:
+        try:
+            # Search for events in the city
+            search_url = f"{search_endpoint}/indexes/{events_index}/docs/search?api-version=2023-07-01-Preview"
+            headers = {
+                "Content-Type": "application/json",
+                "api-key": search_key
+            }
+
+            # Build filter for city (or distance) and future dates
+            filters = []
+            if near:
+                filters.append(
+                    f"geo.distance(location_geo, geography'POINT({near[1]} {near[0]})') le {near[2] * 1.609344:.3f}"
+                )
+            else:
+                if city:
+                    filters.append(f"city eq '{city}'")
+                if state:
+                    filters.append(f"state eq '{state}'")
+
+            # Filter for future events (events from the page window start onwards)
+            window_start = datetime.fromtimestamp(start, timezone.utc) if start else datetime.now(timezone.utc)
+            filters.append(f"date ge {window_start.strftime('%Y-%m-%dT%H:%M:%SZ')}")
+
+            # location_geo only exists in indexes created with the geo field; select it only when
+            # coordinates are needed (radius queries or lat/lon/distance output)
+            selected = None
+            if fields:
+                selected = set(fields) - {"source", "lat", "lon", "distance_mi", "recommendation"} | {"id", "title", "date", "location"}
+                if near or {"lat", "lon", "distance_mi"} & set(fields):
+                    selected |= {"location_geo", "city", "state"}
+
+            search_body = {
+                "search": query or "*",
+                "filter": " and ".join(filters) if filters else None,
+                "top": limit,
+                "skip": offset or None,
+                # Only transfer the requested fields (plus what merging and dedupe need)
+                "select": ",".join(sorted(selected)) if selected else None,
+                "orderby": None if query else "date asc"  # Show upcoming events first (relevance for keyword queries)
+            }
+
+            # Remove None values
+            search_body = {k: v for k, v in search_body.items() if v is not None}
+
+            logger.info(f"Searching Azure Search for events in {city}, {state}")
+            response = requests.post(search_url, headers=headers, json=search_body, timeout=10)
+            response.raise_for_status()
+            search_results = response.json()
+
+            if search_results.get("value"):
+                for item in search_results["value"]:
+                    coords = event_index.event_coordinates(item)
+                    event = {
+                        "id": item.get("id", ""),
+                        "title": item.get("title", "Untitled Event"),
+                        "description": item.get("description", ""),
+                        "date": item.get("date", ""),
+                        "location": item.get("location", ""),
+                        "city": item.get("city", city),
+                        "state": item.get("state", state),
+                        "category": item.get("category", "General"),
+                        "url": item.get("url", ""),
+                        "lat": coords[0] if coords else None,
+                        "lon": coords[1] if coords else None,
+                        "source": "Azure Search"
+                    }
+                    if near and coords:
+                        event["distance_mi"] = round(geo.haversine_mi(near[0], near[1], coords[0], coords[1]), 1)
+                    events.append(event)
+                logger.info(f"Found {len(events)} events from Azure Search")
+        except Exception as e:
+            logger.warning(f"Azure Search events error: {str(e)}")
+
+    return events
+
+def fetch_from_eventbrite(city: str, state: str, limit: int, days_ahead: int, offset: int = 0, start: float = None,
+                          fields=None, near=None):
+    """Events from the Eventbrite API (offset maps onto Eventbrite's fixed-size result pages)"""
+    events = []
+    eventbrite_token = os.environ.get("EVENTBRITE_API_TOKEN")
+    if not eventbrite_token:
+        return events
+    if not (quota.available("eventbrite") and quota.acquire("eventbrite")):
+        logger.warning("Eventbrite quota exhausted, skipping Eventbrite")
+        return events
+
+    try:
+        # Eventbrite API
+        # First, search for the city location
+        location_query = f"{city}, {state}" if state else city
+        search_url = "https://www.eventbriteapi.com/v3/events/search/"
+        window_start = datetime.fromtimestamp(start) if start else datetime.now()
+        params = {
+            "q": location_query,
+            "location.address": location_query,
+            "location.within": f"{DEFAULT_RADIUS_MI}mi",
+            "start_date.range_start": window_start.isoformat(),
+            "start_date.range_end": (window_start + timedelta(days=days_ahead)).isoformat(),
+            "expand": "venue",
+            "status": "live",
+            "order_by": "start_asc",
+            "page": offset // EVENTBRITE_PAGE_SIZE + 1
+        }
+        if near:
+            # Search around the user's position instead of the city name
+            location_query = f"{near[0]},{near[1]}"
+            del params["q"], params["location.address"]
+            params["location.latitude"] = near[0]
+            params["location.longitude"] = near[1]
+            params["location.within"] = f"{int(round(near[2]))}mi"
+
+        headers = {
+            "Authorization": f"Bearer {eventbrite_token}"
+        }
+
+        logger.info(f"Fetching events from Eventbrite for {location_query}")
+        response = requests.get(search_url, params=params, headers=headers, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        results = data.get("events", [])[offset % EVENTBRITE_PAGE_SIZE:]
+
+        # The page may run out before limit; take the rest from the next page
+        if len(results) < limit and data.get("pagination", {}).get("has_more_items") and quota.acquire("eventbrite"):
+            params["page"] += 1
+            response = requests.get(search_url, params=params, headers=headers, timeout=10)
+            response.raise_for_status()
+            results += response.json().get("events", [])
+
+        for event in results[:limit]:
+            event_start = event.get("start", {})
+            venue = event.get("venue", {})
+            coords = geo.parse_coordinates(
+                (venue or {}).get("latitude") or (venue or {}).get("address", {}).get("latitude"),
+                (venue or {}).get("longitude") or (venue or {}).get("address", {}).get("longitude")
+            )
+
+            item = {
+                "id": f"eventbrite-{event.get('id', '')}",
+                "title": event.get("name", {}).get("text", "Untitled Event"),
+                "description": event.get("description", {}).get("text", "")[:200] + "..." if event.get("description", {}).get("text") and (not fields or "description" in fields) else "",
+                "date": event_start.get("utc", ""),
+                "location": venue.get("name", {}).get("text", "") if venue else "",
+                "city": city,
+                "state": state,
+                "category": ", ".join([cat.get("name", "") for cat in event.get("category", {}).get("subcategories", [])[:2]]),
+                "url": event.get("url", ""),
+                "lat": coords[0] if coords else None,
+                "lon": coords[1] if coords else None,
+                "source": "Eventbrite"
+            }
+            if near and coords:
+                item["distance_mi"] = round(geo.haversine_mi(near[0], near[1], coords[0], coords[1]), 1)
+            events.append(item)
+
+        logger.info(f"Found {len(events)} events from Eventbrite")
+    except Exception as e:
+        logger.warning(f"Eventbrite API error: {str(e)}")
+
+    return events
+
+# Event sources, queried concurrently by get_events(); earlier sources win duplicate matches.
+# Facebook Events would register here too, but its API requires app approval.
+event_aggregator.register_source(
+    "azure_search",
+    fetch_from_azure_search,
+    enabled=lambda: event_index.is_enabled() or bool(
+        os.environ.get("AZURE_SEARCH_ENDPOINT")
+        and (os.environ.get("AZURE_SEARCH_KEY") or os.environ.get("AZURE_SEARCH_API_KEY"))
+        and os.environ.get("AZURE_SEARCH_INDEX_EVENTS")
+    )
+)
+# With EVENTBRITE_SYNC_ENABLED, Eventbrite events arrive through the index instead of live calls
+event_aggregator.register_source(
+    "eventbrite",
+    fetch_from_eventbrite,
+    enabled=lambda: bool(os.environ.get("EVENTBRITE_API_TOKEN")) and not eventbrite_sync.is_enabled()
+)
+
 def get_example_events(city: str, state: str, limit: int = 10):
     """Generate example events for development/demo"""
     now = datetime.now()
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+import requests
+from array import array
+from datetime import datetime, timezone
+
+import geo
+import quota
+from markets import MARKETS
+from env_config import env_flag, env_float, env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hourly forecast store for our markets.
+#
+# A scheduled ingestion pulls WeatherAPI.com hourly forecasts for every market
+# and keeps them as compact arrays indexed by hour. "Current" conditions and
+# forecasts for an event's start time are then answered by interpolation with
+# no network call; the live current-conditions path is only used when the
+# stored forecast is older than FORECAST_MAX_AGE_SECONDS or does not cover the
+# requested time. Snapshots are written to disk so other workers on the host
+# can reuse them.
+#
+# Configure with:
+#   FORECAST_PREFETCH_ENABLED  - "true" to serve current conditions from forecasts (default off)
+#   FORECAST_REFRESH_SECONDS   - ingestion interval for the background scheduler (default 3600)
+#   FORECAST_MAX_AGE_SECONDS   - forecasts older than this are not used (default 10800)
+#   FORECAST_DAYS              - days of hourly forecast to ingest (default 3)
+#   FORECAST_STORE_DIR         - snapshot directory (default: <tmp>/forecast_store)
+#   FORECAST_MARKET_RADIUS_MI  - coordinates within this distance use the market's forecast (default 15)
+
+DEFAULT_REFRESH_SECONDS = 3600
+DEFAULT_MAX_AGE_SECONDS = 3 * 3600
+NUMERIC_FIELDS = ("temp_f", "feelslike_f", "humidity", "wind_mph", "chance_of_rain", "chance_of_snow")
+
+
+def is_enabled():
+    """True when FORECAST_PREFETCH_ENABLED is switched on"""
+    return env_flag("FORECAST_PREFETCH_ENABLED")
+
+
+def _market_key(city: str, state: str = ""):
+    return f"{(city or '').strip().lower()}|{(state or '').strip().lower()}"
+
+
+class HourlyForecast:
+    """Hourly forecast for one market as parallel arrays starting at start_hour (hours since the epoch, UTC)"""
+
+    def __init__(self, city: str, state: str, start_hour: int, fetched_at: float):
+        self.city = city
+        self.state = state
+        self.start_hour = start_hour
+        self.fetched_at = fetched_at
+        self.series = {field: array("f") for field in NUMERIC_FIELDS}
+        self.condition = array("H")  # index into self.conditions
+        self.is_day = array("b")
+        self.conditions = []  # interned condition texts
+        self.icons = []
+
+    def __len__(self):
+        return len(self.condition)
+
+    def append(self, hour: dict):
+        for field in NUMERIC_FIELDS:
+            self.series[field].append(float(hour.get(field) or 0))
+        text = hour.get("condition", {}).get("text", "")
+        if text not in self.conditions:
+            self.conditions.append(text)
+            self.icons.append(hour.get("condition", {}).get("icon"))
+        self.condition.append(self.conditions.index(text))
+        self.is_day.append(1 if hour.get("is_day") else 0)
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+    def at(self, when: datetime):
+        """Interpolated conditions at a point in time, or None if outside the forecast window"""
+        position = when.timestamp() / 3600 - self.start_hour
+        if position < 0 or position > len(self) - 1:
+            return None
+        lower = int(position)
+        upper = min(lower + 1, len(self) - 1)
+        fraction = position - lower
+        values = {
+            field: series[lower] + (series[upper] - series[lower]) * fraction
+            for field, series in self.series.items()
+        }
+        nearest = lower if fraction < 0.5 else upper
+        values["description"] = self.conditions[self.condition[nearest]]
+        values["icon"] = self.icons[self.condition[nearest]]
+        values["is_day"] = bool(self.is_day[nearest])
+        return values
+
+    def at_many(self, timestamps):
+        """
+        Interpolated numeric series for many epoch timestamps at once, as
+        (covered, {field: array("f")}, descriptions). Rows outside the forecast
+        window have covered[i] == 0 and zero values.
+        """
+        last = len(self) - 1
+        positions = [t / 3600 - self.start_hour for t in timestamps]
+        covered = array("b", (1 if 0 <= p <= last else 0 for p in positions))
+        lowers = [int(p) if c else 0 for p, c in zip(positions, covered)]
+        uppers = [min(lo + 1, last) for lo in lowers]
+        fractions = [p - lo if c else 0.0 for p, lo, c in zip(positions, lowers, covered)]
+        columns = {}
+        for field, series in self.series.items():
+            columns[field] = array("f", (
+                (series[lo] + (series[hi] - series[lo]) * f) if c else 0.0
+                for lo, hi, f, c in zip(lowers, uppers, fractions, covered)
+            ))
+        descriptions = [
+            self.conditions[self.condition[lo if f < 0.5 else hi]] if c else ""
+            for lo, hi, f, c in zip(lowers, uppers, fractions, covered)
+        ]
+        return covered, columns, descriptions
+
+    def to_dict(self):
+        return {
+            "city": self.city,
+            "state": self.state,
+            "start_hour": self.start_hour,
+            "fetched_at": self.fetched_at,
+            "series": {field: list(series) for field, series in self.series.items()},
+            "condition": list(self.condition),
+            "is_day": list(self.is_day),
+            "conditions": self.conditions,
+            "icons": self.icons
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        forecast = cls(data["city"], data["state"], data["start_hour"], data["fetched_at"])
+        for field in NUMERIC_FIELDS:
+            forecast.series[field] = array("f", data["series"][field])
+        forecast.condition = array("H", data["condition"])
+        forecast.is_day = array("b", data["is_day"])
+        forecast.conditions = data["conditions"]
+        forecast.icons = data["icons"]
+        return forecast
+
+
+_forecasts = {}  # market key -> HourlyForecast
+_lock = threading.Lock()
+_scheduler_thread = None
+_scheduler_lock = threading.Lock()
+stats = {"ingest_runs": 0, "ingest_calls": 0, "ingest_errors": 0, "served": 0, "fallbacks": 0}
+
+
+def _count(name: str):
+    with _lock:
+        stats[name] += 1
+
+
+def get_stats():
+    with _lock:
+        return dict(stats)
+
+
+def _store_dir():
+    path = os.environ.get("FORECAST_STORE_DIR") or os.path.join(tempfile.gettempdir(), "forecast_store")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _snapshot_path(city: str, state: str):
+    return os.path.join(_store_dir(), _market_key(city, state).replace("|", "_").replace(" ", "-") + ".json")
+
+
+def ingest_market(city: str, state: str, lat: float = None, lon: float = None):
+    """Fetch and store the hourly forecast for one market. Returns the HourlyForecast or None."""
+    weatherapi_key = os.environ.get("WEATHERAPI_KEY")
+    if not weatherapi_key:
+        logger.warning("WEATHERAPI_KEY not set, cannot ingest forecasts")
+        return None
+
+    params = {
+        "key": weatherapi_key,
+        "q": f"{lat},{lon}" if lat is not None and lon is not None else (f"{city},{state}" if state else city),
+        "days": env_int("FORECAST_DAYS", 3),
+        "aqi": "no",
+        "alerts": "no"
+    }
+    if not quota.available("weatherapi") or not quota.acquire("weatherapi"):
+        logger.warning(f"WeatherAPI quota low, skipping forecast ingestion for {city}, {state}")
+        return None
+    try:
+        _count("ingest_calls")
+        response = requests.get("https://api.weatherapi.com/v1/forecast.json", params=params, timeout=15)
+        response.raise_for_status()
+        data = response.json()
+
+        hours = [hour for day in data["forecast"]["forecastday"] for hour in day["hour"]]
+        if not hours:
+            return None
+        forecast = HourlyForecast(city, state, int(hours[0]["time_epoch"]) // 3600, time.time())
+        for hour in hours:
+            forecast.append(hour)
+    except (requests.exceptions.RequestException, KeyError, IndexError, ValueError) as e:
+        _count("ingest_errors")
+        logger.error(f"Forecast ingestion failed for {city}, {state}: {str(e)}")
+        return None
+
+    with _lock:
+        _forecasts[_market_key(city, state)] = forecast
+    try:
+        with open(_snapshot_path(city, state), "w", encoding="utf-8") as f:
+            json.dump(forecast.to_dict(), f)
+    except OSError as e:
+        logger.warning(f"Could not write forecast snapshot for {city}, {state}: {str(e)}")
+    logger.info(f"Ingested {len(forecast)} hourly forecasts for {city}, {state}")
+    return forecast
+
+
+def refresh_all():
+    """Ingest forecasts for every configured market"""
+    _count("ingest_runs")
+    return sum(1 for market in MARKETS if ingest_market(market["city"], market["state"], market["lat"], market["lon"]))
+
+
+def start_scheduler():
+    """Start the background ingestion scheduler once per process (when prefetch is enabled)"""
+    global _scheduler_thread
+    if _scheduler_thread is not None or not is_enabled():
+        return
+    with _scheduler_lock:
+        if _scheduler_thread is not None:
+            return
+        interval = env_int("FORECAST_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS)
+
+        def run():
+            while True:
+                try:
+                    refresh_all()
+                except Exception as e:
+                    logger.error(f"Forecast scheduler error: {str(e)}", exc_info=True)
+                time.sleep(interval)
+
+        _scheduler_thread = threading.Thread(target=run, name="forecast-ingest", daemon=True)
+        _scheduler_thread.start()
+
+
+def get_forecast(city: str, state: str = ""):
+    """Stored forecast for a market (memory first, then the on-disk snapshot), or None when prefetch is disabled"""
+    if not is_enabled():
+        return None
+    key = _market_key(city, state)
+    forecast = _forecasts.get(key)
+    if forecast is None and not state:
+        # City-only lookups match a market by name
+        forecast = next((f for k, f in list(_forecasts.items()) if k.split("|")[0] == key.split("|")[0]), None)
+    max_age = env_int("FORECAST_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)
+    if forecast is not None and forecast.age() <= max_age:
+        return forecast
+
+    market = find_market(city, state)
+    if market is None:
+        return None
+    try:
+        with open(_snapshot_path(market["city"], market["state"]), encoding="utf-8") as f:
+            loaded = HourlyForecast.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+    if loaded.age() > max_age:
+        return None
+    with _lock:
+        _forecasts[_market_key(market["city"], market["state"])] = loaded
+    return loaded
+
+
+def find_market(city: str = "", state: str = "", lat=None, lon=None):
+    """Configured market matching a city/state, or the nearest one within FORECAST_MARKET_RADIUS_MI of coordinates"""
+    coords = geo.parse_coordinates(lat, lon)
+    if coords:
+        radius = env_float("FORECAST_MARKET_RADIUS_MI", 15.0)
+        nearest = min(MARKETS, key=lambda m: geo.haversine_mi(coords[0], coords[1], m["lat"], m["lon"]))
+        if geo.haversine_mi(coords[0], coords[1], nearest["lat"], nearest["lon"]) <= radius:
+            return nearest
+        return None
+    name = (city or "").strip().lower()
+    state_name = (state or "").strip().lower()
+    for market in MARKETS:
+        if market["city"].lower() == name and (not state_name or market["state"].lower() == state_name):
+            return market
+    return None
+
+
+def current_conditions(city: str = "", state: str = "", lat=None, lon=None):
+    """
+    Current conditions in the weather endpoint's format from the stored forecast,
+    or None when prefetch is disabled, the location is not a market, or the data is too old.
+    """
+    if not is_enabled():
+        return None
+    start_scheduler()
+    market = find_market(city, state, lat, lon)
+    if market is None:
+        return None
+    forecast = get_forecast(market["city"], market["state"])
+    values = forecast.at(datetime.now(timezone.utc)) if forecast else None
+    if values is None:
+        _count("fallbacks")
+        return None
+    _count("served")
+    return {
+        "temperature": round(values["temp_f"]),
+        "feels_like": round(values["feelslike_f"]),
+        "description": values["description"],
+        "icon": values["icon"],
+        "humidity": round(values["humidity"]),
+        "wind_speed": round(values["wind_mph"]),
+        "city": market["city"],
+        "state": market["state"],
+        "country": "US",
+        "timestamp": datetime.now().isoformat(),
+        "_source": "forecast"
+    }
@@ -0,0 +1,77 @@
+import math
+
+# Small geographic helpers shared by the weather cache and event queries.
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_MI = 3958.8
+
+
+def geohash(lat: float, lon: float, precision: int = 5):
+    """Encode coordinates as a geohash (precision 5 is a ~4.9 km x 4.9 km cell)"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if lon >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def haversine_mi(lat1: float, lon1: float, lat2: float, lon2: float):
+    """Great-circle distance in miles"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MI * math.asin(math.sqrt(a))
+
+
+def parse_coordinates(lat, lon):
+    """Return (lat, lon) as floats, or None if missing/invalid"""
+    if lat in (None, "") or lon in (None, ""):
+        return None
+    try:
+        lat_float = float(lat)
+        lon_float = float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat_float <= 90 and -180 <= lon_float <= 180):
+        return None
+    return lat_float, lon_float
+
+
+def grid_cell(lat: float, lon: float, size_deg: float):
+    """Cell of a fixed lat/lon grid containing the point"""
+    return int(math.floor(lat / size_deg)), int(math.floor(lon / size_deg))
+
+
+def grid_cells_within(lat: float, lon: float, radius_mi: float, size_deg: float):
+    """Every grid cell overlapping the bounding box of a circle (a superset; refine with haversine_mi)"""
+    d_lat = radius_mi / 69.0
+    d_lon = radius_mi / max(69.0 * math.cos(math.radians(lat)), 1e-6)
+    min_row, min_col = grid_cell(lat - d_lat, lon - d_lon, size_deg)
+    max_row, max_col = grid_cell(lat + d_lat, lon + d_lon, size_deg)
+    return [(row, col) for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
@@ -0,0 +1,106 @@
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+
+from markets import MARKETS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Persistent geocode cache for "city, state" -> (lat, lon).
+#
+# City coordinates never change, so results are kept in a SQLite file shared
+# by every invocation on the host (with an in-process dict in front of it) and
+# the table is pre-seeded with our supported markets. The Azure Maps weather
+# path therefore normally needs a single upstream call instead of two.
+#
+# Configure with:
+#   GEOCODE_CACHE_PATH - SQLite database file (default: <tmp>/geocode_cache.db)
+
+
+def _key(city: str, state: str = ""):
+    return f"{(city or '').strip().lower()}|{(state or '').strip().lower()}"
+
+
+class GeocodeCache:
+    """SQLite-backed geocode cache with an in-memory read-through layer"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            try:
+                self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS geocodes ("
+                    "key TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL, source TEXT, updated_at REAL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Geocode cache at {path} unavailable ({str(e)}), using memory only")
+                self._conn = None
+        self._seed()
+
+    def _seed(self):
+        for market in MARKETS:
+            # Seed both "city|state" and bare "city" so lookups without a state also hit
+            for state in (market["state"], ""):
+                self._memory[_key(market["city"], state)] = (market["lat"], market["lon"])
+
+    def lookup(self, city: str, state: str = ""):
+        """Return (lat, lon) or None"""
+        key = _key(city, state)
+        coords = self._memory.get(key)
+        if coords or not self._conn:
+            return coords
+        with self._lock:
+            row = self._conn.execute("SELECT lat, lon FROM geocodes WHERE key = ?", (key,)).fetchone()
+        if row:
+            coords = (row[0], row[1])
+            self._memory[key] = coords
+        return coords
+
+    def store(self, city: str, state: str, lat: float, lon: float, source: str = "azure_maps"):
+        key = _key(city, state)
+        self._memory[key] = (lat, lon)
+        if not self._conn:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO geocodes (key, lat, lon, source, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, lat, lon, source, time.time())
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist geocode for {key}: {str(e)}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide geocode cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                path = os.environ.get("GEOCODE_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "geocode_cache.db")
+                _cache = GeocodeCache(path)
+    return _cache
+
+
+def lookup(city: str, state: str = ""):
+    """Cached (lat, lon) for a city, or None"""
+    return get_cache().lookup(city, state)
+
+
+def store(city: str, state: str, lat: float, lon: float, source: str = "azure_maps"):
+    """Remember a geocoding result"""
+    get_cache().store(city, state, lat, lon, source)
@@ -0,0 +1,92 @@
+import json
+import hashlib
+import logging
+
+from env_config import env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Conditional GET support shared by the weather, news and events functions.
+#
+# The ETag is a hash of the canonical JSON payload (sorted keys, no whitespace,
+# volatile fields such as fetch timestamps left out), so identical data always
+# gets the same tag and a matching If-None-Match is answered with an empty 304.
+# Cache-Control lets browsers and the Static Web Apps CDN absorb repeat polls:
+# each endpoint gets a max-age plus a stale-while-revalidate window. Mock or
+# example data is sent with "no-cache" so real data replaces it as soon as an
+# upstream recovers.
+#
+# Configure with:
+#   HTTP_CACHE_<ENDPOINT>_MAX_AGE - fresh lifetime in seconds (e.g. HTTP_CACHE_WEATHER_MAX_AGE)
+#   HTTP_CACHE_<ENDPOINT>_SWR     - stale-while-revalidate window in seconds
+
+CACHE_POLICIES = {
+    "weather": {"max_age": 300, "swr": 600},
+    "news": {"max_age": 600, "swr": 1800},
+    "events": {"max_age": 900, "swr": 3600}
+}
+
+
+def cache_control(endpoint: str, fallback: bool = False):
+    """Cache-Control value for an endpoint; fallback (mock/example) data must be revalidated"""
+    if fallback:
+        return "no-cache"
+    policy = CACHE_POLICIES.get(endpoint, {"max_age": 0, "swr": 0})
+    prefix = f"HTTP_CACHE_{endpoint.upper()}"
+    max_age = env_int(f"{prefix}_MAX_AGE", policy["max_age"])
+    swr = env_int(f"{prefix}_SWR", policy["swr"])
+    return f"public, max-age={max_age}, stale-while-revalidate={swr}"
+
+
+def _strip(value, ignore):
+    if isinstance(value, dict):
+        return {k: _strip(v, ignore) for k, v in value.items() if k not in ignore}
+    if isinstance(value, list):
+        return [_strip(v, ignore) for v in value]
+    return value
+
+
+def compute_etag(payload, ignore=()):
+    """Strong ETag from the canonical JSON form of payload, skipping keys in ignore at any depth"""
+    if ignore:
+        payload = _strip(payload, set(ignore))
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(req, etag: str):
+    """True if the request's If-None-Match covers etag (weak comparison, as RFC 9110 requires for GET)"""
+    headers = getattr(req, "headers", None) or {}
+    header = headers.get("If-None-Match") or headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+
+def json_response(req, payload, endpoint: str, headers: dict, fallback: bool = False, etag_ignore=()):
+    """
+    200 JSON response with ETag and Cache-Control headers, or an empty 304
+    when the client's If-None-Match already has this payload.
+    """
+    etag = compute_etag(payload, etag_ignore)
+    headers = dict(headers)
+    headers["ETag"] = etag
+    headers["Cache-Control"] = cache_control(endpoint, fallback)
+    headers["Access-Control-Expose-Headers"] = "ETag"
+
+    if etag_matches(req, etag):
+        return {
+            "statusCode": 304,
+            "headers": headers,
+            "body": ""
+        }, 304
+
+    return {
+        "statusCode": 200,
+        "headers": headers,
+        "body": json.dumps(payload)
+    }, 200
@@ -0,0 +1,111 @@
+import re
+import logging
+from collections import namedtuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Intent router for the agent.
+#
+# Every intent has a list of keywords/phrases and the context providers it
+# needs (see context_providers.CONTEXT_SOURCES). All keywords are compiled into
+# a single trie-shaped regex with word boundaries, so "temp" no longer matches
+# "temple" or "attempt", and a message is scanned once no matter how many
+# intents are registered. New intents (news, transit, city services, ...) are
+# added with register_intent() and need a matching context source.
+
+Route = namedtuple("Route", ["intents", "providers"])
+
+# name -> {"keywords": [...], "providers": [...]}
+INTENTS = {
+    "weather": {
+        "keywords": [
+            "weather", "temperature", "temp", "forecast", "rain", "raining", "rainy",
+            "snow", "snowing", "snowy", "sunny", "cloudy", "humid", "humidity",
+            "windy", "how hot", "how cold", "what's the weather",
+        ],
+        "providers": ["weather"],
+    },
+    "events": {
+        "keywords": [
+            "event", "activity", "activities", "things to do", "what's happening",
+            "recommendation", "recommend", "suggest", "suggestion", "outdoor", "indoor",
+        ],
+        # Weather is used to make weather-aware event recommendations
+        "providers": ["weather", "events"],
+    },
+}
+
+_keyword_intents = {}
+_pattern = None
+
+
+def _normalize(text: str):
+    """Lowercase, unify apostrophes and collapse whitespace"""
+    return re.sub(r"\s+", " ", text.lower().replace("’", "'")).strip()
+
+
+def _trie_regex(words):
+    """
+    Build a regex alternation shaped like a trie, so shared prefixes are only
+    matched once (e.g. "rain|raining|rainy" -> "rain(?:ing|y)?").
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def to_regex(node):
+        end = "" in node
+        branches = [re.escape(char) + to_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if end else group
+
+    return to_regex(trie)
+
+
+def _compile():
+    """(Re)build the keyword lookup table and the combined regex"""
+    global _pattern
+    _keyword_intents.clear()
+    for name, intent in INTENTS.items():
+        for keyword in intent["keywords"]:
+            _keyword_intents.setdefault(_normalize(keyword), []).append(name)
+
+    # Allow a plural "s" on every keyword ("events", "temps", "suggestions")
+    _pattern = re.compile(r"\b(?P<kw>" + _trie_regex(_keyword_intents) + r")s?\b")
+
+
+def register_intent(name: str, keywords, providers):
+    """Register (or replace) an intent and recompile the router"""
+    INTENTS[name] = {"keywords": list(keywords), "providers": list(providers)}
+    _compile()
+
+
+def route(message: str):
+    """
+    Classify a message into intents with a single regex pass.
+    Returns Route(intents, providers) where providers is the ordered,
+    de-duplicated list of context sources the matched intents need.
+    """
+    intents = set()
+    for match in _pattern.finditer(_normalize(message or "")):
+        intents.update(_keyword_intents.get(match.group("kw"), ()))
+
+    providers = []
+    for name in INTENTS:
+        if name in intents:
+            for provider in INTENTS[name]["providers"]:
+                if provider not in providers:
+                    providers.append(provider)
+
+    return Route(frozenset(intents), providers)
+
+
+_compile()
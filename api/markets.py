@@ -0,0 +1,12 @@
+# Supported markets (kept in sync with MARKET_AREAS in src/hooks/useLocation.tsx).
+# Used to pre-seed the geocode cache and to drive background ingestion jobs.
+
+MARKETS = [
+    {"city": "Norfolk", "state": "VA", "lat": 36.8468, "lon": -76.2852},
+    {"city": "El Paso", "state": "TX", "lat": 31.7619, "lon": -106.4850},
+    {"city": "Atlanta", "state": "GA", "lat": 33.7490, "lon": -84.3880},
+    {"city": "Providence", "state": "RI", "lat": 41.8240, "lon": -71.4128},
+    {"city": "Birmingham", "state": "AL", "lat": 33.5207, "lon": -86.8025},
+    {"city": "Chesterfield", "state": "VA", "lat": 37.3768, "lon": -77.5080},
+    {"city": "Seattle", "state": "WA", "lat": 47.6062, "lon": -122.3321},
+]
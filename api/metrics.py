@@ -0,0 +1,60 @@
+import json
+import logging
+
+import telemetry
+import event_index
+import eventbrite_sync
+import news
+import penny_client
+import quota
+import reply_cache
+import weather
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main(req):
+    """
+    Azure Function exposing in-process metrics for scraping.
+    Returns latency histograms and quota gauges in Prometheus text format by default,
+    or histograms plus cache, provider, quota and breaker stats as JSON with ?format=json.
+    """
+    try:
+        output_format = (req.params.get("format") or "prometheus").lower()
+
+        if output_format == "json":
+            cache = reply_cache.get_cache()
+            return {
+                "statusCode": 200,
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Cache-Control": "no-store",
+                    "Access-Control-Allow-Origin": "*"
+                },
+                "body": json.dumps({
+                    "histograms": telemetry.snapshot(),
+                    "penny_breaker": penny_client.breaker.snapshot(),
+                    "reply_cache": cache.stats() if cache else None,
+                    "weather": weather.cache_stats(),
+                    "news": news.cache_stats(),
+                    "quota": quota.snapshot(),
+                    "event_index": event_index.stats(),
+                    "eventbrite_sync": eventbrite_sync.stats()
+                })
+            }, 200
+
+        return {
+            "statusCode": 200,
+            "headers": {
+                "Content-Type": "text/plain; version=0.0.4",
+                "Cache-Control": "no-store"
+            },
+            "body": telemetry.render_prometheus() + quota.render_prometheus()
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Metrics error: {str(e)}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": str(e)})
+        }, 500
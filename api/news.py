@@ -1,105 +1,84 @@
 import os
 import requests
 import json
+import math
 import logging
 from datetime import datetime, timedelta
 
+import http_cache
+import news_dedupe
+import news_feeds
+import quota
+from markets import MARKETS
+from swr_cache import SWRCache
+from env_config import env_int
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# News cache: one entry per city holding the largest NewsAPI page, so every
+# ?limit= (the live card asks for 3, the feed for 10) is a slice of the same
+# upstream call. Entries are refreshed in the background once they pass the TTL
+# while the cached articles keep being served; concurrent misses share one
+# upstream call. When NewsAPI errors or the quota runs out, the last good
+# articles are served (however old) before falling back to mock data.
+#
+# Each refresh is one NewsAPI call, so the TTL sets the monthly spend: a city
+# that is being viewed costs one call per TTL. The default TTL is the shortest
+# one that keeps refreshes of every market within NEWSAPI_REFRESH_SHARE of the
+# monthly newsapi budget (QUOTA_NEWSAPI_MONTHLY, see quota.py) - about 2 hours
+# for 7 markets on the 3000-call developer plan. A shorter NEWS_CACHE_TTL_SECONDS
+# drains the budget early and news falls back to RSS feeds or mock data for the
+# rest of the month.
+#   NEWS_CACHE_TTL_SECONDS    - how long articles are fresh (default derived from the budget, at least 600)
+#   NEWS_CACHE_STALE_SECONDS  - how long past the TTL they are served while refreshing (default 21600)
+NEWS_PAGE_SIZE = 100  # NewsAPI's maximum pageSize
+MAX_LIMIT = NEWS_PAGE_SIZE
+MIN_CACHE_TTL_SECONDS = 600
+NEWSAPI_REFRESH_SHARE = 0.8  # the rest of the budget covers cities outside MARKETS and the quota reserve
+
+def default_cache_ttl():
+    """Shortest TTL at which refreshing every market stays within NEWSAPI_REFRESH_SHARE of the monthly budget"""
+    monthly = quota.get_limits("newsapi")["monthly"]
+    if not monthly:
+        return MIN_CACHE_TTL_SECONDS
+    refreshes_per_market = monthly * NEWSAPI_REFRESH_SHARE / len(MARKETS)
+    return max(MIN_CACHE_TTL_SECONDS, math.ceil(30 * 86400 / refreshes_per_market))
+
+_news_cache = SWRCache(
+    "news",
+    ttl=env_int("NEWS_CACHE_TTL_SECONDS", default_cache_ttl()),
+    stale_ttl=env_int("NEWS_CACHE_STALE_SECONDS", 6 * 3600)
+)
+
 def main(req):
     """
     Azure Function for fetching local news articles.
-    Uses NewsAPI.org to fetch live local news.
+    Uses NewsAPI.org (cached per city) and local RSS/Atom feeds, see get_news.
     """
     try:
         # Get query parameters
         city = req.params.get("city") or "Norfolk"
-        limit = int(req.params.get("limit") or "10")
+        limit = min(max(int(req.params.get("limit") or "10"), 1), MAX_LIMIT)
         
-        # Get NewsAPI key from environment (required for live news)
-        news_api_key = os.environ.get("NEWS_API_KEY")
+        articles = get_news(city, limit)
         
-        if not news_api_key:
-            logger.warning("NEWS_API_KEY not set, returning mock data")
-            articles = get_mock_news(city)
-        else:
-            # Use NewsAPI to fetch live news
-            try:
-                # Search for local news about the city
-                url = "https://newsapi.org/v2/everything"
-                params = {
-                    "q": f"{city} OR \"{city} local\" OR \"{city} city\"",
-                    "sortBy": "publishedAt",
-                    "language": "en",
-                    "pageSize": limit,
-                    "apiKey": news_api_key
-                }
-                
-                logger.info(f"Fetching news for {city} using NewsAPI")
-                response = requests.get(url, params=params, timeout=15)
-                response.raise_for_status()
-                data = response.json()
-                
-                if data.get("status") == "ok":
-                    articles = [
-                        {
-                            "title": article.get("title", ""),
-                            "description": article.get("description", "") or article.get("content", "")[:200] + "...",
-                            "url": article.get("url", ""),
-                            "publishedAt": article.get("publishedAt", ""),
-                            "source": article.get("source", {}).get("name", "Unknown Source")
-                        }
-                        for article in data.get("articles", [])
-                        if article.get("title") and article.get("url")  # Filter out invalid articles
-                    ]
-                    
-                    # If no articles found, try a broader search
-                    if not articles:
-                        logger.info("No articles found with specific query, trying broader search")
-                        params["q"] = f"{city}"
-                        response = requests.get(url, params=params, timeout=15)
-                        response.raise_for_status()
-                        data = response.json()
-                        
-                        articles = [
-                            {
-                                "title": article.get("title", ""),
-                                "description": article.get("description", "") or article.get("content", "")[:200] + "...",
-                                "url": article.get("url", ""),
-                                "publishedAt": article.get("publishedAt", ""),
-                                "source": article.get("source", {}).get("name", "Unknown Source")
-                            }
-                            for article in data.get("articles", [])
-                            if article.get("title") and article.get("url")
-                        ]
-                    
-                    logger.info(f"Fetched {len(articles)} articles from NewsAPI")
-                else:
-                    logger.warning(f"NewsAPI returned error: {data.get('message', 'Unknown error')}")
-                    articles = get_mock_news(city)
-                    
-            except requests.exceptions.RequestException as e:
-                logger.error(f"NewsAPI request error: {str(e)}")
-                articles = get_mock_news(city)
-            except Exception as e:
-                logger.error(f"NewsAPI error: {str(e)}")
-                articles = get_mock_news(city)
-        
-        return {
-            "statusCode": 200,
-            "headers": {
+        return http_cache.json_response(
+            req,
+            {
+                "articles": articles,
+                "city": city,
+                "count": len(articles)
+            },
+            "news",
+            {
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Methods": "GET, OPTIONS",
                 "Access-Control-Allow-Headers": "Content-Type"
             },
-            "body": json.dumps({
-                "articles": articles,
-                "city": city,
-                "count": len(articles)
-            })
-        }, 200
+            fallback=all(article.get("url") == "#" for article in articles)
+        )
         
     except Exception as e:
         logger.error(f"News error: {str(e)}", exc_info=True)
@@ -112,6 +91,102 @@ def main(req):
             "body": json.dumps({"error": str(e)})
         }, 500
 
+def get_news(city: str = "Norfolk", limit: int = 10):
+    """
+    Latest articles for a city as a list of dicts, newest first.
+    NewsAPI results (from the per-city news cache) are merged with the city's
+    RSS/Atom feeds (news_feeds), one article per URL, and near-duplicate stories
+    are folded into one article with "also_reported_by" (news_dedupe). The last good NewsAPI
+    articles are used when NewsAPI fails, and mock data when no source has anything.
+    """
+    articles = get_newsapi_articles(city)
+    feed_articles = news_feeds.get_articles(city)
+    if articles is None and not feed_articles:
+        return get_mock_news(city)[:limit]
+    return news_dedupe.dedupe(news_feeds.merge(articles or [], feed_articles))[:limit]
+
+def get_newsapi_articles(city: str):
+    """
+    The city's NewsAPI page from the news cache (the last good page when NewsAPI fails),
+    or None when there is no key or nothing was ever fetched.
+    """
+    if not os.environ.get("NEWS_API_KEY"):
+        logger.warning("NEWS_API_KEY not set, skipping NewsAPI")
+        return None
+
+    key = (city or "").strip().lower()
+    try:
+        articles = _news_cache.get_or_load(key, lambda: fetch_news(city))
+    except Exception as e:
+        articles = _news_cache.peek(key)
+        if articles is None:
+            logger.error(f"NewsAPI error: {str(e)}")
+            return None
+        logger.warning(f"NewsAPI error: {str(e)}, serving last good articles for {city}")
+        # Re-store them so NewsAPI is retried once per TTL rather than on every request
+        _news_cache.set(key, articles)
+    return [dict(article) for article in articles]
+
+def fetch_news(city: str):
+    """
+    Fetch the largest page of articles for a city from NewsAPI (no caching).
+    Raises requests.exceptions.RequestException on upstream errors and when the quota is exhausted.
+    """
+    news_api_key = os.environ.get("NEWS_API_KEY")
+    
+    # Search for local news about the city
+    url = "https://newsapi.org/v2/everything"
+    params = {
+        "q": f"{city} OR \"{city} local\" OR \"{city} city\"",
+        "sortBy": "publishedAt",
+        "language": "en",
+        "pageSize": NEWS_PAGE_SIZE,
+        "apiKey": news_api_key
+    }
+    
+    logger.info(f"Fetching news for {city} using NewsAPI")
+    articles = _request_articles(url, params)
+    
+    # If no articles found, try a broader search
+    if not articles:
+        logger.info("No articles found with specific query, trying broader search")
+        params["q"] = f"{city}"
+        articles = _request_articles(url, params)
+    
+    logger.info(f"Fetched {len(articles)} articles from NewsAPI")
+    return articles
+
+def _request_articles(url: str, params: dict):
+    """One NewsAPI call, normalized to the /api/news article shape"""
+    if not (quota.available("newsapi") and quota.acquire("newsapi")):
+        raise requests.exceptions.RequestException("NewsAPI quota exhausted")
+    response = requests.get(url, params=params, timeout=15)
+    response.raise_for_status()
+    data = response.json()
+    
+    if data.get("status") != "ok":
+        raise requests.exceptions.RequestException(f"NewsAPI returned error: {data.get('message', 'Unknown error')}")
+    
+    return [
+        {
+            "title": article.get("title", ""),
+            "description": article.get("description", "") or (article.get("content") or "")[:200] + "...",
+            "url": article.get("url", ""),
+            "publishedAt": article.get("publishedAt", ""),
+            "source": article.get("source", {}).get("name", "Unknown Source")
+        }
+        for article in data.get("articles", [])
+        if article.get("title") and article.get("url")  # Filter out invalid articles
+    ]
+
+def cache_stats():
+    """News cache hit rate, upstream loads and per-feed poll counts"""
+    return {
+        "cache": _news_cache.stats(),
+        "feeds": news_feeds.stats(),
+        "dedupe": news_dedupe.get_stats()
+    }
+
 def get_mock_news(city: str):
     """Generate realistic mock news articles for development"""
     now = datetime.now()
@@ -0,0 +1,165 @@
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from env_config import env_flag, env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Near-duplicate clustering for news articles.
+#
+# The same wire story arrives from many outlets with small edits. Each article
+# gets a 64-bit SimHash over its title (weighted double, outlet suffixes such
+# as " - WAVY" removed) and description, using word unigrams and bigrams.
+# Near-duplicates differ in only a few bits. The signature is split into
+# BANDS bands, and articles are bucketed by (band, value); by the pigeonhole
+# principle, any two signatures within BANDS - 1 bits share a bucket. Only
+# articles in the same bucket are compared, which keeps clustering close to
+# linear in the number of articles. Each cluster keeps its first article (the
+# newest, given newest-first input) with an "also_reported_by" list of the
+# others. Signatures are cached by URL, so repeat polls only hash new articles.
+#
+# Configure with:
+#   NEWS_DEDUPE_ENABLED      - "false" to return articles unclustered (default on)
+#   NEWS_DEDUPE_MAX_DISTANCE - most differing bits for two articles to count as one story (default 6, max 7)
+
+BITS = 64
+BANDS = 8
+BAND_BITS = BITS // BANDS
+DEFAULT_MAX_DISTANCE = 6
+SIGNATURE_CACHE_SIZE = 5000
+TITLE_WEIGHT = 2
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or said says that the this to was were will with".split()
+)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_OUTLET_SUFFIX_RE = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,40}$")
+
+_signatures = OrderedDict()  # url -> (text digest, signature), least recently used first
+_lock = threading.Lock()
+stats = {"signature_hits": 0, "signatures_computed": 0, "articles_in": 0, "articles_out": 0}
+
+
+def is_enabled():
+    return env_flag("NEWS_DEDUPE_ENABLED", True)
+
+
+def _features(title: str, description: str):
+    """Weighted unigram and bigram features of the article text"""
+    title = _OUTLET_SUFFIX_RE.sub("", title or "")
+    weighted = {}
+    for text, weight in ((title, TITLE_WEIGHT), (description or "", 1)):
+        words = [word for word in _WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            weighted[feature] = weighted.get(feature, 0) + weight
+    return weighted
+
+
+def simhash(title: str, description: str = ""):
+    """64-bit SimHash of an article's title and description"""
+    totals = [0] * BITS
+    for feature, weight in _features(title, description).items():
+        value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(BITS):
+            totals[bit] += weight if value >> bit & 1 else -weight
+    signature = 0
+    for bit, total in enumerate(totals):
+        if total > 0:
+            signature |= 1 << bit
+    return signature
+
+
+def signature(article: dict):
+    """SimHash for an article, cached by URL (recomputed if the text behind the URL changed)"""
+    title = article.get("title") or ""
+    description = article.get("description") or ""
+    digest = hashlib.blake2b(f"{title}\n{description}".encode("utf-8"), digest_size=8).digest()
+    url = article.get("url")
+    with _lock:
+        cached = _signatures.get(url) if url else None
+        if cached and cached[0] == digest:
+            _signatures.move_to_end(url)
+            stats["signature_hits"] += 1
+            return cached[1]
+    value = simhash(title, description)
+    with _lock:
+        stats["signatures_computed"] += 1
+        if url:
+            _signatures[url] = (digest, value)
+            _signatures.move_to_end(url)
+            while len(_signatures) > SIGNATURE_CACHE_SIZE:
+                _signatures.popitem(last=False)
+    return value
+
+
+def cluster(signatures, max_distance: int = None):
+    """Cluster ids (the index of each cluster's first member) for a list of signatures"""
+    if max_distance is None:
+        max_distance = env_int("NEWS_DEDUPE_MAX_DISTANCE", DEFAULT_MAX_DISTANCE)
+    max_distance = max(0, min(max_distance, BANDS - 1))  # banding only guarantees BANDS - 1 bits
+    parent = list(range(len(signatures)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    mask = (1 << BAND_BITS) - 1
+    buckets = {}
+    for i, value in enumerate(signatures):
+        for band in range(BANDS):
+            buckets.setdefault((band, value >> (band * BAND_BITS) & mask), []).append(i)
+
+    compared = set()
+    for members in buckets.values():
+        for a_pos, a in enumerate(members):
+            for b in members[a_pos + 1:]:
+                if (a, b) in compared:
+                    continue
+                compared.add((a, b))
+                if bin(signatures[a] ^ signatures[b]).count("1") <= max_distance:
+                    root_a, root_b = find(a), find(b)
+                    if root_a != root_b:
+                        # Lower index wins so each cluster is represented by its first article
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+    return [find(i) for i in range(len(signatures))]
+
+
+def dedupe(articles, max_distance: int = None):
+    """
+    Articles with near-duplicates folded into the first article of each cluster, which
+    gets an "also_reported_by" list of {"source", "url"} for the others. Order is kept.
+    """
+    articles = list(articles)
+    if not is_enabled() or len(articles) < 2:
+        return articles
+    clusters = cluster([signature(article) for article in articles], max_distance)
+
+    kept = {}
+    result = []
+    for i, article in enumerate(articles):
+        root = clusters[i]
+        if root == i:
+            kept[i] = dict(article)
+            result.append(kept[i])
+            continue
+        representative = kept[root]
+        reported = representative.setdefault("also_reported_by", [])
+        if article.get("url") != representative.get("url"):
+            reported.append({"source": article.get("source", ""), "url": article.get("url", "")})
+
+    with _lock:
+        stats["articles_in"] += len(articles)
+        stats["articles_out"] += len(result)
+    if len(result) < len(articles):
+        logger.info(f"Folded {len(articles) - len(result)} near-duplicate articles into {len(result)}")
+    return result
+
+
+def get_stats():
+    with _lock:
+        return dict(stats, signatures_cached=len(_signatures))
@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import calendar
+import html as html_lib
+import logging
+import threading
+import requests
+import feedparser
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from env_config import env_float, env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# RSS/Atom news from local outlets, merged with NewsAPI behind /api/news.
+#
+# Each city has a configurable list of feeds. Feeds that are due are polled
+# concurrently under one deadline with conditional GETs (If-None-Match /
+# If-Modified-Since from the last response), so an unchanged feed costs a 304
+# and no parsing. Changed feeds are parsed and only entries not seen before are
+# normalized into the /api/news article shape; each feed keeps its newest
+# MAX_ENTRIES_PER_FEED articles in memory.
+#
+# Feed config is JSON keyed by city name; a feed is a URL or {"url", "name"}:
+#   {"Norfolk": ["https://example.com/rss", {"url": "https://example.org/atom.xml", "name": "Example News"}]}
+#
+# Configure with:
+#   NEWS_FEEDS               - feed config as inline JSON
+#   NEWS_FEEDS_PATH          - path to a JSON file with the feed config (used when NEWS_FEEDS is not set)
+#   NEWS_FEEDS_POLL_SECONDS  - minimum time between polls of one feed (default 600)
+#   NEWS_FEEDS_DEADLINE_SECONDS - time budget for one round of polling (default 5)
+
+MAX_ENTRIES_PER_FEED = 50
+DEFAULT_POLL_SECONDS = 600
+DEFAULT_DEADLINE_SECONDS = 5.0
+USER_AGENT = "CityConnectHub/1.0 (+news feeds)"
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="news-feed")
+
+
+def load_config():
+    """City (lowercase) -> list of {"url", "name"} from NEWS_FEEDS or NEWS_FEEDS_PATH"""
+    raw = os.environ.get("NEWS_FEEDS")
+    try:
+        if raw:
+            data = json.loads(raw)
+        elif os.environ.get("NEWS_FEEDS_PATH"):
+            with open(os.environ["NEWS_FEEDS_PATH"], encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Invalid news feed config: {str(e)}")
+        return {}
+    config = {}
+    for city, feeds in (data.items() if isinstance(data, dict) else ()):
+        entries = []
+        for feed in feeds if isinstance(feeds, list) else [feeds]:
+            if isinstance(feed, str):
+                entries.append({"url": feed, "name": None})
+            elif isinstance(feed, dict) and feed.get("url"):
+                entries.append({"url": feed["url"], "name": feed.get("name")})
+        config[city.strip().lower()] = entries
+    return config
+
+
+def feeds_for(city: str):
+    return load_config().get((city or "").strip().lower(), [])
+
+
+def _published(entry):
+    """ISO 8601 UTC timestamp for an entry (published, then updated), or "" """
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    if not parsed:
+        return ""
+    return datetime.fromtimestamp(calendar.timegm(parsed), timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def published_epoch(value: str):
+    """publishedAt string -> epoch seconds for ordering (0 when missing or unparseable)"""
+    try:
+        parsed = datetime.fromisoformat((value or "").replace("Z", "+00:00"))
+    except ValueError:
+        return 0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def normalize_entry(entry, source: str):
+    """feedparser entry -> the /api/news article shape"""
+    # Feed summaries are often HTML; keep the text only
+    summary = _strip_tags(entry.get("summary") or entry.get("description") or "")
+    return {
+        "title": (entry.get("title") or "").strip(),
+        "description": summary[:200] + "..." if len(summary) > 200 else summary,
+        "url": entry.get("link", ""),
+        "publishedAt": _published(entry),
+        "source": source
+    }
+
+
+def _strip_tags(html: str):
+    text = []
+    depth = 0
+    for char in html:
+        if char == "<":
+            depth += 1
+        elif char == ">" and depth:
+            depth -= 1
+        elif not depth:
+            text.append(char)
+    return " ".join(html_lib.unescape("".join(text)).split())
+
+
+class FeedState:
+    """Conditional GET validators and the newest articles of one feed"""
+
+    def __init__(self, url: str, name: str = None):
+        self.url = url
+        self.name = name
+        self.etag = None
+        self.last_modified = None
+        self.articles = []  # newest first
+        self.seen = set()   # entry ids already normalized
+        self.polled_at = 0.0
+        self.lock = threading.Lock()
+        self.fetches = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    def due(self, interval: float):
+        return time.time() - self.polled_at >= interval
+
+    def poll(self):
+        """Fetch the feed if it changed and add its new entries. Returns the number of new articles."""
+        with self.lock:
+            self.polled_at = time.time()
+            headers = {"User-Agent": USER_AGENT}
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+            try:
+                self.fetches += 1
+                response = requests.get(self.url, headers=headers, timeout=10)
+                if response.status_code == 304:
+                    self.not_modified += 1
+                    return 0
+                response.raise_for_status()
+                parsed = feedparser.parse(response.content)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"News feed {self.url} failed: {str(e)}")
+                return 0
+
+            self.etag = response.headers.get("ETag") or self.etag
+            self.last_modified = response.headers.get("Last-Modified") or self.last_modified
+            source = self.name or parsed.get("feed", {}).get("title") or self.url
+
+            added = []
+            current = set()
+            for entry in parsed.get("entries", []):
+                entry_id = entry.get("id") or entry.get("link")
+                if not entry_id:
+                    continue
+                current.add(entry_id)
+                if entry_id in self.seen:
+                    continue
+                article = normalize_entry(entry, source)
+                if article["title"] and article["url"]:
+                    added.append(article)
+            # Ids only need remembering while the feed still lists them
+            self.seen = current
+            if added:
+                merged = sorted(added + self.articles, key=lambda a: published_epoch(a["publishedAt"]), reverse=True)
+                self.articles = merged[:MAX_ENTRIES_PER_FEED]
+            logger.info(f"News feed {self.url}: {len(added)} new articles")
+            return len(added)
+
+    def stats(self):
+        return {
+            "articles": len(self.articles),
+            "fetches": self.fetches,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "age_seconds": round(time.time() - self.polled_at, 1) if self.polled_at else None
+        }
+
+
+_feeds = {}  # url -> FeedState
+_feeds_lock = threading.Lock()
+
+
+def _state(feed: dict):
+    with _feeds_lock:
+        state = _feeds.get(feed["url"])
+        if state is None:
+            state = _feeds[feed["url"]] = FeedState(feed["url"], feed.get("name"))
+        return state
+
+
+def get_articles(city: str, deadline: float = None):
+    """
+    Articles from the city's feeds, newest first (empty when none are configured).
+    Feeds due for a poll are fetched concurrently; those that miss the deadline
+    keep serving their previous articles and finish in the background.
+    """
+    feeds = feeds_for(city)
+    if not feeds:
+        return []
+    if deadline is None:
+        deadline = env_float("NEWS_FEEDS_DEADLINE_SECONDS", DEFAULT_DEADLINE_SECONDS)
+    interval = env_int("NEWS_FEEDS_POLL_SECONDS", DEFAULT_POLL_SECONDS)
+
+    states = [_state(feed) for feed in feeds]
+    futures = [_executor.submit(state.poll) for state in states if state.due(interval) and not state.lock.locked()]
+    if futures:
+        _, not_done = wait(futures, timeout=deadline)
+        if not_done:
+            logger.warning(f"{len(not_done)} news feeds for {city} missed the {deadline}s deadline")
+
+    articles = [dict(article) for state in states for article in state.articles]
+    return merge(articles)
+
+
+def merge(*article_lists):
+    """Articles from several sources, newest first, one per URL (the first occurrence wins)"""
+    seen = set()
+    merged = []
+    for articles in article_lists:
+        for article in articles:
+            if article.get("url") in seen:
+                continue
+            seen.add(article.get("url"))
+            merged.append(article)
+    merged.sort(key=lambda article: published_epoch(article.get("publishedAt")), reverse=True)
+    return merged
+
+
+def stats():
+    with _feeds_lock:
+        return {url: state.stats() for url, state in _feeds.items()}
@@ -0,0 +1,478 @@
+import os
+import requests
+import json
+import time
+import random
+import logging
+import threading
+
+from circuit_breaker import CircuitBreaker
+from env_config import env_float, env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Client for the Penny Hugging Face Space (Gradio).
+#
+# predict() uses the blocking /run/predict endpoint and returns the whole reply.
+# stream() uses Gradio's queue protocol (POST /queue/join, then the
+# /queue/data server-sent event stream) and yields partial replies as Penny
+# generates them.
+#
+# Both calls go through a resilience layer: a circuit breaker (with half-open
+# probing) stops callers piling onto a failing Space, and a cold Space (asleep
+# or starting) is detected up front so callers get a fast 503 with Retry-After
+# instead of holding a worker for the full timeout. An optional keep-alive
+# scheduler pings the Space so it does not go to sleep.
+#
+# Configure with:
+#   PENNY_SPACE_URL            - Gradio Space URL
+#   PENNY_SPACE_ID             - Space repo id used for runtime status (default pythonprincess/Penny_V2.2)
+#   PENNY_BREAKER_FAILURES     - consecutive failures before the breaker opens (default 3)
+#   PENNY_BREAKER_RESET        - seconds before a half-open probe is allowed (default 30)
+#   PENNY_BREAKER_PROBE_TIMEOUT - seconds after which an unanswered probe is abandoned (default 120)
+#   PENNY_KEEPALIVE_SECONDS    - keep-alive ping interval, 0 disables (default 0)
+#   PENNY_PAYLOAD_LOG_SAMPLE_RATE - fraction of payloads logged at DEBUG level (default 0.01)
+#
+# Space: pythonprincess/Penny_V2.2
+# URL: https://huggingface.co/spaces/pythonprincess/Penny_V2.2
+
+DEFAULT_SPACE_URL = "https://pythonprincess-penny-v2-2.hf.space"
+DEFAULT_SPACE_ID = "pythonprincess/Penny_V2.2"
+FN_INDEX = 1  # chat_with_penny_sync function index
+PREDICT_TIMEOUT = 60  # Gradio can take time
+CONNECT_TIMEOUT = 5
+STATUS_TIMEOUT = 3
+STATUS_CACHE_SECONDS = 15
+RUNNING_CACHE_SECONDS = 300  # a Space that just answered will not be asleep
+STARTING_RETRY_AFTER = 30
+NO_RESPONSE = "I'm sorry, I didn't get a response."
+
+# Hugging Face runtime stages that mean the Space cannot answer right now
+COLD_STAGES = ("SLEEPING", "PAUSED", "BUILDING", "APP_STARTING", "RUNNING_APP_STARTING", "STOPPED")
+
+
+class PennyAPIError(Exception):
+    """Raised when the Penny Space answers with an error status"""
+
+    def __init__(self, status_code: int, details: str):
+        super().__init__(f"Penny API error: {status_code}")
+        self.status_code = status_code
+        self.details = details
+
+
+class PennyUnavailableError(PennyAPIError):
+    """Raised without calling the Space when it is starting up or the circuit is open"""
+
+    def __init__(self, reason: str, retry_after: int, details: str = ""):
+        super().__init__(503, details or reason)
+        self.reason = reason  # "starting" or "circuit_open"
+        self.retry_after = retry_after
+
+
+breaker = CircuitBreaker(
+    "penny",
+    failure_threshold=env_int("PENNY_BREAKER_FAILURES", 3),
+    reset_timeout=env_float("PENNY_BREAKER_RESET", 30.0),
+    probe_timeout=env_float("PENNY_BREAKER_PROBE_TIMEOUT", 2.0 * PREDICT_TIMEOUT)
+)
+
+# Last observed Space runtime stage: (stage, observed_at)
+_space_stage = (None, 0.0)
+_stage_lock = threading.Lock()
+_keepalive_thread = None
+_keepalive_lock = threading.Lock()
+# One wake-up ping per cold period: (in flight, started_at)
+_wake_state = {"in_flight": False, "started_at": 0.0}
+_wake_lock = threading.Lock()
+
+
+def get_space_url():
+    """Penny Hugging Face Space URL"""
+    return os.environ.get("PENNY_SPACE_URL", DEFAULT_SPACE_URL).rstrip("/")
+
+
+def get_headers(token: str):
+    """Headers for Hugging Face Space"""
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {token}" if token else None
+    }
+    # Remove None values
+    return {k: v for k, v in headers.items() if v is not None}
+
+
+def build_payload(message: str, city: str, history, session_id: str):
+    """
+    Prepare Gradio API request
+    Gradio expects: { fn_index, data: [message, city, history], session_hash, event_data }
+    """
+    return {
+        "fn_index": FN_INDEX,
+        "data": [
+            message,
+            city,
+            history
+        ],
+        "session_hash": session_id,
+        "event_data": None
+    }
+
+
+def parse_result(response_data, history):
+    """
+    Extract (history_array, bot_reply) from Gradio output data.
+    Gradio returns: { data: [chatbot_history, cleared_message] }
+    chatbot_history is array of [user_msg, bot_msg] tuples
+    """
+    if isinstance(response_data, list) and len(response_data) > 0:
+        history_array = response_data[0] if isinstance(response_data[0], list) else []
+        last_message = history_array[-1] if history_array else None
+        bot_reply = last_message[1] if last_message and len(last_message) > 1 else NO_RESPONSE
+    else:
+        bot_reply = NO_RESPONSE
+        history_array = history
+    return history_array, bot_reply
+
+
+def log_payload(gradio_payload: dict):
+    """Log the Gradio payload at debug level for a sample of requests (PENNY_PAYLOAD_LOG_SAMPLE_RATE)"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() < env_float("PENNY_PAYLOAD_LOG_SAMPLE_RATE", 0.01):
+        logger.debug(f"Payload: {json.dumps(gradio_payload)}")
+
+
+def predict(message: str, city: str, history, session_id: str, token: str):
+    """
+    Call Penny through /run/predict and wait for the full reply.
+    Returns (response_data, history_array, bot_reply).
+    """
+    check_available(token)
+    predict_endpoint = f"{get_space_url()}/run/predict"
+    gradio_payload = build_payload(message, city, history, session_id)
+
+    logger.info(f"Calling Penny Space: {predict_endpoint}")
+    log_payload(gradio_payload)
+
+    try:
+        response = requests.post(
+            predict_endpoint,
+            headers=get_headers(token),
+            json=gradio_payload,
+            timeout=(CONNECT_TIMEOUT, PREDICT_TIMEOUT)
+        )
+    except requests.exceptions.RequestException:
+        breaker.record_failure()
+        raise
+
+    if not response.ok:
+        logger.error(f"Penny API error: {response.status_code} - {response.text}")
+        _raise_for_response(response)
+
+    breaker.record_success()
+    _mark_running()
+    result = response.json()
+    response_data = result.get("data", result)
+    history_array, bot_reply = parse_result(response_data, history)
+    return response_data, history_array, bot_reply
+
+
+def stream(message: str, city: str, history, session_id: str, token: str):
+    """
+    Call Penny through the Gradio queue and yield events as they arrive:
+      {"type": "queue", "position": int, "eta": float}   - waiting in the Space queue
+      {"type": "token", "delta": str}                    - new text of Penny's reply
+      {"type": "done", "data": ..., "history": [...], "response": str}
+    Raises PennyAPIError / requests exceptions on failure.
+    """
+    check_available(token)
+    space_url = get_space_url()
+    headers = get_headers(token)
+    gradio_payload = build_payload(message, city, history, session_id)
+
+    logger.info(f"Joining Penny queue: {space_url}/queue/join")
+    log_payload(gradio_payload)
+    try:
+        join_response = requests.post(
+            f"{space_url}/queue/join",
+            headers=headers,
+            json=gradio_payload,
+            timeout=(CONNECT_TIMEOUT, PREDICT_TIMEOUT)
+        )
+        if not join_response.ok:
+            logger.error(f"Penny queue join error: {join_response.status_code} - {join_response.text}")
+            _raise_for_response(join_response)
+
+        # Read timeout applies between SSE messages (Gradio sends heartbeats)
+        data_response = requests.get(
+            f"{space_url}/queue/data",
+            headers={**headers, "Accept": "text/event-stream"},
+            params={"session_hash": session_id},
+            stream=True,
+            timeout=(CONNECT_TIMEOUT, PREDICT_TIMEOUT)
+        )
+        if not data_response.ok:
+            logger.error(f"Penny queue stream error: {data_response.status_code} - {data_response.text}")
+            _raise_for_response(data_response)
+    except PennyAPIError:
+        # Failures were already recorded by _raise_for_response()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+
+    output_data = None
+    reply_so_far = ""
+    try:
+        for msg in _iter_sse(data_response):
+            kind = msg.get("msg")
+
+            if kind == "estimation":
+                yield {"type": "queue", "position": msg.get("rank"), "eta": msg.get("rank_eta")}
+
+            elif kind in ("process_generating", "process_completed"):
+                output = msg.get("output") or {}
+                if kind == "process_completed" and not msg.get("success", True):
+                    raise PennyAPIError(502, output.get("error") or "Penny generation failed")
+
+                output_data = _apply_output(output_data, output.get("data"))
+                _, partial = parse_result(output_data, history)
+                if partial != NO_RESPONSE and isinstance(partial, str):
+                    if partial.startswith(reply_so_far):
+                        delta = partial[len(reply_so_far):]
+                    else:
+                        # Penny rewrote earlier text; resend the whole reply
+                        delta = partial
+                    if delta:
+                        yield {"type": "token", "delta": delta}
+                    reply_so_far = partial
+
+                if kind == "process_completed":
+                    break
+
+            elif kind == "close_stream":
+                break
+    except GeneratorExit:
+        # The client went away mid-stream: no verdict on the Space, free the probe slot
+        breaker.release_probe()
+        raise
+    except BaseException:
+        # Network, parse and generation errors all count against the Space
+        breaker.record_failure()
+        raise
+    finally:
+        data_response.close()
+
+    breaker.record_success()
+    _mark_running()
+
+    history_array, bot_reply = parse_result(output_data, history)
+    yield {"type": "done", "data": output_data, "history": history_array, "response": bot_reply}
+
+
+def check_available(token: str = None):
+    """
+    Fail fast (PennyUnavailableError) when the circuit is open or the Space is
+    known to be asleep/starting, instead of waiting for a cold-start timeout.
+    """
+    if not breaker.allow():
+        raise PennyUnavailableError(
+            "circuit_open",
+            breaker.retry_after(),
+            "Penny is temporarily unavailable after repeated failures"
+        )
+
+    stage = get_space_stage(token)
+    if stage in COLD_STAGES:
+        # Release the half-open probe slot we may have taken; this is not a failure
+        breaker.release_probe()
+        wake_space(token)
+        raise PennyUnavailableError(
+            "starting",
+            STARTING_RETRY_AFTER,
+            f"Penny is starting up (Space stage: {stage}), please retry shortly"
+        )
+
+
+def get_space_stage(token: str = None):
+    """
+    Runtime stage of the Space from the Hugging Face API (e.g. RUNNING, SLEEPING,
+    APP_STARTING), cached briefly so concurrent callers share one lookup.
+    Returns None when the stage cannot be determined.
+    """
+    global _space_stage
+    if _stage_is_fresh():
+        return _space_stage[0]
+
+    with _stage_lock:
+        if _stage_is_fresh():
+            return _space_stage[0]
+        space_id = os.environ.get("PENNY_SPACE_ID", DEFAULT_SPACE_ID)
+        try:
+            response = requests.get(
+                f"https://huggingface.co/api/spaces/{space_id}/runtime",
+                headers=get_headers(token),
+                timeout=STATUS_TIMEOUT
+            )
+            stage = response.json().get("stage") if response.ok else None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Could not read Penny Space status: {str(e)}")
+            stage = None
+        _space_stage = (stage, time.monotonic())
+        return stage
+
+
+def _stage_is_fresh():
+    stage, observed_at = _space_stage
+    max_age = RUNNING_CACHE_SECONDS if stage == "RUNNING" else STATUS_CACHE_SECONDS
+    return time.monotonic() - observed_at < max_age
+
+
+def _mark_running():
+    """Record that the Space just answered, so the hot path skips status lookups"""
+    global _space_stage
+    _space_stage = ("RUNNING", time.monotonic())
+
+
+def wake_space(token: str = None):
+    """
+    Send a non-blocking request that makes Hugging Face start a sleeping Space.
+    At most one wake ping runs at a time, and a new one starts no sooner than
+    STARTING_RETRY_AFTER seconds after the last, so a burst of requests during a
+    cold start does not pile pings onto the Space.
+    """
+    with _wake_lock:
+        if _wake_state["in_flight"] or time.monotonic() - _wake_state["started_at"] < STARTING_RETRY_AFTER:
+            return
+        _wake_state["in_flight"] = True
+        _wake_state["started_at"] = time.monotonic()
+
+    def run():
+        try:
+            ping(token)
+        finally:
+            with _wake_lock:
+                _wake_state["in_flight"] = False
+
+    threading.Thread(target=run, name="penny-wake", daemon=True).start()
+
+
+def ping(token: str = None):
+    """Lightweight request to the Space (used for wake-up and keep-alive). Returns True if it answered."""
+    try:
+        response = requests.get(f"{get_space_url()}/config", headers=get_headers(token), timeout=PREDICT_TIMEOUT)
+        logger.info(f"Penny keep-alive ping: {response.status_code}")
+        return response.ok
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Penny keep-alive ping failed: {str(e)}")
+        return False
+
+
+def start_keepalive(token: str = None):
+    """
+    Start the background keep-alive scheduler (once per process) when
+    PENNY_KEEPALIVE_SECONDS is set. Each tick pings the Space and refreshes the
+    cached runtime stage.
+    """
+    global _keepalive_thread
+    interval = env_int("PENNY_KEEPALIVE_SECONDS", 0)
+    if interval <= 0 or _keepalive_thread is not None:
+        return
+
+    with _keepalive_lock:
+        if _keepalive_thread is not None:
+            return
+
+        def run():
+            while True:
+                if ping(token):
+                    _mark_running()
+                time.sleep(interval)
+
+        _keepalive_thread = threading.Thread(target=run, name="penny-keepalive", daemon=True)
+        _keepalive_thread.start()
+    logger.info(f"Started Penny keep-alive every {interval}s")
+
+
+def _raise_for_response(response):
+    """Translate an error response into PennyAPIError / PennyUnavailableError and update the breaker"""
+    global _space_stage
+    text = response.text or ""
+    if response.status_code == 503 and ("starting" in text.lower() or "sleeping" in text.lower() or "loading" in text.lower()):
+        # The Space is waking up: remember it so other callers fail fast too
+        _space_stage = ("APP_STARTING", time.monotonic())
+        # Not a failure, but give back the half-open probe slot this call may hold
+        breaker.release_probe()
+        raise PennyUnavailableError("starting", STARTING_RETRY_AFTER, "Penny is starting up, please retry shortly")
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    raise PennyAPIError(response.status_code, text)
+
+
+def _iter_sse(response):
+    """Decode the JSON payloads of a server-sent event stream"""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        try:
+            yield json.loads(line[5:].strip())
+        except ValueError:
+            logger.warning(f"Skipping malformed SSE line: {line[:200]}")
+
+
+def _apply_output(previous, data):
+    """
+    Merge one Gradio output message into the current output data.
+    Newer Gradio versions stream each output as a list of diff operations
+    ([op, path, value]) against the previous value; older ones send full values.
+    """
+    if not isinstance(data, list):
+        return data
+    if previous is None or not isinstance(previous, list) or len(previous) != len(data):
+        previous = [None] * len(data)
+    merged = []
+    for old_value, new_value in zip(previous, data):
+        if _is_diff(new_value):
+            for op, path, value in new_value:
+                old_value = _apply_diff(old_value, op, path, value)
+            merged.append(old_value)
+        else:
+            merged.append(new_value)
+    return merged
+
+
+def _is_diff(value):
+    """True if an output value is a list of Gradio diff operations"""
+    return (
+        isinstance(value, list) and len(value) > 0
+        and all(isinstance(op, list) and len(op) == 3 and op[0] in ("replace", "append", "add", "delete") for op in value)
+    )
+
+
+def _apply_diff(obj, op, path, value):
+    """Apply one Gradio diff operation to a (possibly nested) value"""
+    if not path:
+        if op == "replace":
+            return value
+        if op == "append":
+            return (obj or "") + value
+        return obj
+    target = obj
+    for key in path[:-1]:
+        target = target[key]
+    key = path[-1]
+    if op == "replace":
+        target[key] = value
+    elif op == "append":
+        target[key] += value
+    elif op == "add":
+        if isinstance(target, list):
+            target.insert(key, value)
+        else:
+            target[key] = value
+    elif op == "delete":
+        del target[key]
+    return obj
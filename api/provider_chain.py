@@ -0,0 +1,175 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Adaptive provider chain.
+#
+# Providers are tried in order of a health score (rolling latency, penalised by
+# rolling error rate) and the chain stops at the first valid answer. With
+# mode="race" the two best providers are called at the same time and the
+# fastest valid answer wins; the remaining providers are only tried if both
+# fail. Providers without recent samples have no score and keep their
+# configured position: they rank right behind the nearest scored provider
+# configured before them (or first, if there is none), so the configured
+# priority order is used until there is data to beat it. Old samples expire so a
+# demoted provider gets another chance later. A provider that steps aside on its
+# own (raising ProviderSkipped, e.g. when its quota refuses the call) is counted
+# as skipped, not failed, so rate limiting never demotes it.
+
+WINDOW_SIZE = 20
+WINDOW_SECONDS = 900
+ERROR_PENALTY = 4.0
+
+_race_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="provider-race")
+
+
+class ProviderSkipped(Exception):
+    """Raised by a provider's fetch to step aside without counting a failure"""
+
+
+class ProviderHealth:
+    """Rolling latency/error statistics for one provider"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW_SIZE)  # (timestamp, latency_ms, ok)
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, ok: bool):
+        with self._lock:
+            self.samples.append((time.monotonic(), latency_ms, ok))
+            self.calls += 1
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def _recent(self):
+        cutoff = time.monotonic() - WINDOW_SECONDS
+        return [sample for sample in self.samples if sample[0] >= cutoff]
+
+    def score(self):
+        """Lower is better: average latency scaled up by the error rate; None without recent samples"""
+        with self._lock:
+            recent = self._recent()
+        if not recent:
+            return None
+        # Successful calls set the latency; with none, the failed calls' latency is all we know
+        latencies = [latency for _, latency, ok in recent if ok] or [latency for _, latency, _ in recent]
+        avg_latency = sum(latencies) / len(latencies)
+        error_rate = sum(1 for _, _, ok in recent if not ok) / len(recent)
+        return avg_latency * (1 + ERROR_PENALTY * error_rate)
+
+    def snapshot(self):
+        with self._lock:
+            recent = self._recent()
+            calls, successes, failures, skipped = self.calls, self.successes, self.failures, self.skipped
+        ok_latencies = [latency for _, latency, ok in recent if ok]
+        return {
+            "calls": calls,
+            "successes": successes,
+            "failures": failures,
+            "skipped": skipped,
+            "recent_samples": len(recent),
+            "recent_error_rate": round(sum(1 for _, _, ok in recent if not ok) / len(recent), 3) if recent else None,
+            "recent_avg_latency_ms": round(sum(ok_latencies) / len(ok_latencies), 1) if ok_latencies else None
+        }
+
+
+class ProviderChain:
+    """
+    Runs a list of providers ({"name", "fetch", "enabled"}) until one returns
+    a valid (truthy) result. fetch(*args) may return None or raise to signal failure;
+    enabled() returning False or fetch raising ProviderSkipped skips the provider
+    without counting a failure.
+    """
+
+    def __init__(self, name: str, providers, mode: str = "sequential"):
+        self.name = name
+        self.providers = list(providers)
+        self.mode = (mode or "sequential").strip().lower()
+        self.health = {provider["name"]: ProviderHealth() for provider in self.providers}
+
+    def ordered(self, count_skips: bool = False):
+        """
+        Enabled providers, best score first (ties keep the configured order).
+        Unscored providers take the score of the nearest scored provider configured before them.
+        """
+        candidates = []
+        inherited = float("-inf")
+        for index, provider in enumerate(self.providers):
+            score = self.health[provider["name"]].score()
+            if score is None:
+                score = inherited
+            else:
+                inherited = score
+            enabled = provider.get("enabled")
+            if enabled and not enabled():
+                if count_skips:
+                    self.health[provider["name"]].skip()
+                continue
+            candidates.append((score, index, provider))
+        candidates.sort(key=lambda item: (item[0], item[1]))
+        return [provider for _, _, provider in candidates]
+
+    def run(self, *args):
+        """Return (result, provider_name), or (None, None) if every provider failed"""
+        providers = self.ordered(count_skips=True)
+        if self.mode == "race" and len(providers) >= 2:
+            result, name = self._race(providers[:2], args)
+            if result:
+                return result, name
+            providers = providers[2:]
+
+        for provider in providers:
+            result = self._call(provider, args)
+            if result:
+                return result, provider["name"]
+        return None, None
+
+    def _call(self, provider, args):
+        started = time.perf_counter()
+        try:
+            result = provider["fetch"](*args)
+        except ProviderSkipped as e:
+            logger.info(f"{self.name} provider {provider['name']} skipped: {str(e)}")
+            self.health[provider["name"]].skip()
+            return None
+        except Exception as e:
+            logger.warning(f"{self.name} provider {provider['name']} failed: {str(e)}")
+            result = None
+        self.health[provider["name"]].record((time.perf_counter() - started) * 1000, bool(result))
+        return result
+
+    def _race(self, providers, args):
+        futures = {_race_executor.submit(self._call, provider, args): provider["name"] for provider in providers}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result:
+                    # The slower provider keeps running; its outcome still updates its health
+                    return result, futures[future]
+        return None, None
+
+    def stats(self):
+        """Per-provider health, in current preference order"""
+        order = [provider["name"] for provider in self.ordered()]
+        return {
+            "mode": self.mode,
+            "order": order,
+            "providers": {name: health.snapshot() for name, health in self.health.items()}
+        }
@@ -0,0 +1,189 @@
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+from env_config import env_float, env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Quota limiter for metered upstream API keys.
+#
+# Every provider key gets a token bucket (short-term rate) and a monthly call
+# budget. State lives in a SQLite file so it is shared by every invocation on
+# the host and survives restarts. Callers check available() before choosing a
+# provider - it turns False once the bucket is empty or the month's remaining
+# budget drops into the reserve - so the weather chain moves on to the next
+# provider and other callers serve what they already have. acquire() spends one
+# call right before the request is made.
+#
+# Configure with:
+#   QUOTA_STATE_PATH            - SQLite database file (default: <tmp>/quota_state.db)
+#   QUOTA_<PROVIDER>_MONTHLY    - monthly call budget, 0 for unlimited (e.g. QUOTA_NEWSAPI_MONTHLY)
+#   QUOTA_<PROVIDER>_PER_MINUTE - token bucket refill rate and burst size, 0 for unlimited
+#   QUOTA_RESERVE_FRACTION      - share of the monthly budget held back from available() (default 0.05)
+
+DEFAULT_LIMITS = {
+    "weatherapi": {"monthly": 1000000, "per_minute": 60},
+    "azure_maps": {"monthly": 0, "per_minute": 50},
+    "openweathermap": {"monthly": 1000000, "per_minute": 60},
+    "newsapi": {"monthly": 3000, "per_minute": 10},  # developer plan: 100 requests/day
+    "eventbrite": {"monthly": 0, "per_minute": 16}   # 1000 requests/hour
+}
+
+
+def _period():
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+def get_limits(provider: str):
+    """Monthly budget and per-minute rate for a provider (env overrides the defaults)"""
+    defaults = DEFAULT_LIMITS.get(provider, {"monthly": 0, "per_minute": 0})
+    prefix = f"QUOTA_{provider.upper()}"
+    return {
+        "monthly": env_int(f"{prefix}_MONTHLY", defaults["monthly"]),
+        "per_minute": env_int(f"{prefix}_PER_MINUTE", defaults["per_minute"])
+    }
+
+
+class QuotaLimiter:
+    """Token buckets and monthly usage counters persisted in SQLite"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, timeout=5, isolation_level=None)
+            self._create()
+        except sqlite3.Error as e:
+            logger.warning(f"Quota state at {path} unavailable ({str(e)}), using memory only")
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+            self._create()
+
+    def _create(self):
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS quota ("
+            "provider TEXT PRIMARY KEY, period TEXT NOT NULL, used INTEGER NOT NULL, "
+            "tokens REAL NOT NULL, refilled_at REAL NOT NULL)"
+        )
+
+    def _read(self, provider: str, limits: dict, now: float):
+        """Current (used, tokens) with the bucket refilled and the month rolled over"""
+        row = self._conn.execute(
+            "SELECT period, used, tokens, refilled_at FROM quota WHERE provider = ?", (provider,)
+        ).fetchone()
+        period = _period()
+        capacity = float(limits["per_minute"])
+        if row is None:
+            return 0, capacity
+        used = row[1] if row[0] == period else 0
+        tokens = min(capacity, row[2] + (now - row[3]) * capacity / 60.0)
+        return used, tokens
+
+    def _has_room(self, limits: dict, used: int, tokens: float, reserve: float = 0.0):
+        if limits["per_minute"] and tokens < 1:
+            return False
+        if limits["monthly"] and used >= limits["monthly"] * (1 - reserve):
+            return False
+        return True
+
+    def available(self, provider: str):
+        """True if a call fits in the bucket and the budget is not into its reserve"""
+        limits = get_limits(provider)
+        if not limits["monthly"] and not limits["per_minute"]:
+            return True
+        with self._lock:
+            used, tokens = self._read(provider, limits, time.time())
+        return self._has_room(limits, used, tokens, env_float("QUOTA_RESERVE_FRACTION", 0.05))
+
+    def acquire(self, provider: str):
+        """Spend one call. Returns False (and spends nothing) if the bucket or budget is exhausted."""
+        limits = get_limits(provider)
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    used, tokens = self._read(provider, limits, now)
+                    if not self._has_room(limits, used, tokens):
+                        self._conn.execute("ROLLBACK")
+                        logger.warning(f"Quota limit reached for {provider} ({used} calls this month, {tokens:.1f} tokens)")
+                        return False
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO quota (provider, period, used, tokens, refilled_at) VALUES (?, ?, ?, ?, ?)",
+                        (provider, _period(), used + 1, tokens - 1 if limits["per_minute"] else 0, now)
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            # Never block an upstream call because the bookkeeping failed
+            logger.warning(f"Quota bookkeeping failed for {provider}: {str(e)}")
+        return True
+
+    def snapshot(self):
+        """Usage and remaining budget for every known provider"""
+        now = time.time()
+        with self._lock:
+            stored = [row[0] for row in self._conn.execute("SELECT provider FROM quota").fetchall()]
+        result = {}
+        for provider in sorted(set(DEFAULT_LIMITS) | set(stored)):
+            limits = get_limits(provider)
+            with self._lock:
+                used, tokens = self._read(provider, limits, now)
+            result[provider] = {
+                "period": _period(),
+                "used": used,
+                "monthly_budget": limits["monthly"] or None,
+                "remaining": max(0, limits["monthly"] - used) if limits["monthly"] else None,
+                "per_minute": limits["per_minute"] or None,
+                "tokens": round(tokens, 2) if limits["per_minute"] else None
+            }
+        return result
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Process-wide quota limiter"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                path = os.environ.get("QUOTA_STATE_PATH") or os.path.join(tempfile.gettempdir(), "quota_state.db")
+                _limiter = QuotaLimiter(path)
+    return _limiter
+
+
+def available(provider: str):
+    """True if the provider should be used right now"""
+    return get_limiter().available(provider)
+
+
+def acquire(provider: str):
+    """Spend one call against the provider's quota; False if it is exhausted"""
+    return get_limiter().acquire(provider)
+
+
+def snapshot():
+    return get_limiter().snapshot()
+
+
+def render_prometheus(prefix: str = "cityhub"):
+    """Remaining monthly budget and calls used per provider as Prometheus gauges"""
+    data = snapshot()
+    lines = [f"# TYPE {prefix}_quota_used gauge"]
+    lines += [f'{prefix}_quota_used{{provider="{provider}"}} {usage["used"]}' for provider, usage in data.items()]
+    lines.append(f"# TYPE {prefix}_quota_remaining gauge")
+    lines += [
+        f'{prefix}_quota_remaining{{provider="{provider}"}} {usage["remaining"]}'
+        for provider, usage in data.items() if usage["remaining"] is not None
+    ]
+    return "\n".join(lines) + "\n"
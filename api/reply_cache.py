@@ -0,0 +1,119 @@
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from env_config import env_flag, env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Opt-in cache of Penny replies for repeated questions.
+#
+# The key is the normalized message, the city and a fingerprint of the exact
+# weather/events context injected into the prompt, so a change in the context
+# (new temperature, different events) always misses and cached answers never
+# quote stale weather. Only first turns (no prior history) are cached, since
+# later replies depend on the conversation.
+#
+# Configure with:
+#   AGENT_REPLY_CACHE              - "true" to enable (default off)
+#   AGENT_REPLY_CACHE_TTL_SECONDS  - entry lifetime (default 600)
+#   AGENT_REPLY_CACHE_MAX_ENTRIES  - LRU capacity (default 500)
+
+DEFAULT_TTL = 600
+DEFAULT_MAX_ENTRIES = 500
+
+
+class ReplyCache:
+    """LRU + TTL cache with per-entry hit/miss counters"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: int = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> {"value", "expires_at", "hits", "misses"}, least recently used first
+        self._pending_misses = OrderedDict()  # misses for keys not (or no longer) cached
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] < time.time():
+                misses = 1
+                if entry is not None:
+                    misses += entry["misses"]
+                    del self._entries[key]
+                self._pending_misses[key] = self._pending_misses.pop(key, 0) + misses
+                while len(self._pending_misses) > self.max_entries:
+                    self._pending_misses.popitem(last=False)
+                return None
+            entry["hits"] += 1
+            self._entries.move_to_end(key)
+            return entry["value"]
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = {
+                "value": value,
+                "expires_at": time.time() + self.ttl,
+                "hits": 0,
+                "misses": self._pending_misses.pop(key, 0)
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self, top: int = 10):
+        """Overall hit/miss counts plus per-entry counters for the most-hit entries"""
+        with self._lock:
+            hits = sum(entry["hits"] for entry in self._entries.values())
+            misses = sum(entry["misses"] for entry in self._entries.values()) + sum(self._pending_misses.values())
+            top_entries = sorted(self._entries.items(), key=lambda item: item[1]["hits"], reverse=True)[:top]
+            return {
+                "size": len(self._entries),
+                "hits": hits,
+                "misses": misses,
+                "entries": [
+                    {"key": key[:12], "hits": entry["hits"], "misses": entry["misses"]}
+                    for key, entry in top_entries
+                ]
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def is_enabled():
+    """True when AGENT_REPLY_CACHE is switched on"""
+    return env_flag("AGENT_REPLY_CACHE")
+
+
+def get_cache():
+    """Return the process-wide reply cache, or None when disabled"""
+    global _cache
+    if not is_enabled():
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                ttl = env_int("AGENT_REPLY_CACHE_TTL_SECONDS", DEFAULT_TTL)
+                max_entries = env_int("AGENT_REPLY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+                _cache = ReplyCache(max_entries, ttl)
+    return _cache
+
+
+def normalize_message(message: str):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = (message or "").lower().replace("’", "'")
+    text = re.sub(r"[^\w\s']", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_key(message: str, city: str, context_parts):
+    """Cache key from the normalized message, city and injected context fingerprint"""
+    fingerprint = hashlib.sha256("\n".join(context_parts or []).encode("utf-8")).hexdigest()
+    raw = "\x1f".join([normalize_message(message), (city or "").strip().lower(), fingerprint])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
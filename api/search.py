@@ -3,6 +3,8 @@ import requests
 import json
 import logging
 
+import bm25_index
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -10,6 +12,9 @@ def main(req):
     """
     Azure Function for Azure Cognitive Search integration.
     Supports multiple indexes: documents, events, geo, resources, weather
+    Index types with a local BM25 index (see bm25_index.py) are answered locally:
+    SEARCH_BACKEND=hybrid (default) falls through to Azure Search when the local index has no hits,
+    SEARCH_BACKEND=local never calls Azure Search, SEARCH_BACKEND=azure ignores the local index.
     """
     try:
         # Get search term from query params or body
@@ -25,6 +30,26 @@ def main(req):
         # Get index type from query params or body (defaults to "events")
         index_type = req.params.get("index_type") or body_data.get("index_type") or "events"
         
+        # Try the local BM25 index first
+        backend = bm25_index.search_backend()
+        if backend != "azure":
+            top = int(req.params.get("top") or body_data.get("top") or 50)
+            local_results = search_local(term, index_type.lower(), city, state, top)
+            if local_results is not None and (local_results or backend == "local"):
+                logger.info(f"Served search for '{term}' from the local {index_type} index ({len(local_results)} hits)")
+                return {
+                    "statusCode": 200,
+                    "headers": {
+                        "Content-Type": "application/json",
+                        "Access-Control-Allow-Origin": "*"
+                    },
+                    "body": json.dumps({
+                        "results": {"value": local_results},
+                        "index_used": "local-bm25",
+                        "index_type": index_type
+                    })
+                }, 200
+        
         # Get Azure Search configuration
         endpoint = os.environ.get("AZURE_SEARCH_ENDPOINT")
         # Support both AZURE_SEARCH_KEY and AZURE_SEARCH_API_KEY
@@ -103,3 +128,17 @@ def main(req):
             "statusCode": 500,
             "body": json.dumps({"error": str(e)})
         }, 500
+
+def search_local(term: str, index_type: str, city: str = None, state: str = None, top: int = 50):
+    """
+    Hits from the local BM25 index in Azure Search's result shape (documents with "@search.score"),
+    or None when there is no local index for this type.
+    """
+    def where(doc):
+        return ((not city or (doc.get("city") or "").lower() == city.lower())
+                and (not state or (doc.get("state") or "").lower() == state.lower()))
+
+    hits = bm25_index.search(term, top, where=where, index_type=index_type)
+    if hits is None:
+        return None
+    return [dict(doc, **{"@search.score": score}) for score, doc in hits]
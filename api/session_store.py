@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+from env_config import env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Server-side conversation store for agent sessions.
+#
+# Clients can send only the new message plus a session_id; the agent loads the
+# stored history, trims it to a token budget (recent turns verbatim, older
+# turns folded into a short summary turn) and saves Penny's updated history.
+# Clients that still send the full "history" array keep working - it is
+# trimmed the same way before being forwarded to Penny.
+#
+# Configure with:
+#   SESSION_STORE_BACKEND        - "memory" (default), "sqlite" or "none"
+#   SESSION_STORE_PATH           - SQLite database file (default: <tmp>/penny_sessions.db)
+#   SESSION_TTL_SECONDS          - idle time before a session is evicted (default 86400)
+#   SESSION_MAX_SESSIONS         - max sessions kept by the memory backend (default 5000)
+#   SESSION_HISTORY_TOKEN_BUDGET - approximate token budget for history sent to Penny (default 1500)
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_SESSIONS = 5000
+DEFAULT_TOKEN_BUDGET = 1500
+SUMMARY_PREFIX = "[Earlier in this conversation the user asked about: "
+SUMMARY_SNIPPET_CHARS = 80
+
+
+class InMemorySessionStore:
+    """Per-process session store with TTL and LRU eviction"""
+
+    def __init__(self, ttl: int = DEFAULT_TTL, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> (updated_at, history), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if not entry:
+                return None
+            updated_at, history = entry
+            if time.time() - updated_at > self.ttl:
+                del self._sessions[session_id]
+                return None
+            return history
+
+    def save(self, session_id: str, history):
+        with self._lock:
+            self._sessions[session_id] = (time.time(), history)
+            self._sessions.move_to_end(session_id)
+            self._evict()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self):
+        # Entries are ordered by last update, so expired ones are at the front
+        cutoff = time.time() - self.ttl
+        while self._sessions:
+            session_id, (updated_at, _) = next(iter(self._sessions.items()))
+            if updated_at >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+
+class SQLiteSessionStore:
+    """Session store persisted in a SQLite file, shared by all workers on the host"""
+
+    def __init__(self, path: str, ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, history TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        self._conn.commit()
+
+    def get(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT history FROM sessions WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id: str, history):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, history, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(history), now)
+            )
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+            self._conn.commit()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the configured session store (created once per process), or None if disabled"""
+    global _store
+    if _store is not None:
+        return _store or None
+
+    with _store_lock:
+        if _store is None:
+            backend = (os.environ.get("SESSION_STORE_BACKEND") or "memory").strip().lower()
+            ttl = env_int("SESSION_TTL_SECONDS", DEFAULT_TTL)
+            if backend == "sqlite":
+                path = os.environ.get("SESSION_STORE_PATH") or os.path.join(tempfile.gettempdir(), "penny_sessions.db")
+                try:
+                    _store = SQLiteSessionStore(path, ttl)
+                    logger.info(f"Using SQLite session store at {path}")
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to open SQLite session store {path}: {str(e)}, using memory store")
+                    _store = InMemorySessionStore(ttl, env_int("SESSION_MAX_SESSIONS", DEFAULT_MAX_SESSIONS))
+            elif backend in ("none", "off", "disabled"):
+                _store = False
+            else:
+                _store = InMemorySessionStore(ttl, env_int("SESSION_MAX_SESSIONS", DEFAULT_MAX_SESSIONS))
+    return _store or None
+
+
+def load_history(session_id: str):
+    """Stored history for a session ([] if unknown or the store is disabled)"""
+    store = get_store()
+    if not store or not session_id:
+        return []
+    try:
+        return store.get(session_id) or []
+    except Exception as e:
+        logger.warning(f"Failed to load session {session_id}: {str(e)}")
+        return []
+
+
+def save_history(session_id: str, history):
+    """Persist a session's history (no-op if the store is disabled)"""
+    store = get_store()
+    if not store or not session_id or not isinstance(history, list):
+        return
+    try:
+        store.save(session_id, trim_history(history))
+    except Exception as e:
+        logger.warning(f"Failed to save session {session_id}: {str(e)}")
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token)"""
+    return (len(text) + 3) // 4 if isinstance(text, str) else 0
+
+
+def trim_history(history, token_budget: int = None):
+    """
+    Trim [user, bot] history to an approximate token budget.
+    The most recent turns are kept verbatim (always at least the last one);
+    older turns are folded into a single summary turn listing what the user asked.
+    """
+    if not isinstance(history, list) or not history:
+        return history if isinstance(history, list) else []
+    if token_budget is None:
+        token_budget = env_int("SESSION_HISTORY_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)
+
+    kept = []
+    used = 0
+    for turn in reversed(history):
+        cost = sum(estimate_tokens(part) for part in turn) if isinstance(turn, (list, tuple)) else 0
+        if kept and used + cost > token_budget:
+            break
+        kept.append(turn)
+        used += cost
+    kept.reverse()
+
+    dropped = history[:len(history) - len(kept)]
+    if not dropped:
+        return history
+
+    # Fold the dropped turns (including any previous summary) into one summary turn
+    topics = []
+    for turn in dropped:
+        if not isinstance(turn, (list, tuple)) or not turn:
+            continue
+        user_msg = turn[0]
+        if user_msg is None and len(turn) > 1 and isinstance(turn[1], str) and turn[1].startswith(SUMMARY_PREFIX):
+            topics.append(turn[1][len(SUMMARY_PREFIX):].rstrip("]"))
+        elif isinstance(user_msg, str) and user_msg.strip():
+            # Context blocks appended by the agent are not part of what the user asked
+            snippet = user_msg.split("\n\n[", 1)[0].strip()
+            topics.append(snippet[:SUMMARY_SNIPPET_CHARS])
+
+    summary = SUMMARY_PREFIX + "; ".join(topics)
+    # The summary itself must fit the budget; keep its most recent topics
+    max_chars = max(token_budget * 4 - used * 4, len(SUMMARY_PREFIX) + SUMMARY_SNIPPET_CHARS)
+    if len(summary) > max_chars:
+        summary = SUMMARY_PREFIX + "..." + summary[-(max_chars - len(SUMMARY_PREFIX) - 3):]
+    return [[None, summary + "]"]] + kept
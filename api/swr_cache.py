@@ -0,0 +1,148 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shared background pool for cache refreshes
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="swr-refresh")
+
+
+class SWRCache:
+    """
+    In-process cache with stale-while-revalidate semantics.
+
+    fresh (age < ttl)            - served from cache
+    stale (ttl <= age < ttl+stale_ttl) - served from cache while one background refresh runs
+    expired / missing            - loaded synchronously; concurrent misses for the
+                                   same key share a single load (single flight)
+
+    Values rejected by the cacheable predicate (e.g. mock data) are returned but not stored.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0, max_entries: int = 1000, cacheable=None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.cacheable = cacheable or (lambda value: value is not None)
+        self._entries = OrderedDict()  # key -> (value, stored_at), least recently used first
+        self._inflight = {}  # key -> {"event", "value", "error"} for loads in progress
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() when it is missing or expired"""
+        with self._lock:
+            found, value = self._lookup(key, loader)
+            if found:
+                return value
+            self.misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = {"event": threading.Event(), "value": None, "error": None}
+
+        if not leader:
+            # Another caller is already loading this key; share its result
+            flight["event"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["value"]
+
+        try:
+            flight["value"] = self._load(key, loader)
+            return flight["value"]
+        except Exception as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight["event"].set()
+
+    def get(self, key, loader=None):
+        """
+        Return the cached value if it is fresh or stale (scheduling a background
+        refresh through loader when stale), or None without loading on a miss.
+        """
+        with self._lock:
+            found, value = self._lookup(key, loader)
+        return value if found else None
+
+    def _lookup(self, key, loader):
+        """(found, value) for a fresh or stale entry; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age < self.ttl:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return True, value
+        if age < self.ttl + self.stale_ttl:
+            self.stale_hits += 1
+            self._entries.move_to_end(key)
+            if loader is not None and key not in self._refreshing:
+                self._refreshing.add(key)
+                _refresh_executor.submit(self._refresh, key, loader)
+            return True, value
+        return False, None
+
+    def peek(self, key):
+        """Cached value regardless of age (None if absent); does not count as a hit"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value):
+        if not self.cacheable(value):
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key, loader):
+        with self._lock:
+            self.loads += 1
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self.load_errors += 1
+            raise
+        self.set(key, value)
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            self._load(key, loader)
+        except Exception as e:
+            logger.warning(f"{self.name} cache refresh failed for {key}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self):
+        with self._lock:
+            requests_total = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "load_errors": self.load_errors,
+                "hit_rate": round((self.hits + self.stale_hits) / requests_total, 4) if requests_total else None
+            }
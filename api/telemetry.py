@@ -0,0 +1,108 @@
+import time
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# In-process latency telemetry.
+#
+# StageTimer records per-stage durations for one request (returned to the
+# client as a Server-Timing header and optional "timings" field), and every
+# observation is also added to a process-wide histogram that /api/metrics
+# exposes for scraping.
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is +Inf)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+            self.count += 1
+            self.sum += value_ms
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = []
+            running = 0
+            for bound, count in zip(list(BUCKETS_MS) + ["+Inf"], self.counts):
+                running += count
+                cumulative.append((bound, running))
+            return {"count": self.count, "sum_ms": round(self.sum, 3), "buckets": cumulative}
+
+
+_histograms = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def observe(name: str, value_ms: float):
+    """Record one observation in the named histogram"""
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _histograms.setdefault(name, Histogram(name))
+    histogram.observe(value_ms)
+
+
+def snapshot():
+    """All histograms as plain dicts"""
+    return {name: histogram.snapshot() for name, histogram in list(_histograms.items())}
+
+
+def render_prometheus(prefix: str = "cityhub"):
+    """All histograms in the Prometheus text exposition format"""
+    lines = []
+    for name, data in snapshot().items():
+        metric = f"{prefix}_{name}_ms"
+        lines.append(f"# TYPE {metric} histogram")
+        for bound, count in data["buckets"]:
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+        lines.append(f"{metric}_sum {data['sum_ms']}")
+        lines.append(f"{metric}_count {data['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Per-request stage timings, mirrored into the process-wide histograms"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.stages = OrderedDict()
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def record(self, name: str, duration_ms: float):
+        self.stages[name] = self.stages.get(name, 0.0) + duration_ms
+        observe(f"{self.prefix}_{name}", duration_ms)
+
+    def finish(self):
+        """Record the total request time (call once, before building the response)"""
+        self.record("total", (time.perf_counter() - self._started) * 1000)
+
+    def as_dict(self):
+        return {name: round(duration, 2) for name, duration in self.stages.items()}
+
+    def server_timing(self):
+        """Value for the Server-Timing response header"""
+        return ", ".join(f"{name};dur={duration:.1f}" for name, duration in self.stages.items())
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The function modules import each other as top-level modules (the Functions
+# host runs them from api/), so the tests do the same.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quota  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_quota(monkeypatch):
+    """Each test gets an in-memory quota limiter instead of the shared state file"""
+    monkeypatch.setattr(quota, "_limiter", quota.QuotaLimiter())
@@ -0,0 +1,21 @@
+import agent
+import session_store
+
+
+class FakeRequest:
+    def __init__(self, body):
+        self.body = body
+        self.headers = {}
+
+    def get_json(self):
+        return self.body
+
+
+def test_missing_message_is_rejected_before_loading_the_session(monkeypatch):
+    def load_history(session_id):
+        raise AssertionError("session store read for an invalid request")
+    monkeypatch.setattr(session_store, "load_history", load_history)
+
+    response, status = agent.main(FakeRequest({"message": "", "session_id": "abc"}))
+    assert status == 400
+    assert "Message is required" in response["body"]
@@ -0,0 +1,70 @@
+import os
+import json
+
+import pytest
+
+import bm25_index
+from bm25_index import BM25Index
+
+DOCS = [
+    {"id": "1", "title": "Jazz Night at the Attucks", "category": "Music", "description": "Live jazz trio", "city": "Norfolk"},
+    {"id": "2", "title": "Harbor Food Festival", "category": "Food", "description": "Local jazz band plays at noon", "city": "Norfolk"},
+    {"id": "3", "title": "Blues and Jazz Picnic", "category": "Music", "description": "Bring a blanket", "city": "Atlanta"},
+    {"id": "4", "title": "Farmers Market", "category": "Food", "description": "Fresh produce", "city": "Norfolk"},
+]
+
+
+def ids(results):
+    return [doc["id"] for _, doc in results]
+
+
+def test_title_matches_outrank_description_matches():
+    index = BM25Index.build(DOCS)
+    results = index.search("jazz")
+    assert set(ids(results)) == {"1", "2", "3"}
+    assert ids(results)[-1] == "2"
+    assert results == sorted(results, key=lambda pair: pair[0], reverse=True)
+    assert index.search("the and of") == index.search("*", limit=10)
+
+
+def test_filters_and_paging():
+    index = BM25Index.build(DOCS)
+    norfolk = ids(index.search("jazz", where=lambda doc: doc["city"] == "Norfolk"))
+    assert norfolk == ["1", "2"]
+    assert ids(index.search("jazz", limit=1, offset=1, where=lambda doc: doc["city"] == "Norfolk")) == ["2"]
+    assert index.search("opera") == []
+
+
+def test_saved_index_round_trips(tmp_path):
+    path = str(tmp_path / "events.bm25")
+    built = BM25Index.build(DOCS)
+    built.save(path)
+
+    loaded = BM25Index.load(path)
+    assert len(loaded) == len(DOCS)
+    assert loaded.terms == built.terms
+    assert list(loaded.postings) == list(built.postings)
+    for query in ("jazz", "food festival", "market produce"):
+        assert loaded.search(query) == built.search(query)
+
+
+def test_rejects_files_that_are_not_an_index(tmp_path):
+    path = tmp_path / "bogus.bm25"
+    path.write_bytes(b"JSON{}")
+    with pytest.raises(ValueError):
+        BM25Index.load(str(path))
+
+
+def test_snapshot_is_indexed_and_reloaded_when_it_changes(monkeypatch, tmp_path):
+    snapshot = tmp_path / "events.json"
+    snapshot.write_text(json.dumps({"value": DOCS[:2]}))
+    monkeypatch.setenv("EVENT_INDEX_SNAPSHOT_PATH", str(snapshot))
+    monkeypatch.delenv("BM25_INDEX_PATH", raising=False)
+    monkeypatch.setattr(bm25_index, "_indexes", {})
+
+    assert ids(bm25_index.search("jazz")) == ["1", "2"]
+
+    snapshot.write_text(json.dumps({"value": DOCS}))
+    stat = snapshot.stat()
+    os.utime(snapshot, (stat.st_atime, stat.st_mtime + 10))
+    assert set(ids(bm25_index.search("jazz"))) == {"1", "2", "3"}
@@ -0,0 +1,66 @@
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    """Stands in for the module's time import so only its monotonic() is frozen"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def breaker(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return CircuitBreaker("test", failure_threshold=2, reset_timeout=30, probe_timeout=60), clock
+
+
+def test_opens_after_threshold_and_rejects_until_reset(monkeypatch):
+    cb, clock = breaker(monkeypatch)
+    cb.record_failure()
+    assert cb.allow() and cb.state == CLOSED
+    cb.record_failure()
+    assert cb.state == OPEN
+    assert not cb.allow()
+    assert cb.retry_after() == 31
+
+    clock.now += 30
+    assert cb.allow()
+    assert cb.state == HALF_OPEN
+
+
+def test_half_open_lets_one_probe_through(monkeypatch):
+    cb, clock = breaker(monkeypatch)
+    cb.record_failure()
+    cb.record_failure()
+    clock.now += 30
+
+    assert cb.allow()
+    assert not cb.allow()
+    # Released without a verdict (e.g. the Space was asleep): the next caller probes
+    cb.release_probe()
+    assert cb.allow()
+    assert not cb.allow()
+    # A probe that never reports back is abandoned after probe_timeout
+    clock.now += 60
+    assert cb.allow()
+
+
+def test_probe_result_closes_or_reopens(monkeypatch):
+    cb, clock = breaker(monkeypatch)
+    cb.record_failure()
+    cb.record_failure()
+    clock.now += 30
+    assert cb.allow()
+    cb.record_failure()
+    assert cb.state == OPEN
+    assert not cb.allow()
+
+    clock.now += 30
+    assert cb.allow()
+    cb.record_success()
+    assert cb.snapshot() == {"name": "test", "state": CLOSED, "failures": 0}
+    assert cb.allow() and cb.allow()
@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import event_aggregator
+from event_index import parse_event_time
+
+NOW = datetime.now(timezone.utc)
+
+
+def event(source, hours, title=None):
+    return {
+        "id": f"{source}-{hours}",
+        "title": title or f"{source} event {hours}",
+        "date": (NOW + timedelta(hours=hours)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "location": f"{source} venue",
+        "source": source
+    }
+
+
+def paged(items, gate=None):
+    def fetch(city, state, limit, days_ahead, offset=0, start=None, fields=None, near=None):
+        if gate is not None and not gate.is_set():
+            gate.wait(1)
+            return []
+        return items[offset:offset + limit]
+    return fetch
+
+
+def test_late_source_does_not_send_pages_back_in_time(monkeypatch):
+    gate = threading.Event()
+    fast = [event("fast", hours) for hours in range(10, 20)]
+    slow = [event("slow", hours) for hours in range(1, 6)]
+    monkeypatch.setattr(event_aggregator, "EVENT_SOURCES", {
+        "fast": {"fetch": paged(fast), "enabled": None},
+        "slow": {"fetch": paged(slow, gate), "enabled": None}
+    })
+
+    first, cursor = event_aggregator.aggregate("Norfolk", limit=4, deadline=0.1)
+    gate.set()
+    second, _ = event_aggregator.aggregate("Norfolk", limit=4, deadline=1, cursor=cursor)
+
+    assert [e["source"] for e in first] == ["fast"] * 4
+    assert second
+    last_first_page = parse_event_time(first[-1]["date"])
+    assert all(parse_event_time(e["date"]) >= last_first_page for e in second)
+
+
+def failing(*args, **kwargs):
+    raise RuntimeError("source down")
+
+
+def test_sources_are_merged_by_date_and_deduplicated(monkeypatch):
+    shared = event("first", 3, title="Jazz Night")
+    copy = dict(shared, id="copy", title="JAZZ night!", source="second")
+    monkeypatch.setattr(event_aggregator, "EVENT_SOURCES", {
+        "first": {"fetch": paged([event("first", 5), shared]), "enabled": None},
+        "second": {"fetch": paged([event("second", 1), copy, event("second", 4)]), "enabled": None},
+        "broken": {"fetch": failing, "enabled": None},
+        "off": {"fetch": paged([event("off", 0)]), "enabled": lambda: False}
+    })
+
+    events, cursor = event_aggregator.aggregate("Norfolk", limit=10)
+
+    assert [e["id"] for e in events] == ["second-1", "first-3", "second-4", "first-5"]
+    assert cursor is None
+
+
+def test_duplicates_do_not_reappear_on_the_next_page(monkeypatch):
+    shared = event("first", 2, title="Jazz Night")
+    copy = dict(shared, id="copy", source="second")
+    monkeypatch.setattr(event_aggregator, "EVENT_SOURCES", {
+        "first": {"fetch": paged([event("first", 1), shared, event("first", 6)]), "enabled": None},
+        "second": {"fetch": paged([copy, event("second", 3), event("second", 7)]), "enabled": None}
+    })
+
+    first, cursor = event_aggregator.aggregate("Norfolk", limit=3)
+    second, _ = event_aggregator.aggregate("Norfolk", limit=3, cursor=cursor)
+
+    assert [e["id"] for e in first] == ["first-1", "first-2", "second-3"]
+    assert [e["id"] for e in second] == ["first-6", "second-7"]
+
+
+def test_cursor_round_trip():
+    state = {"t": 1800000000.0, "o": {"azure_search": 20, "eventbrite": 7}, "a": 1800003600.0}
+    cursor = event_aggregator.encode_cursor(state)
+    assert "=" not in cursor
+    assert event_aggregator.decode_cursor(cursor) == state
+    assert event_aggregator.decode_cursor(event_aggregator.encode_cursor({"t": 1, "o": {}}))["a"] is None
+
+    for bad in ("not-a-cursor", event_aggregator.encode_cursor({"t": 1}), event_aggregator.encode_cursor([1])):
+        try:
+            event_aggregator.decode_cursor(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad} should be rejected")
+
+
+def test_window_start_is_stable_within_the_granularity():
+    assert event_aggregator.window_start(1800000123.4) == event_aggregator.window_start(1800000299.0) == 1800000000.0
@@ -0,0 +1,75 @@
+import json
+from datetime import datetime, timezone
+
+import event_index
+from event_index import EventIndex
+
+START = 1_800_000_000  # 2027-01-15T08:00:00Z
+
+
+def event(event_id, hours, city="Norfolk", state="VA", **extra):
+    date = datetime.fromtimestamp(START + hours * 3600, timezone.utc)
+    return dict({"id": event_id, "title": event_id, "date": date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                 "city": city, "state": state}, **extra)
+
+
+def test_window_query_is_sorted_and_paged():
+    index = EventIndex([event("c", 30), event("a", 1), event("b", 5), event("late", 500), event("x", 2, city="Atlanta")])
+
+    window = index.query("norfolk", "va", START, START + 48 * 3600, limit=10)
+    assert [e["id"] for e in window] == ["a", "b", "c"]
+    assert [e["id"] for e in index.query("Norfolk", "VA", START, START + 48 * 3600, limit=2, offset=1)] == ["b", "c"]
+    assert index.query("Boise", "ID", START) == []
+
+
+def test_query_without_state_merges_partitions():
+    index = EventIndex([event("va", 3), event("ma", 1, state="MA"), event("undated", 0, date="tbd")])
+    assert [e["id"] for e in index.query("Norfolk", "", START)] == ["ma", "va"]
+    assert len(index) == 2
+
+
+def test_snapshot_file_is_loaded(monkeypatch, tmp_path):
+    path = tmp_path / "events.json"
+    path.write_text(json.dumps({"value": [event("a", 1)]}))
+    monkeypatch.setenv("EVENT_INDEX_SNAPSHOT_PATH", str(path))
+    monkeypatch.setattr(event_index, "_index", None)
+    monkeypatch.setattr(event_index, "_failed_at", 0.0)
+
+    events = event_index.query("Norfolk", "VA", days_ahead=2, start=START)
+    assert [e["id"] for e in events] == ["a"]
+    assert events[0]["source"] == "Event Snapshot"
+    assert events[0]["lat"] == 36.8468  # from the city's geocode
+
+
+def test_failed_cold_load_backs_off(monkeypatch):
+    monkeypatch.setenv("EVENT_INDEX_SNAPSHOT_PATH", "/nonexistent/events.json")
+    monkeypatch.setattr(event_index, "_index", None)
+    monkeypatch.setattr(event_index, "_failed_at", 0.0)
+    loads = []
+    real_build = event_index.build_index
+
+    def counting_build():
+        loads.append(1)
+        return real_build()
+    monkeypatch.setattr(event_index, "build_index", counting_build)
+
+    assert event_index.get_index() is None
+    assert event_index.get_index() is None
+    assert len(loads) == 1
+
+    monkeypatch.setenv("EVENT_INDEX_RETRY_SECONDS", "0")
+    assert event_index.get_index() is None
+    assert len(loads) == 2
+
+
+def test_query_near_filters_by_distance():
+    index = EventIndex([
+        event("downtown", 2, lat=36.8468, lon=-76.2852),
+        event("beach", 1, city="Virginia Beach", lat=36.8529, lon=-75.9780),
+        event("richmond", 3, city="Richmond", lat=37.5407, lon=-77.4360)
+    ])
+
+    nearby = index.query_near(36.85, -76.29, 25, START)
+    assert [e["id"] for e in nearby] == ["beach", "downtown"]
+    assert nearby[1]["distance_mi"] == 0.3
+    assert [e["id"] for e in index.query_near(36.85, -76.29, 100, START, offset=2)] == ["richmond"]
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+import event_ranker
+
+SOON = (datetime.now(timezone.utc) + timedelta(hours=6)).strftime("%Y-%m-%dT%H:%M:%SZ")
+PICNIC = {"id": "picnic", "title": "Picnic in the Park", "category": "Outdoors", "location": "City Park", "date": SOON}
+MUSEUM = {"id": "museum", "title": "Late Night at the Museum", "category": "Arts", "location": "Art Museum", "date": SOON}
+
+
+def weather(temperature, description):
+    return {"temperature": temperature, "description": description, "wind_speed": 5}
+
+
+def test_classify_weighs_venue_and_category():
+    assert event_ranker.classify(PICNIC)[0] == "outdoor"
+    assert event_ranker.classify(MUSEUM)[0] == "indoor"
+    assert event_ranker.classify({"title": "Trivia"}) == ("unknown", 0.5)
+    # A single weak term in free text is not enough to call it
+    assert event_ranker.classify({"description": "near the park and the bar"})[0] == "unknown"
+
+
+def test_rank_follows_the_weather():
+    # A city without a stored forecast, so the current conditions are used
+    sunny = event_ranker.rank([MUSEUM, PICNIC], "Springfield", "IL", weather(74, "Sunny"))
+    rainy = event_ranker.rank([PICNIC, MUSEUM], "Springfield", "IL", weather(58, "Heavy rain"))
+
+    assert [e["id"] for e in sunny] == ["picnic", "museum"]
+    assert [e["id"] for e in rainy] == ["museum", "picnic"]
+    assert rainy[1]["recommendation"]["forecast"]["precipitation_chance"] == 80
+    assert event_ranker.describe(rainy[1]) == "outdoor, 58°F, 80% chance of rain"
+
+
+def test_rank_without_weather_keeps_date_order_for_equal_fits():
+    later = dict(PICNIC, id="later", date=(datetime.now(timezone.utc) + timedelta(days=5)).strftime("%Y-%m-%dT%H:%M:%SZ"))
+    ranked = event_ranker.rank([later, PICNIC], "Springfield", "IL", None, limit=1)
+    assert [e["id"] for e in ranked] == ["picnic"]
+    assert ranked[0]["recommendation"]["forecast"] is None
+    assert event_ranker.rank([], "Springfield") == []
+
+
+def test_weather_note():
+    assert event_ranker.weather_note(weather(72, "Clear")) == "Perfect weather for outdoor events!"
+    assert event_ranker.weather_note(weather(40, "Thunderstorms")) == "Consider indoor events due to weather."
+    assert event_ranker.weather_note({"_is_mock": True, "temperature": 72}) == "Check event details for indoor/outdoor status."
@@ -0,0 +1,126 @@
+import json
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+
+import eventbrite_sync
+
+
+def configure(monkeypatch, snapshot_path=None):
+    monkeypatch.setenv("EVENTBRITE_SYNC_ENABLED", "true")
+    monkeypatch.setenv("EVENTBRITE_API_TOKEN", "token")
+    for name in ("AZURE_SEARCH_ENDPOINT", "AZURE_SEARCH_KEY", "AZURE_SEARCH_API_KEY", "AZURE_SEARCH_INDEX_EVENTS"):
+        monkeypatch.delenv(name, raising=False)
+    if snapshot_path:
+        monkeypatch.setenv("EVENT_INDEX_SNAPSHOT_PATH", snapshot_path)
+    else:
+        monkeypatch.delenv("EVENT_INDEX_SNAPSHOT_PATH", raising=False)
+
+
+def test_sync_stays_off_without_a_target(monkeypatch):
+    configure(monkeypatch)
+    assert eventbrite_sync.sync_target() is None
+    assert not eventbrite_sync.is_enabled()
+
+
+def test_sync_enabled_with_a_snapshot_target(monkeypatch, tmp_path):
+    path = str(tmp_path / "events.json")
+    configure(monkeypatch, path)
+    assert eventbrite_sync.sync_target() == ("local", path)
+    assert eventbrite_sync.is_enabled()
+
+
+def test_concurrent_first_requests_start_one_scheduler(monkeypatch):
+    monkeypatch.setattr(eventbrite_sync, "_scheduler_thread", None)
+    # A slow settings check widens the window between the check and the thread start
+    monkeypatch.setattr(eventbrite_sync, "is_enabled", lambda: time.sleep(0.05) or True)
+    runs = []
+    release = threading.Event()
+
+    def sync_all():
+        runs.append(1)
+        release.wait(5)
+    monkeypatch.setattr(eventbrite_sync, "sync_all", sync_all)
+
+    barrier = threading.Barrier(8)
+
+    def first_request():
+        barrier.wait()
+        eventbrite_sync.start_scheduler()
+    callers = [threading.Thread(target=first_request) for _ in range(8)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    time.sleep(0.1)
+    release.set()
+    assert len(runs) == 1
+
+
+def future(days):
+    return (datetime.now(timezone.utc) + timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def test_normalize_eventbrite_event():
+    record = eventbrite_sync.normalize({
+        "id": "42",
+        "name": {"text": "Harbor Jazz"},
+        "description": {"text": "x" * 300},
+        "start": {"utc": "2027-01-15T23:00:00Z"},
+        "venue": {"name": "Attucks Theatre", "latitude": "36.85", "longitude": "-76.28", "address": {"city": "Norfolk"}},
+        "category": {"subcategories": [{"name": "Jazz"}, {"name": "Blues"}, {"name": "Soul"}]},
+        "url": "https://example.com/42"
+    }, {"city": "Norfolk", "state": "VA"})
+
+    assert record["id"] == "eventbrite-42"
+    assert record["description"] == "x" * 200 + "..."
+    assert record["state"] == "VA"
+    assert record["category"] == "Jazz, Blues"
+    assert (record["lat"], record["lon"]) == (36.85, -76.28)
+
+
+def test_merge_local_keeps_the_snapshot_layout(tmp_path):
+    existing = [
+        {"id": "keep", "title": "Old title", "date": future(3), "url": "u"},
+        {"id": "past", "date": "2020-01-01T00:00:00Z"}
+    ]
+    for data, key in ((existing, None), ({"value": existing}, "value"), ({"events": existing, "generated": "x"}, "events")):
+        path = tmp_path / "events.json"
+        path.write_text(json.dumps(data))
+
+        stored = eventbrite_sync.merge_local([
+            {"id": "keep", "title": "New title", "date": future(3)},
+            {"id": "new", "title": "New event", "date": future(5)}
+        ], str(path))
+
+        merged = json.loads(path.read_text())
+        if key:
+            assert set(merged) == set(data)
+        by_id = {event["id"]: event for event in (merged[key] if key else merged)}
+        assert stored == 2 and set(by_id) == {"keep", "new"}
+        assert by_id["keep"]["title"] == "New title" and by_id["keep"]["url"] == "u"
+
+
+def test_capped_pass_resumes_before_advancing_the_mark(monkeypatch, tmp_path):
+    configure(monkeypatch, str(tmp_path / "events.json"))
+    monkeypatch.setattr(eventbrite_sync, "MARKETS", [{"city": "Norfolk", "state": "VA", "lat": 36.85, "lon": -76.29}])
+    monkeypatch.setattr(eventbrite_sync, "_state", eventbrite_sync.SyncState())
+    monkeypatch.setattr(eventbrite_sync.event_index, "refresh_now", lambda: None)
+    calls = []
+    passes = iter([
+        ([{"id": "a", "date": future(1)}], "2026-10-01T00:00:00Z", future(1)),
+        ([{"id": "b", "date": future(2)}], "2026-09-01T00:00:00Z", None)
+    ])
+
+    def fake_fetch(market, since, resume_start):
+        calls.append((since, resume_start))
+        return next(passes)
+    monkeypatch.setattr(eventbrite_sync, "fetch_changed", fake_fetch)
+
+    eventbrite_sync.sync_all()
+    assert eventbrite_sync.get_state().get("Norfolk|VA")[0] is None
+    eventbrite_sync.sync_all()
+
+    assert calls[1][0] is None and calls[1][1] is not None
+    # The newest change from the capped pass is kept once the window is covered
+    assert eventbrite_sync.get_state().get("Norfolk|VA") == ("2026-10-01T00:00:00Z", None, None)
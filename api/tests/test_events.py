@@ -0,0 +1,95 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import event_aggregator
+import events
+
+
+class FakeRequest:
+    def __init__(self, params=None, headers=None):
+        self.params = params or {}
+        self.headers = headers or {}
+
+
+def upcoming(count, source="Test"):
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": f"{source}-{i}",
+            "title": f"Event {i}",
+            "date": (now + timedelta(days=1, hours=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "location": f"Venue {i}",
+            "source": source
+        }
+        for i in range(count)
+    ]
+
+
+def use_source(monkeypatch, items):
+    def fetch(city, state, limit, days_ahead, offset=0, start=None, fields=None, near=None):
+        return items[offset:offset + limit]
+    monkeypatch.setattr(event_aggregator, "EVENT_SOURCES", {"test": {"fetch": fetch, "enabled": None}})
+
+
+def test_paginated_first_page_answers_if_none_match(monkeypatch):
+    use_source(monkeypatch, upcoming(12))
+    first, status = events.main(FakeRequest({"city": "Norfolk", "limit": "5"}))
+    assert status == 200
+    assert json.loads(first["body"])["next_cursor"]
+
+    repeat, status = events.main(FakeRequest({"city": "Norfolk", "limit": "5"}, {"If-None-Match": first["headers"]["ETag"]}))
+    assert status == 304
+    assert repeat["headers"]["ETag"] == first["headers"]["ETag"]
+
+
+def test_radius_query_without_hits_returns_no_example_events(monkeypatch):
+    use_source(monkeypatch, [])
+    response, status = events.main(FakeRequest({"lat": "36.85", "lon": "-76.29", "radius_mi": "5"}))
+    assert status == 200
+    assert json.loads(response["body"])["events"] == []
+
+    page, _ = events.get_events_page("Norfolk", near=(36.85, -76.29, 5))
+    assert page == []
+
+
+def test_city_query_without_hits_falls_back_to_examples(monkeypatch):
+    use_source(monkeypatch, [])
+    page, _ = events.get_events_page("Norfolk")
+    assert page and all(event["source"] == "Example" for event in page)
+
+
+def test_pages_follow_the_cursor_to_the_end(monkeypatch):
+    use_source(monkeypatch, upcoming(7))
+    seen = []
+    params = {"city": "Norfolk", "limit": "3", "fields": "id,title"}
+    while True:
+        response, status = events.main(FakeRequest(params))
+        assert status == 200
+        body = json.loads(response["body"])
+        assert all(set(event) == {"id", "title"} for event in body["events"])
+        seen.extend(event["id"] for event in body["events"])
+        if not body["next_cursor"]:
+            break
+        params = dict(params, cursor=body["next_cursor"])
+
+    assert seen == [f"Test-{i}" for i in range(7)]
+
+
+def test_bad_cursor_or_fields_is_a_client_error(monkeypatch):
+    use_source(monkeypatch, upcoming(3))
+    for params in ({"cursor": "garbage"}, {"fields": "title,secret"}):
+        response, status = events.main(FakeRequest(params))
+        assert status == 400
+        assert json.loads(response["body"])["error"]
+
+
+def test_parse_near():
+    assert events.parse_near(None, "", None) is None
+    assert events.parse_near("36.85", "-76.29", "") == (36.85, -76.29, events.DEFAULT_RADIUS_MI)
+    assert events.parse_near("36.85", "-76.29", "10000")[2] == events.MAX_RADIUS_MI
+    for lat, lon, radius in (("36.85", None, "5"), ("36.85", "-76.29", "far"), ("36.85", "-76.29", "0")):
+        try:
+            events.parse_near(lat, lon, radius)
+        except ValueError:
+            continue
+        raise AssertionError(f"{lat}, {lon}, {radius} should be rejected")
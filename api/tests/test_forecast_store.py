@@ -0,0 +1,88 @@
+import time
+import threading
+
+import forecast_store
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def weatherapi_hours(start_epoch, count):
+    """Hourly entries in the shape WeatherAPI.com's forecast.json returns"""
+    return [
+        {
+            "time_epoch": start_epoch + i * 3600,
+            "temp_f": 60.0 + i,
+            "feelslike_f": 58.0 + i,
+            "humidity": 70,
+            "wind_mph": 8.1,
+            "chance_of_rain": 10,
+            "chance_of_snow": 0,
+            "is_day": 1,
+            "condition": {"text": "Partly cloudy", "icon": "//cdn.weatherapi.com/116.png"}
+        }
+        for i in range(count)
+    ]
+
+
+def test_ingested_forecast_serves_feels_like(monkeypatch, tmp_path):
+    monkeypatch.setenv("WEATHERAPI_KEY", "test-key")
+    monkeypatch.setenv("FORECAST_PREFETCH_ENABLED", "true")
+    monkeypatch.setenv("FORECAST_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(forecast_store, "_forecasts", {})
+    monkeypatch.setattr(forecast_store, "start_scheduler", lambda: None)
+    start = int(time.time()) // 3600 * 3600 - 3600
+    payload = {"forecast": {"forecastday": [{"hour": weatherapi_hours(start, 24)}]}}
+    monkeypatch.setattr(forecast_store.requests, "get", lambda *args, **kwargs: FakeResponse(payload))
+
+    forecast = forecast_store.ingest_market("Norfolk", "VA")
+    assert len(forecast) == 24
+
+    conditions = forecast_store.current_conditions("Norfolk", "VA")
+    assert conditions["_source"] == "forecast"
+    assert conditions["feels_like"] > 0
+    assert abs(conditions["feels_like"] - (conditions["temperature"] - 2)) <= 1
+
+
+def test_snapshot_round_trip_keeps_every_series():
+    forecast = forecast_store.HourlyForecast("Norfolk", "VA", 100, time.time())
+    for hour in weatherapi_hours(100 * 3600, 3):
+        forecast.append(hour)
+    restored = forecast_store.HourlyForecast.from_dict(forecast.to_dict())
+    assert list(restored.series["feelslike_f"]) == [58.0, 59.0, 60.0]
+    assert restored.at_many([100 * 3600 + 5400])[1]["feelslike_f"][0] == 59.5
+
+
+def test_concurrent_first_requests_start_one_scheduler(monkeypatch):
+    monkeypatch.setattr(forecast_store, "_scheduler_thread", None)
+    # A slow settings check widens the window between the check and the thread start
+    monkeypatch.setattr(forecast_store, "is_enabled", lambda: time.sleep(0.05) or True)
+    runs = []
+    release = threading.Event()
+
+    def refresh_all():
+        runs.append(1)
+        release.wait(5)
+    monkeypatch.setattr(forecast_store, "refresh_all", refresh_all)
+
+    barrier = threading.Barrier(8)
+
+    def first_request():
+        barrier.wait()
+        forecast_store.start_scheduler()
+    callers = [threading.Thread(target=first_request) for _ in range(8)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    time.sleep(0.1)
+    release.set()
+    assert len(runs) == 1
@@ -0,0 +1,31 @@
+import pytest
+
+import geo
+
+
+def test_geohash_matches_the_reference_encoding():
+    assert geo.geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    # Points a few hundred metres apart share a precision-5 cell
+    assert geo.geohash(36.8468, -76.2852) == geo.geohash(36.8490, -76.2830)
+
+
+def test_haversine_distance():
+    assert geo.haversine_mi(36.8468, -76.2852, 33.7490, -84.3880) == pytest.approx(504.3, abs=0.1)
+    assert geo.haversine_mi(36.8468, -76.2852, 36.8468, -76.2852) == 0
+
+
+def test_parse_coordinates_rejects_bad_input():
+    assert geo.parse_coordinates("36.85", "-76.29") == (36.85, -76.29)
+    assert geo.parse_coordinates("91", "0") is None
+    assert geo.parse_coordinates("abc", "0") is None
+    assert geo.parse_coordinates(None, "0") is None
+
+
+def test_grid_cells_cover_the_circle():
+    lat, lon, radius = 36.8468, -76.2852, 25
+    cells = set(geo.grid_cells_within(lat, lon, radius, 0.25))
+    # Points on the circle's edge in each direction fall inside a covered cell
+    for d_lat, d_lon in ((0.36, 0), (-0.36, 0), (0, 0.45), (0, -0.45)):
+        edge = (lat + d_lat, lon + d_lon)
+        assert geo.haversine_mi(lat, lon, *edge) <= radius
+        assert geo.grid_cell(*edge, 0.25) in cells
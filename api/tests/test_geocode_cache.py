@@ -0,0 +1,24 @@
+from geocode_cache import GeocodeCache
+
+
+def test_markets_are_seeded_with_and_without_state():
+    cache = GeocodeCache()
+    assert cache.lookup("Norfolk", "VA") == (36.8468, -76.2852)
+    assert cache.lookup("  el paso ", "tx") == (31.7619, -106.4850)
+    assert cache.lookup("Seattle") == (47.6062, -122.3321)
+    assert cache.lookup("Boise", "ID") is None
+
+
+def test_stored_geocodes_survive_a_restart(tmp_path):
+    path = str(tmp_path / "geocode.db")
+    GeocodeCache(path).store("Boise", "ID", 43.615, -116.2023)
+
+    assert GeocodeCache(path).lookup("boise", "id") == (43.615, -116.2023)
+
+
+def test_unusable_path_falls_back_to_memory(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "missing" / "geocode.db"))
+    cache.store("Boise", "ID", 43.615, -116.2023)
+
+    assert cache.lookup("Boise", "ID") == (43.615, -116.2023)
+    assert cache.lookup("Atlanta", "GA") == (33.7490, -84.3880)
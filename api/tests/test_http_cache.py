@@ -0,0 +1,43 @@
+import json
+
+from http_cache import cache_control, compute_etag, etag_matches, json_response
+
+
+class FakeRequest:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+def test_etag_ignores_key_order_and_volatile_fields():
+    first = compute_etag({"city": "Norfolk", "items": [{"id": 1, "fetched_at": "10:00"}]}, ignore=("fetched_at",))
+    second = compute_etag({"items": [{"fetched_at": "10:05", "id": 1}], "city": "Norfolk"}, ignore=("fetched_at",))
+    assert first == second
+    assert first != compute_etag({"city": "Atlanta", "items": [{"id": 1}]})
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = compute_etag({"a": 1})
+    assert etag_matches(FakeRequest({"If-None-Match": f'"other", W/{etag}'}), etag)
+    assert etag_matches(FakeRequest({"if-none-match": "*"}), etag)
+    assert not etag_matches(FakeRequest({"If-None-Match": '"other"'}), etag)
+    assert not etag_matches(FakeRequest(), etag)
+
+
+def test_cache_control_policies(monkeypatch):
+    assert cache_control("news") == "public, max-age=600, stale-while-revalidate=1800"
+    assert cache_control("news", fallback=True) == "no-cache"
+    monkeypatch.setenv("HTTP_CACHE_WEATHER_MAX_AGE", "60")
+    assert cache_control("weather") == "public, max-age=60, stale-while-revalidate=600"
+
+
+def test_json_response_answers_a_matching_tag_with_304():
+    payload = {"articles": [1, 2]}
+    response, status = json_response(FakeRequest(), payload, "news", {"Content-Type": "application/json"})
+    assert status == 200
+    assert json.loads(response["body"]) == payload
+    assert response["headers"]["Access-Control-Expose-Headers"] == "ETag"
+
+    repeat, status = json_response(
+        FakeRequest({"If-None-Match": response["headers"]["ETag"]}), payload, "news", {}
+    )
+    assert status == 304 and repeat["body"] == ""
@@ -0,0 +1,32 @@
+import re
+
+import intent_router
+
+
+def test_trie_regex_shares_prefixes():
+    assert intent_router._trie_regex(["rain", "raining", "rainy"]) == "rain(?:ing|y)?"
+    pattern = re.compile(r"\b(?:" + intent_router._trie_regex(["how hot", "how cold"]) + r")\b")
+    assert pattern.fullmatch("how hot") and pattern.fullmatch("how cold")
+    assert not pattern.fullmatch("how")
+
+
+def test_keywords_match_whole_words_only():
+    assert intent_router.route("Is the temple open?").intents == frozenset()
+    assert intent_router.route("What's the temp today?").intents == {"weather"}
+    assert intent_router.route("Any good events?").intents == {"events"}
+
+
+def test_multiple_intents_merge_providers_in_order():
+    route = intent_router.route("Recommend outdoor things to do if it’s sunny")
+    assert route.intents == {"weather", "events"}
+    assert route.providers == ["weather", "events"]
+
+
+def test_register_intent_recompiles(monkeypatch):
+    monkeypatch.setattr(intent_router, "INTENTS", dict(intent_router.INTENTS))
+    try:
+        intent_router.register_intent("news", ["news", "headline"], ["news"])
+        assert intent_router.route("Top headlines?").providers == ["news"]
+    finally:
+        monkeypatch.undo()
+        intent_router._compile()
@@ -0,0 +1,67 @@
+import requests
+
+import news
+from swr_cache import SWRCache
+
+
+def test_default_ttl_keeps_market_refreshes_within_the_newsapi_budget(monkeypatch):
+    monkeypatch.setenv("QUOTA_NEWSAPI_MONTHLY", "3000")
+    ttl = news.default_cache_ttl()
+    monthly_refreshes = len(news.MARKETS) * 30 * 86400 / ttl
+    assert ttl >= 2 * 3600
+    assert monthly_refreshes <= 3000 * news.NEWSAPI_REFRESH_SHARE
+
+
+def test_default_ttl_without_a_budget(monkeypatch):
+    monkeypatch.setenv("QUOTA_NEWSAPI_MONTHLY", "0")
+    assert news.default_cache_ttl() == news.MIN_CACHE_TTL_SECONDS
+
+
+def articles(count):
+    return [
+        {"title": f"Story {i} about the harbor", "description": f"Unrelated detail number {i} " * i,
+         "url": f"https://example.com/{i}", "publishedAt": f"2026-10-{17 - i:02d}T12:00:00Z", "source": "Pilot"}
+        for i in range(count)
+    ]
+
+
+def use_newsapi(monkeypatch, fetch):
+    monkeypatch.setenv("NEWS_API_KEY", "key")
+    monkeypatch.setattr(news, "_news_cache", SWRCache("test", ttl=600))
+    monkeypatch.setattr(news, "fetch_news", fetch)
+    monkeypatch.setattr(news.news_feeds, "get_articles", lambda city: [])
+
+
+def test_every_limit_is_served_from_one_upstream_page(monkeypatch):
+    calls = []
+
+    def fetch(city):
+        calls.append(city)
+        return articles(12)
+    use_newsapi(monkeypatch, fetch)
+
+    assert len(news.get_news("Norfolk", 3)) == 3
+    assert len(news.get_news("norfolk ", 10)) == 10
+    assert calls == ["Norfolk"]
+
+
+def test_last_good_articles_are_served_when_newsapi_fails(monkeypatch):
+    pages = iter([articles(4)])
+
+    def fetch(city):
+        page = next(pages, None)
+        if page is None:
+            raise requests.exceptions.RequestException("NewsAPI quota exhausted")
+        return page
+    use_newsapi(monkeypatch, fetch)
+    first = news.get_news("Norfolk", 10)
+
+    monkeypatch.setattr(news._news_cache, "ttl", 0)
+    assert news.get_news("Norfolk", 10) == first
+    assert all(article["url"] != "#" for article in first)
+
+
+def test_mock_news_without_any_source(monkeypatch):
+    monkeypatch.delenv("NEWS_API_KEY", raising=False)
+    monkeypatch.setattr(news.news_feeds, "get_articles", lambda city: [])
+    assert all(article["url"] == "#" for article in news.get_news("Norfolk", 3))
@@ -0,0 +1,63 @@
+import news_dedupe
+from news_dedupe import BAND_BITS, cluster, dedupe, simhash
+
+STORY = (
+    "Norfolk approves $40 million floodwall extension along the Elizabeth River",
+    "City council voted 6-1 on Tuesday to fund the next phase of the coastal storm risk project downtown."
+)
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def spread_bits(count):
+    """A signature differing from 0 in one bit of each of the first count bands"""
+    return sum(1 << (band * BAND_BITS) for band in range(count))
+
+
+def test_simhash_ignores_outlet_suffixes_and_small_edits():
+    base = simhash(*STORY)
+    assert simhash(STORY[0] + " - WAVY", STORY[1]) == base
+    edited = simhash(STORY[0], STORY[1].replace("Tuesday", "Tuesday night"))
+    assert distance(base, edited) <= news_dedupe.DEFAULT_MAX_DISTANCE
+    unrelated = simhash("Seattle ferry fares rise in January", "Washington State Ferries announced new prices.")
+    assert distance(base, unrelated) > 16
+
+
+def test_banding_finds_every_pair_within_the_guaranteed_distance():
+    # 7 differing bits in 7 different bands: only the last band still matches, and that is enough
+    assert cluster([0, spread_bits(7)], max_distance=7) == [0, 0]
+    assert cluster([0, spread_bits(7)], max_distance=6) == [0, 1]
+    # Anything above BANDS - 1 is clamped, since banding could miss such pairs
+    assert cluster([0, spread_bits(8)], max_distance=20) == [0, 1]
+
+
+def test_clusters_are_transitive_and_keep_the_first_article():
+    a, b, c = 0, spread_bits(4), spread_bits(4) ^ (0b1111 << (4 * BAND_BITS + 1))
+    assert distance(a, c) > 6
+    assert cluster([c, b, a], max_distance=4) == [0, 0, 0]
+
+
+def test_dedupe_folds_copies_into_the_newest_article(monkeypatch):
+    monkeypatch.setattr(news_dedupe, "_signatures", news_dedupe.OrderedDict())
+    articles = [
+        {"title": STORY[0] + " - WAVY", "description": STORY[1], "url": "https://wavy/1", "source": "WAVY"},
+        {"title": "Ferry fares rise in January", "description": "New prices announced.", "url": "https://pilot/2", "source": "Pilot"},
+        {"title": STORY[0] + " | 13NewsNow", "description": STORY[1], "url": "https://13news/3", "source": "13NewsNow"}
+    ]
+
+    result = dedupe(articles)
+    assert [a["url"] for a in result] == ["https://wavy/1", "https://pilot/2"]
+    assert result[0]["also_reported_by"] == [{"source": "13NewsNow", "url": "https://13news/3"}]
+    assert "also_reported_by" not in articles[0]
+
+    hits = news_dedupe.get_stats()["signature_hits"]
+    dedupe(articles)
+    assert news_dedupe.get_stats()["signature_hits"] == hits + 3
+
+
+def test_dedupe_can_be_switched_off(monkeypatch):
+    monkeypatch.setenv("NEWS_DEDUPE_ENABLED", "false")
+    copies = [{"title": STORY[0], "url": f"u{i}"} for i in range(3)]
+    assert dedupe(copies) == copies
@@ -0,0 +1,88 @@
+import news_feeds
+from news_feeds import FeedState
+
+
+def rss(*items):
+    entries = "".join(
+        f"<item><title>{title}</title><link>https://example.com/{slug}</link><guid>{slug}</guid>"
+        f"<pubDate>{date}</pubDate><description>&lt;p&gt;About {title}&lt;/p&gt;</description></item>"
+        for slug, title, date in items
+    )
+    return f"<rss version=\"2.0\"><channel><title>Harbor Pilot</title>{entries}</channel></rss>".encode("utf-8")
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise news_feeds.requests.exceptions.HTTPError(str(self.status_code))
+
+
+FIRST = ("a", "Ferry schedule changes", "Fri, 16 Oct 2026 08:00:00 GMT")
+SECOND = ("b", "New library branch opens", "Sat, 17 Oct 2026 09:30:00 GMT")
+
+
+def test_poll_uses_conditional_get_and_adds_only_new_entries(monkeypatch):
+    responses = [
+        FakeResponse(200, rss(FIRST), {"ETag": '"v1"', "Last-Modified": "Fri, 16 Oct 2026 08:00:00 GMT"}),
+        FakeResponse(304),
+        FakeResponse(200, rss(SECOND, FIRST), {"ETag": '"v2"'})
+    ]
+    sent = []
+
+    def fake_get(url, headers=None, timeout=None):
+        sent.append(headers)
+        return responses.pop(0)
+    monkeypatch.setattr(news_feeds.requests, "get", fake_get)
+    feed = FeedState("https://example.com/rss")
+
+    assert feed.poll() == 1
+    assert feed.poll() == 0
+    assert feed.poll() == 1
+
+    assert "If-None-Match" not in sent[0]
+    assert sent[1]["If-None-Match"] == '"v1"'
+    assert sent[1]["If-Modified-Since"] == "Fri, 16 Oct 2026 08:00:00 GMT"
+    assert [a["title"] for a in feed.articles] == ["New library branch opens", "Ferry schedule changes"]
+    assert feed.articles[1] == {
+        "title": "Ferry schedule changes",
+        "description": "About Ferry schedule changes",
+        "url": "https://example.com/a",
+        "publishedAt": "2026-10-16T08:00:00Z",
+        "source": "Harbor Pilot"
+    }
+    assert feed.stats()["not_modified"] == 1
+
+
+def test_failed_poll_keeps_previous_articles(monkeypatch):
+    monkeypatch.setattr(news_feeds.requests, "get", lambda *args, **kwargs: FakeResponse(200, rss(FIRST)))
+    feed = FeedState("https://example.com/rss", "Pilot")
+    feed.poll()
+    monkeypatch.setattr(news_feeds.requests, "get", lambda *args, **kwargs: FakeResponse(500))
+
+    assert feed.poll() == 0
+    assert [a["source"] for a in feed.articles] == ["Pilot"]
+    assert feed.stats()["errors"] == 1
+
+
+def test_load_config_accepts_urls_and_objects(monkeypatch):
+    monkeypatch.setenv("NEWS_FEEDS", '{"Norfolk": ["https://a/rss", {"url": "https://b/atom", "name": "B"}, {"name": "no url"}]}')
+    assert news_feeds.feeds_for(" norfolk") == [{"url": "https://a/rss", "name": None}, {"url": "https://b/atom", "name": "B"}]
+    monkeypatch.setenv("NEWS_FEEDS", "{not json")
+    assert news_feeds.feeds_for("Norfolk") == []
+
+
+def test_merge_keeps_the_first_copy_of_a_url_newest_first():
+    newsapi = [{"url": "u1", "source": "NewsAPI", "publishedAt": "2026-10-16T08:00:00Z"}]
+    feed = [
+        {"url": "u1", "source": "Feed", "publishedAt": "2026-10-16T08:00:00Z"},
+        {"url": "u2", "source": "Feed", "publishedAt": "2026-10-17T08:00:00Z"},
+        {"url": "u3", "source": "Feed", "publishedAt": ""}
+    ]
+    assert [(a["url"], a["source"]) for a in news_feeds.merge(newsapi, feed)] == [
+        ("u2", "Feed"), ("u1", "NewsAPI"), ("u3", "Feed")
+    ]
@@ -0,0 +1,63 @@
+from provider_chain import ProviderChain, ProviderSkipped
+
+
+def provider(name, fetch, enabled=None):
+    return {"name": name, "fetch": fetch, "enabled": enabled}
+
+
+def test_quota_skip_is_not_recorded_as_a_failure():
+    def rate_limited():
+        raise ProviderSkipped("quota exhausted")
+    chain = ProviderChain("test", [provider("limited", rate_limited), provider("backup", lambda: {"ok": True})])
+
+    assert chain.run() == ({"ok": True}, "backup")
+    health = chain.stats()["providers"]["limited"]
+    assert health["skipped"] == 1
+    assert health["failures"] == 0
+    assert health["recent_samples"] == 0
+    # Still first once its bucket refills: a skip leaves no score behind
+    assert [p["name"] for p in chain.ordered()] == ["limited", "backup"]
+
+
+def failing():
+    raise RuntimeError("upstream down")
+
+
+def test_failing_provider_is_demoted():
+    chain = ProviderChain("test", [provider("broken", failing), provider("backup", lambda: {"ok": True})])
+
+    assert chain.run() == ({"ok": True}, "backup")
+    assert chain.stats()["providers"]["broken"]["failures"] == 1
+    assert [p["name"] for p in chain.ordered()] == ["backup", "broken"]
+
+
+def test_unscored_providers_keep_their_configured_position():
+    chain = ProviderChain("test", [provider(name, lambda: None) for name in ("a", "b", "c", "d")])
+    chain.health["a"].record(500, True)
+    chain.health["c"].record(100, True)
+
+    # b has no samples and follows a; d follows c
+    assert [p["name"] for p in chain.ordered()] == ["c", "d", "a", "b"]
+
+
+def test_disabled_provider_is_skipped():
+    chain = ProviderChain("test", [
+        provider("off", lambda: {"ok": "off"}, enabled=lambda: False),
+        provider("on", lambda: {"ok": "on"})
+    ])
+
+    assert chain.run() == ({"ok": "on"}, "on")
+    assert chain.stats()["providers"]["off"]["skipped"] == 1
+    assert chain.stats()["order"] == ["on"]
+
+
+def test_race_falls_through_to_the_rest_when_both_fail():
+    chain = ProviderChain("test", [
+        provider("first", failing),
+        provider("second", lambda: None),
+        provider("third", lambda: {"ok": True})
+    ], mode="race")
+
+    assert chain.run() == ({"ok": True}, "third")
+    assert chain.stats()["providers"]["first"]["failures"] == 1
+    assert chain.stats()["providers"]["second"]["failures"] == 1
@@ -0,0 +1,61 @@
+import quota
+from quota import QuotaLimiter
+
+
+class Clock:
+    """Stands in for the module's time import so the bucket refill is deterministic"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def test_bucket_empties_and_refills(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(quota, "time", clock)
+    monkeypatch.setenv("QUOTA_TESTAPI_PER_MINUTE", "2")
+    limiter = QuotaLimiter()
+
+    assert limiter.acquire("testapi")
+    assert limiter.acquire("testapi")
+    assert not limiter.available("testapi")
+    assert not limiter.acquire("testapi")
+
+    clock.now += 30
+    assert limiter.acquire("testapi")
+    assert not limiter.acquire("testapi")
+    assert limiter.snapshot()["testapi"]["used"] == 3
+
+
+def test_monthly_budget_keeps_a_reserve(monkeypatch):
+    monkeypatch.setenv("QUOTA_TESTAPI_MONTHLY", "20")
+    monkeypatch.setenv("QUOTA_TESTAPI_PER_MINUTE", "0")
+    monkeypatch.setenv("QUOTA_RESERVE_FRACTION", "0.1")
+    limiter = QuotaLimiter()
+
+    for _ in range(18):
+        assert limiter.acquire("testapi")
+    # Into the reserve: callers are steered away, but a direct call may still spend it
+    assert not limiter.available("testapi")
+    assert limiter.acquire("testapi")
+    assert limiter.acquire("testapi")
+    assert not limiter.acquire("testapi")
+    assert limiter.snapshot()["testapi"]["remaining"] == 0
+
+
+def test_usage_is_shared_through_the_state_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("QUOTA_TESTAPI_MONTHLY", "100")
+    path = str(tmp_path / "quota.db")
+    QuotaLimiter(path).acquire("testapi")
+    QuotaLimiter(path).acquire("testapi")
+
+    assert QuotaLimiter(path).snapshot()["testapi"]["used"] == 2
+
+
+def test_unlimited_provider_is_always_available():
+    limiter = QuotaLimiter()
+    assert limiter.available("unknown")
+    assert limiter.acquire("unknown")
+    assert 'cityhub_quota_used{provider="newsapi"} 0' in quota.render_prometheus()
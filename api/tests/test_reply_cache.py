@@ -0,0 +1,38 @@
+import time
+
+import reply_cache
+from reply_cache import ReplyCache, make_key
+
+
+def test_key_ignores_case_and_punctuation_but_not_context():
+    key = make_key("What's on this weekend?", "Norfolk, VA", ["[Weather: 72°F]"])
+    assert make_key("what's on   this weekend", "norfolk, va", ["[Weather: 72°F]"]) == key
+    assert make_key("What's on this weekend?", "Norfolk, VA", ["[Weather: 65°F]"]) != key
+    assert make_key("What's on this weekend?", "Atlanta, GA", ["[Weather: 72°F]"]) != key
+
+
+def test_entries_expire_and_count_hits_and_misses():
+    cache = ReplyCache(max_entries=10, ttl=60)
+    assert cache.get("k") is None
+    cache.set("k", "reply")
+    assert cache.get("k") == "reply"
+    assert cache.stats()["entries"] == [{"key": "k", "hits": 1, "misses": 1}]
+
+    cache._entries["k"]["expires_at"] = time.time() - 1
+    assert cache.get("k") is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ReplyCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_cache_is_off_unless_enabled(monkeypatch):
+    monkeypatch.delenv("AGENT_REPLY_CACHE", raising=False)
+    assert reply_cache.get_cache() is None
@@ -0,0 +1,63 @@
+import time
+
+import session_store
+from session_store import InMemorySessionStore, SQLiteSessionStore, SUMMARY_PREFIX, trim_history
+
+
+def turn(user, bot="ok"):
+    return [user, bot]
+
+
+def test_history_within_budget_is_unchanged():
+    history = [turn("hi"), turn("what's on tonight?")]
+    assert trim_history(history, token_budget=100) is history
+
+
+def test_older_turns_fold_into_one_summary():
+    long_reply = "b" * 400
+    history = [turn("first question", long_reply), turn("second question", long_reply), turn("latest")]
+    trimmed = trim_history(history, token_budget=60)
+    assert trimmed[-1] == turn("latest")
+    assert trimmed[0][0] is None
+    assert trimmed[0][1].startswith(SUMMARY_PREFIX)
+    assert trimmed[0][1] == SUMMARY_PREFIX + "first question; second question]"
+    assert len(trimmed) == 2
+
+
+def test_last_turn_is_kept_even_over_budget():
+    history = [turn("x" * 400)]
+    assert trim_history(history, token_budget=1) == history
+
+
+def test_previous_summary_is_carried_forward_without_context_blocks():
+    long_reply = "b" * 400
+    once = trim_history([turn("jazz shows?\n\n[Events: ...]", long_reply), turn("latest")], token_budget=60)
+    twice = trim_history(once + [turn("parking?", long_reply), turn("end")], token_budget=60)
+    assert twice == [[None, SUMMARY_PREFIX + "jazz shows?; latest; parking?]"], turn("end")]
+
+
+def test_memory_store_expires_and_evicts():
+    store = InMemorySessionStore(ttl=60, max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        store.save(session_id, [turn(session_id)])
+    assert store.get("a") is None
+    assert store.get("c") == [turn("c")]
+
+    store._sessions["b"] = (time.time() - 120, [turn("b")])
+    assert store.get("b") is None
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60)
+    store.save("abc", [turn("hello")])
+    assert SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60).get("abc") == [turn("hello")]
+    store.delete("abc")
+    assert store.get("abc") is None
+
+
+def test_save_history_trims_before_storing(monkeypatch):
+    store = InMemorySessionStore()
+    monkeypatch.setattr(session_store, "_store", store)
+    monkeypatch.setenv("SESSION_HISTORY_TOKEN_BUDGET", "10")
+    session_store.save_history("abc", [turn("a" * 100), turn("b" * 100), turn("c")])
+    assert session_store.load_history("abc")[0][0] is None
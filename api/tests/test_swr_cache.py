@@ -0,0 +1,119 @@
+import threading
+
+import swr_cache
+from swr_cache import SWRCache
+
+
+class Clock:
+    """Stands in for the module's time import so only its monotonic() is frozen"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class QueuedExecutor:
+    """Holds background refreshes until the test runs them"""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args):
+        self.pending.append((fn, args))
+
+    def run(self):
+        while self.pending:
+            fn, args = self.pending.pop(0)
+            fn(*args)
+
+
+def cache(monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(swr_cache, "time", clock)
+    executor = QueuedExecutor()
+    monkeypatch.setattr(swr_cache, "_refresh_executor", executor)
+    return SWRCache("test", ttl=60, stale_ttl=300, **kwargs), clock, executor
+
+
+def test_fresh_stale_and_expired(monkeypatch):
+    c, clock, refreshes = cache(monkeypatch)
+    values = iter(["first", "second", "third"])
+    load = lambda: next(values)
+
+    assert c.get_or_load("k", load) == "first"
+    assert c.get_or_load("k", load) == "first"
+
+    # Stale: the old value is served and one refresh replaces it
+    clock.now += 120
+    assert c.get_or_load("k", load) == "first"
+    assert c.get_or_load("k", load) == "first"
+    assert len(refreshes.pending) == 1
+    refreshes.run()
+    assert c.peek("k") == "second"
+
+    # Expired: loaded synchronously
+    clock.now += 400
+    assert c.get_or_load("k", load) == "third"
+    assert c.stats()["loads"] == 3
+    assert c.stats()["stale_hits"] == 2
+
+
+def test_get_never_loads_on_a_miss(monkeypatch):
+    c, _, _ = cache(monkeypatch)
+    assert c.get("k", lambda: "loaded") is None
+    assert c.peek("k") is None
+
+
+def test_concurrent_misses_share_one_load(monkeypatch):
+    c, _, _ = cache(monkeypatch)
+    release = threading.Event()
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(c.get_or_load("k", slow_load))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_failed_load_is_raised_and_not_cached(monkeypatch):
+    c, _, _ = cache(monkeypatch)
+
+    def broken():
+        raise RuntimeError("upstream down")
+
+    try:
+        c.get_or_load("k", broken)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("expected the loader error")
+    assert c.peek("k") is None
+    assert c.stats()["load_errors"] == 1
+
+
+def test_uncacheable_values_and_eviction(monkeypatch):
+    c, _, _ = cache(monkeypatch, max_entries=2, cacheable=lambda value: value != "mock")
+    assert c.get_or_load("mock", lambda: "mock") == "mock"
+    assert c.peek("mock") is None
+
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+    assert c.peek("b") is None
+    assert c.peek("a") == 1 and c.peek("c") == 3
@@ -0,0 +1,78 @@
+import pytest
+
+import quota
+import weather
+from provider_chain import ProviderSkipped
+from swr_cache import SWRCache
+
+
+class FakeRequest:
+    def __init__(self, params=None, body=None):
+        self.params = params or {}
+        self.headers = {}
+        self._body = body
+
+    def get_json(self):
+        if self._body is None:
+            raise ValueError("no body")
+        return self._body
+
+
+def test_quota_refusal_skips_the_provider(monkeypatch):
+    monkeypatch.setenv("WEATHERAPI_KEY", "test-key")
+    monkeypatch.setattr(quota, "acquire", lambda provider: False)
+    with pytest.raises(ProviderSkipped):
+        weather.fetch_from_weatherapi("Norfolk", "VA")
+
+
+def test_batch_locations_from_query_and_body():
+    req = FakeRequest(
+        {"cities": "Norfolk, VA;Atlanta", "coords": "36.85,-76.29"},
+        {"locations": [{"city": "Seattle", "state": "WA"}, "bogus"]}
+    )
+    assert weather.parse_batch_locations(req) == [
+        {"city": "Norfolk", "state": "VA"},
+        {"city": "Atlanta", "state": ""},
+        {"lat": "36.85", "lon": "-76.29"},
+        {"city": "Seattle", "state": "WA"}
+    ]
+    assert weather.parse_batch_locations(FakeRequest({"city": "Norfolk"})) is None
+
+
+def test_batch_fetches_misses_and_reports_bad_locations(monkeypatch):
+    monkeypatch.setattr(weather, "_weather_cache", SWRCache("test", ttl=600))
+    monkeypatch.setattr(weather.forecast_store, "current_conditions", lambda *args: None)
+    fetched = []
+
+    def fake_fetch(city, state, lat=None, lon=None):
+        fetched.append(city)
+        if city == "Nowhere":
+            raise RuntimeError("no provider answered")
+        return {"location": city, "temperature": 70}
+    monkeypatch.setattr(weather, "fetch_weather", fake_fetch)
+    weather.get_weather("Norfolk", "VA")
+
+    batch = weather.get_weather_batch([
+        {"city": "Norfolk", "state": "VA"},
+        {"city": "Atlanta", "state": "GA"},
+        {"lat": "abc", "lon": None},
+        {"city": "Nowhere"}
+    ])
+
+    assert batch["count"] == 4 and batch["errors"] == 2
+    norfolk, atlanta, invalid, nowhere = batch["results"]
+    assert norfolk["cached"] is True and norfolk["weather"]["location"] == "Norfolk"
+    assert atlanta["cached"] is False and atlanta["weather"]["location"] == "Atlanta"
+    assert "lat/lon" in invalid["error"]
+    assert nowhere["error"] == "no provider answered"
+    assert sorted(fetched) == ["Atlanta", "Norfolk", "Nowhere"]
+
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setenv("WEATHER_BATCH_MAX_LOCATIONS", "1")
+    monkeypatch.setattr(weather, "get_weather", lambda *args: {"temperature": 70})
+    monkeypatch.setattr(weather, "_weather_cache", SWRCache("test", ttl=600))
+
+    batch = weather.get_weather_batch([{"city": "Norfolk"}, {"city": "Atlanta"}])
+    assert "weather" in batch["results"][0]
+    assert batch["results"][1]["error"] == "Batch limited to 1 locations"
@@ -2,266 +2,86 @@ import os
 import requests
 import json
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import geo
+import geocode_cache
+import http_cache
+import forecast_store
+import quota
+from provider_chain import ProviderChain, ProviderSkipped
+from swr_cache import SWRCache
+from env_config import env_int
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Weather cache: a handful of markets are polled by every browser and by the agent,
+# so readings are shared per ~5 km geohash cell (or per city/state when no coordinates).
+#   WEATHER_CACHE_TTL_SECONDS    - how long a reading is fresh (default 600)
+#   WEATHER_CACHE_STALE_SECONDS  - how long past the TTL it may be served while refreshing (default 3600)
+#   WEATHER_GEOHASH_PRECISION    - geohash length used for coordinate keys (default 5)
+# Mock data is never cached.
+_weather_cache = SWRCache(
+    "weather",
+    ttl=env_int("WEATHER_CACHE_TTL_SECONDS", 600),
+    stale_ttl=env_int("WEATHER_CACHE_STALE_SECONDS", 3600),
+    cacheable=lambda data: bool(data) and not data.get("_is_mock")
+)
+
+# Upstream calls per provider since the process started
+PROVIDER_CALLS = Counter()
+
 def main(req):
     """
     Azure Function for fetching weather data.
     Uses WeatherAPI.com (primary) with fallback to Azure Maps Weather API and OpenWeatherMap.
+    Batch mode: ?cities=Norfolk,VA;Atlanta,GA and/or ?coords=36.85,-76.29;33.75,-84.39,
+    or POST {"locations": [{"city": ..., "state": ...}, {"lat": ..., "lon": ...}]}.
     """
     try:
+        # Batch mode: several cities/coordinates in one call
+        locations = parse_batch_locations(req)
+        if locations is not None:
+            batch = get_weather_batch(locations, req.params.get("concurrency"))
+            return http_cache.json_response(
+                req,
+                batch,
+                "weather",
+                {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+                    "Access-Control-Allow-Headers": "Content-Type"
+                },
+                fallback=any(result.get("error") or result["weather"].get("_is_mock") for result in batch["results"]),
+                etag_ignore=("timestamp", "cached")
+            )
+        
         # Get query parameters - support both city/state and direct coordinates
         city = req.params.get("city") or "Norfolk"
         state = req.params.get("state") or ""
         lat = req.params.get("lat")
         lon = req.params.get("lon")
         
-        # Get API keys - prioritize WeatherAPI.com if configured
-        # WeatherAPI.com - Free tier: 1 million calls/month
-        # Get API key from: https://www.weatherapi.com/
-        weatherapi_key = os.environ.get("WEATHERAPI_KEY")
-        
-        # Azure Maps key (fallback)
-        azure_maps_key = os.environ.get("AZURE_MAPS_KEY")
-        
-        # OpenWeatherMap (fallback)
-        openweather_api_key = os.environ.get("OPENWEATHER_API_KEY")
-        
-        weather_data = None
-        
-        # Priority 1: Try WeatherAPI.com first (if key is configured)
-        if weatherapi_key:
-            try:
-                # WeatherAPI.com - Use coordinates if provided, otherwise use city/state
-                url = "https://api.weatherapi.com/v1/current.json"
-                params = {
-                    "key": weatherapi_key,
-                    "aqi": "no"
-                }
-                
-                # If coordinates are provided, use them (most accurate)
-                if lat and lon:
-                    try:
-                        lat_float = float(lat)
-                        lon_float = float(lon)
-                        params["q"] = f"{lat_float},{lon_float}"
-                        logger.info(f"Fetching weather from WeatherAPI.com using coordinates: {lat_float}, {lon_float}")
-                    except ValueError:
-                        logger.warning(f"Invalid coordinates provided: lat={lat}, lon={lon}, using city/state instead")
-                        params["q"] = f"{city},{state}" if state else city
-                        logger.info(f"Fetching weather from WeatherAPI.com for {params['q']}")
-                else:
-                    # Use city/state for geocoding
-                    params["q"] = f"{city},{state}" if state else city
-                    logger.info(f"Fetching weather from WeatherAPI.com for {params['q']}")
-                
-                response = requests.get(url, params=params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Convert WeatherAPI format to our format
-                weather_data = {
-                    "temperature": round(data["current"]["temp_f"]),
-                    "feels_like": round(data["current"]["feelslike_f"]),
-                    "description": data["current"]["condition"]["text"],
-                    "icon": data["current"]["condition"]["icon"],
-                    "humidity": data["current"]["humidity"],
-                    "wind_speed": round(data["current"]["wind_mph"]),
-                    "city": data["location"]["name"],
-                    "state": data["location"].get("region", state),
-                    "country": data["location"]["country"],
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                logger.info(f"Successfully fetched weather from WeatherAPI.com: {weather_data['temperature']}°F, {weather_data['description']}")
-                
-            except requests.exceptions.HTTPError as e:
-                error_text = e.response.text if hasattr(e, 'response') else str(e)
-                logger.error(f"WeatherAPI.com HTTP error: {e.response.status_code} - {error_text}")
-                weather_data = None
-            except requests.exceptions.RequestException as e:
-                logger.error(f"WeatherAPI.com request error: {str(e)}")
-                weather_data = None
-            except (KeyError, IndexError) as e:
-                logger.error(f"WeatherAPI.com data parsing error: {str(e)}")
-                weather_data = None
-        
-        # Priority 2: Try Azure Maps Weather API (if WeatherAPI.com failed or not configured)
-        if azure_maps_key:
-            logger.info(f"Azure Maps key found, attempting to fetch weather")
-            try:
-                # If coordinates are provided directly, use them (from user's geolocation)
-                if lat and lon:
-                    try:
-                        lat_float = float(lat)
-                        lon_float = float(lon)
-                        logger.info(f"Using provided coordinates: {lat_float}, {lon_float}")
-                        use_coords = True
-                    except ValueError:
-                        logger.warning(f"Invalid coordinates provided: {lat}, {lon}")
-                        use_coords = False
-                else:
-                    use_coords = False
-                
-                # If no coordinates, geocode the city name to get coordinates
-                if not use_coords:
-                    logger.info(f"Geocoding {city}, {state} with Azure Maps")
-                    geocode_url = "https://atlas.microsoft.com/search/address/json"
-                    geocode_params = {
-                        "api-version": "1.0",
-                        "subscription-key": azure_maps_key,
-                        "query": f"{city}, {state}, US" if state else f"{city}, US"
-                    }
-                    
-                    geocode_response = requests.get(geocode_url, params=geocode_params, timeout=10)
-                    geocode_response.raise_for_status()
-                    geocode_data = geocode_response.json()
-                    
-                    logger.info(f"Geocoding response: {json.dumps(geocode_data)[:200]}")
-                    
-                    if geocode_data.get("results") and len(geocode_data["results"]) > 0:
-                        position = geocode_data["results"][0]["position"]
-                        lat_float = position["lat"]
-                        lon_float = position["lon"]
-                        use_coords = True
-                        logger.info(f"Found coordinates from geocoding: {lat_float}, {lon_float}")
-                    else:
-                        logger.warning(f"Azure Maps Geocoding returned no results for {city}, {state}")
-                        use_coords = False
-                
-                # Get weather using coordinates
-                if use_coords:
-                    weather_url = "https://atlas.microsoft.com/weather/currentConditions/json"
-                    weather_params = {
-                        "api-version": "1.1",
-                        "subscription-key": azure_maps_key,
-                        "query": f"{lat_float},{lon_float}"
-                    }
-                    
-                    logger.info(f"Fetching weather from Azure Maps for coordinates {lat_float},{lon_float}")
-                    weather_response = requests.get(weather_url, params=weather_params, timeout=10)
-                    weather_response.raise_for_status()
-                    weather_result = weather_response.json()
-                    
-                    logger.info(f"Weather API response received")
-                    
-                    if weather_result.get("results") and len(weather_result["results"]) > 0:
-                        current = weather_result["results"][0]
-                        
-                        # Convert Azure Maps Weather format to our format
-                        # Temperature is in Celsius, convert to Fahrenheit
-                        temp_c = current["temperature"]["value"]
-                        temp_f = round(temp_c * 9/5 + 32)
-                        
-                        # RealFeel temperature (if available)
-                        realfeel_c = current.get("realFeelTemperature", {}).get("value", temp_c)
-                        realfeel_f = round(realfeel_c * 9/5 + 32)
-                        
-                        # Wind speed (convert from m/s to mph)
-                        wind_mps = current.get("wind", {}).get("speed", {}).get("value", 0)
-                        wind_mph = round(wind_mps * 2.237)
-                        
-                        weather_data = {
-                            "temperature": temp_f,
-                            "feels_like": realfeel_f,
-                            "description": current["phrase"],
-                            "icon": None,  # Azure Maps doesn't provide icon codes like OpenWeatherMap
-                            "humidity": current.get("relativeHumidity", 0),
-                            "wind_speed": wind_mph,
-                            "city": city,
-                            "state": state,
-                            "country": "US",
-                            "timestamp": datetime.now().isoformat()
-                        }
-                        
-                        logger.info(f"Successfully fetched weather from Azure Maps: {temp_f}°F, {current['phrase']}")
-                    else:
-                        logger.warning("Azure Maps Weather API returned no results")
-                        weather_data = None
-                else:
-                    weather_data = None
-                        
-            except requests.exceptions.HTTPError as e:
-                error_text = e.response.text if hasattr(e, 'response') else str(e)
-                logger.error(f"Azure Maps HTTP error: {e.response.status_code} - {error_text}")
-                weather_data = None
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Azure Maps request error: {str(e)}")
-                weather_data = None
-            except (KeyError, IndexError) as e:
-                logger.error(f"Azure Maps Weather data parsing error: {str(e)}")
-                weather_data = None
-        else:
-            logger.warning("AZURE_MAPS_KEY not found in environment variables")
-        
-        # Fallback to OpenWeatherMap if Azure Maps failed or not configured
-        if not weather_data and openweather_api_key:
-            try:
-                # OpenWeatherMap API
-                # Format: "City, State, Country" or just "City, Country"
-                query = f"{city},{state},US" if state else f"{city},US"
-                url = "https://api.openweathermap.org/data/2.5/weather"
-                params = {
-                    "q": query,
-                    "appid": openweather_api_key,
-                    "units": "imperial"  # Fahrenheit
-                }
-                
-                logger.info(f"Fetching weather from OpenWeatherMap for {query}")
-                response = requests.get(url, params=params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Convert OpenWeatherMap format to our format
-                weather_data = {
-                    "temperature": round(data["main"]["temp"]),
-                    "feels_like": round(data["main"]["feels_like"]),
-                    "description": data["weather"][0]["description"].title(),
-                    "icon": data["weather"][0]["icon"],
-                    "humidity": data["main"]["humidity"],
-                    "wind_speed": round(data["wind"].get("speed", 0)),
-                    "city": data["name"],
-                    "country": data["sys"].get("country", "US"),
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"OpenWeatherMap error: {str(e)}, trying WeatherAPI")
-                weather_data = None
-        
-        
-        # If no API keys or all failed, return mock data with error info
-        if not weather_data:
-            logger.error(f"CRITICAL: No weather data available for {city}, {state}. All APIs failed or not configured.")
-            logger.error(f"WeatherAPI Key present: {bool(weatherapi_key)}")
-            logger.error(f"Azure Maps Key present: {bool(azure_maps_key)}")
-            logger.error(f"OpenWeather Key present: {bool(openweather_api_key)}")
-            logger.error(f"Coordinates provided: lat={lat}, lon={lon}")
-            
-            # If WeatherAPI key is set but failed, provide specific guidance
-            if weatherapi_key:
-                logger.error("WeatherAPI.com key is configured but API call failed. Check:")
-                logger.error("  1. Key is correct (starts with your API key from weatherapi.com)")
-                logger.error("  2. Key has not expired")
-                logger.error("  3. API quota has not been exceeded")
-            weather_data = get_mock_weather(city, state)
-            # Add a flag to indicate this is mock data
-            weather_data["_is_mock"] = True
-            weather_data["_error"] = "All weather APIs failed or not configured. Using mock data."
+        weather_data = get_weather(city, state, lat, lon)
         
-        return {
-            "statusCode": 200,
-            "headers": {
+        # ETag ignores the reading's timestamp so unchanged conditions revalidate as 304
+        return http_cache.json_response(
+            req,
+            weather_data,
+            "weather",
+            {
                 "Content-Type": "application/json",
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Methods": "GET, OPTIONS",
                 "Access-Control-Allow-Headers": "Content-Type"
             },
-            "body": json.dumps(weather_data)
-        }, 200
+            fallback=bool(weather_data.get("_is_mock")),
+            etag_ignore=("timestamp",)
+        )
         
     except Exception as e:
         logger.error(f"Weather error: {str(e)}", exc_info=True)
@@ -274,6 +94,405 @@ def main(req):
             "body": json.dumps({"error": str(e)})
         }, 500
 
+def get_weather(city: str = "Norfolk", state: str = "", lat=None, lon=None):
+    """
+    Get current weather for a city (or coordinates) as a plain dict.
+    Shared by the HTTP handler below and by the agent, which calls it in-process.
+    Markets with a fresh prefetched hourly forecast are answered from forecast_store
+    without an upstream call. Everything else is served from the weather cache
+    (keyed by geohash or normalized city/state); stale entries are returned while
+    one background refresh runs.
+    """
+    forecast = forecast_store.current_conditions(city, state, lat, lon)
+    if forecast:
+        return forecast
+    key = _cache_key(city, state, lat, lon)
+    return dict(_weather_cache.get_or_load(key, lambda: fetch_weather(city, state, lat, lon)))
+
+def _cache_key(city: str, state: str, lat=None, lon=None):
+    """Geohash cell for coordinates, otherwise the normalized city/state"""
+    coords = geo.parse_coordinates(lat, lon)
+    if coords:
+        return "gh:" + geo.geohash(coords[0], coords[1], env_int("WEATHER_GEOHASH_PRECISION", 5))
+    return f"city:{(city or '').strip().lower()}|{(state or '').strip().lower()}"
+
+def parse_batch_locations(req):
+    """
+    Locations for batch mode as a list of {"city", "state", "lat", "lon"} dicts,
+    or None when the request is a single-city request.
+    """
+    locations = []
+    for item in (req.params.get("cities") or "").split(";"):
+        if item.strip():
+            parts = [part.strip() for part in item.split(",")]
+            locations.append({"city": parts[0], "state": parts[1] if len(parts) > 1 else ""})
+    for item in (req.params.get("coords") or "").split(";"):
+        if item.strip():
+            parts = [part.strip() for part in item.split(",")]
+            locations.append({"lat": parts[0], "lon": parts[1] if len(parts) > 1 else None})
+
+    try:
+        body = req.get_json() or {}
+    except ValueError:
+        body = {}
+    if isinstance(body, dict) and isinstance(body.get("locations"), list):
+        locations.extend(item for item in body["locations"] if isinstance(item, dict))
+
+    if not locations and not req.params.get("cities") and not req.params.get("coords") and "locations" not in body:
+        return None
+    return locations
+
+def get_weather_batch(locations, concurrency=None):
+    """
+    Weather for several locations in one call.
+    Cached readings are answered directly; misses are fetched concurrently with at
+    most WEATHER_BATCH_CONCURRENCY (or the requested concurrency) in flight.
+    A failing location gets an "error" entry instead of failing the whole batch.
+    """
+    max_locations = env_int("WEATHER_BATCH_MAX_LOCATIONS", 25)
+    max_concurrency = env_int("WEATHER_BATCH_CONCURRENCY", 4)
+    try:
+        max_concurrency = max(1, min(int(concurrency), max_concurrency)) if concurrency else max_concurrency
+    except ValueError:
+        pass
+
+    results = [None] * len(locations)
+    misses = []
+    for index, location in enumerate(locations):
+        if index >= max_locations:
+            results[index] = {"query": location, "error": f"Batch limited to {max_locations} locations"}
+            continue
+        city = location.get("city") or ""
+        state = location.get("state") or ""
+        lat = location.get("lat")
+        lon = location.get("lon")
+        if not city and not geo.parse_coordinates(lat, lon):
+            results[index] = {"query": location, "error": "Each location needs a city or valid lat/lon"}
+            continue
+        key = _cache_key(city, state, lat, lon)
+        cached = _weather_cache.get(key, lambda city=city, state=state, lat=lat, lon=lon: fetch_weather(city, state, lat, lon))
+        if cached is not None:
+            results[index] = {"query": location, "weather": dict(cached), "cached": True}
+        else:
+            misses.append(index)
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(misses))) as executor:
+            futures = {}
+            for index in misses:
+                location = locations[index]
+                futures[index] = executor.submit(
+                    get_weather,
+                    location.get("city") or "",
+                    location.get("state") or "",
+                    location.get("lat"),
+                    location.get("lon")
+                )
+            for index, future in futures.items():
+                try:
+                    results[index] = {"query": locations[index], "weather": future.result(), "cached": False}
+                except Exception as e:
+                    logger.warning(f"Batch weather failed for {locations[index]}: {str(e)}")
+                    results[index] = {"query": locations[index], "error": str(e)}
+
+    return {
+        "results": results,
+        "count": len(results),
+        "errors": sum(1 for result in results if "error" in result)
+    }
+
+def cache_stats():
+    """Weather cache hit rate, upstream provider call counts and provider health"""
+    return {
+        "cache": _weather_cache.stats(),
+        "provider_calls": dict(PROVIDER_CALLS),
+        "providers": _provider_chain.stats(),
+        "forecast_store": forecast_store.get_stats()
+    }
+
+def fetch_weather(city: str = "Norfolk", state: str = "", lat=None, lon=None):
+    """
+    Fetch current weather from the upstream providers (no caching).
+    Providers run through an adaptive chain: WeatherAPI.com, Azure Maps and
+    OpenWeatherMap by default, stopping at the first success (or racing the top
+    two when WEATHER_PROVIDER_MODE=race), reordered by rolling latency/error rate.
+    Falls back to mock data (flagged with "_is_mock") when every provider fails.
+    """
+    weatherapi_key = os.environ.get("WEATHERAPI_KEY")
+    azure_maps_key = os.environ.get("AZURE_MAPS_KEY")
+    openweather_api_key = os.environ.get("OPENWEATHER_API_KEY")
+
+    weather_data, provider = _provider_chain.run(city, state, lat, lon)
+    if weather_data:
+        logger.info(f"Weather for {city}, {state} served by {provider}")
+
+    # If no API keys or all failed, return mock data with error info
+    if not weather_data:
+        logger.error(f"CRITICAL: No weather data available for {city}, {state}. All APIs failed or not configured.")
+        logger.error(f"WeatherAPI Key present: {bool(weatherapi_key)}")
+        logger.error(f"Azure Maps Key present: {bool(azure_maps_key)}")
+        logger.error(f"OpenWeather Key present: {bool(openweather_api_key)}")
+        logger.error(f"Coordinates provided: lat={lat}, lon={lon}")
+
+        # If WeatherAPI key is set but failed, provide specific guidance
+        if weatherapi_key:
+            logger.error("WeatherAPI.com key is configured but API call failed. Check:")
+            logger.error("  1. Key is correct (starts with your API key from weatherapi.com)")
+            logger.error("  2. Key has not expired")
+            logger.error("  3. API quota has not been exceeded")
+        weather_data = get_mock_weather(city, state)
+        # Add a flag to indicate this is mock data
+        weather_data["_is_mock"] = True
+        weather_data["_error"] = "All weather APIs failed or not configured. Using mock data."
+    
+    return weather_data
+
+def fetch_from_weatherapi(city: str, state: str, lat=None, lon=None):
+    """
+    WeatherAPI.com current conditions (primary)
+    WeatherAPI.com - Free tier: 1 million calls/month
+    Get API key from: https://www.weatherapi.com/
+    """
+    weatherapi_key = os.environ.get("WEATHERAPI_KEY")
+    weather_data = None
+    try:
+        # WeatherAPI.com - Use coordinates if provided, otherwise use city/state
+        url = "https://api.weatherapi.com/v1/current.json"
+        params = {
+            "key": weatherapi_key,
+            "aqi": "no"
+        }
+
+        # If coordinates are provided, use them (most accurate)
+        if lat and lon:
+            try:
+                lat_float = float(lat)
+                lon_float = float(lon)
+                params["q"] = f"{lat_float},{lon_float}"
+                logger.info(f"Fetching weather from WeatherAPI.com using coordinates: {lat_float}, {lon_float}")
+            except ValueError:
+                logger.warning(f"Invalid coordinates provided: lat={lat}, lon={lon}, using city/state instead")
+                params["q"] = f"{city},{state}" if state else city
+                logger.info(f"Fetching weather from WeatherAPI.com for {params['q']}")
+        else:
+            # Use city/state for geocoding
+            params["q"] = f"{city},{state}" if state else city
+            logger.info(f"Fetching weather from WeatherAPI.com for {params['q']}")
+
+        if not quota.acquire("weatherapi"):
+            raise ProviderSkipped("weatherapi quota exhausted")
+        PROVIDER_CALLS["weatherapi"] += 1
+        response = requests.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+
+        # Convert WeatherAPI format to our format
+        weather_data = {
+            "temperature": round(data["current"]["temp_f"]),
+            "feels_like": round(data["current"]["feelslike_f"]),
+            "description": data["current"]["condition"]["text"],
+            "icon": data["current"]["condition"]["icon"],
+            "humidity": data["current"]["humidity"],
+            "wind_speed": round(data["current"]["wind_mph"]),
+            "city": data["location"]["name"],
+            "state": data["location"].get("region", state),
+            "country": data["location"]["country"],
+            "timestamp": datetime.now().isoformat()
+        }
+
+        logger.info(f"Successfully fetched weather from WeatherAPI.com: {weather_data['temperature']}°F, {weather_data['description']}")
+
+    except requests.exceptions.HTTPError as e:
+        error_text = e.response.text if hasattr(e, 'response') else str(e)
+        logger.error(f"WeatherAPI.com HTTP error: {e.response.status_code} - {error_text}")
+        weather_data = None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"WeatherAPI.com request error: {str(e)}")
+        weather_data = None
+    except (KeyError, IndexError) as e:
+        logger.error(f"WeatherAPI.com data parsing error: {str(e)}")
+        weather_data = None
+    return weather_data
+
+def fetch_from_azure_maps(city: str, state: str, lat=None, lon=None):
+    """Azure Maps Weather current conditions (geocoding the city when no coordinates are given)"""
+    azure_maps_key = os.environ.get("AZURE_MAPS_KEY")
+    weather_data = None
+    try:
+        # If coordinates are provided directly, use them (from user's geolocation)
+        if lat and lon:
+            try:
+                lat_float = float(lat)
+                lon_float = float(lon)
+                logger.info(f"Using provided coordinates: {lat_float}, {lon_float}")
+                use_coords = True
+            except ValueError:
+                logger.warning(f"Invalid coordinates provided: {lat}, {lon}")
+                use_coords = False
+        else:
+            use_coords = False
+
+        # If no coordinates, use the persistent geocode cache (pre-seeded with our markets)
+        if not use_coords:
+            cached_coords = geocode_cache.lookup(city, state)
+            if cached_coords:
+                lat_float, lon_float = cached_coords
+                use_coords = True
+                logger.info(f"Using cached coordinates for {city}, {state}: {lat_float}, {lon_float}")
+
+        # Otherwise geocode the city name to get coordinates
+        if not use_coords:
+            logger.info(f"Geocoding {city}, {state} with Azure Maps")
+            geocode_url = "https://atlas.microsoft.com/search/address/json"
+            geocode_params = {
+                "api-version": "1.0",
+                "subscription-key": azure_maps_key,
+                "query": f"{city}, {state}, US" if state else f"{city}, US"
+            }
+
+            if not quota.acquire("azure_maps"):
+                raise ProviderSkipped("azure_maps quota exhausted")
+            PROVIDER_CALLS["azure_maps_geocode"] += 1
+            geocode_response = requests.get(geocode_url, params=geocode_params, timeout=10)
+            geocode_response.raise_for_status()
+            geocode_data = geocode_response.json()
+
+            logger.info(f"Geocoding response: {json.dumps(geocode_data)[:200]}")
+
+            if geocode_data.get("results") and len(geocode_data["results"]) > 0:
+                position = geocode_data["results"][0]["position"]
+                lat_float = position["lat"]
+                lon_float = position["lon"]
+                use_coords = True
+                logger.info(f"Found coordinates from geocoding: {lat_float}, {lon_float}")
+                geocode_cache.store(city, state, lat_float, lon_float)
+            else:
+                logger.warning(f"Azure Maps Geocoding returned no results for {city}, {state}")
+                use_coords = False
+
+        # Get weather using coordinates
+        if use_coords:
+            weather_url = "https://atlas.microsoft.com/weather/currentConditions/json"
+            weather_params = {
+                "api-version": "1.1",
+                "subscription-key": azure_maps_key,
+                "query": f"{lat_float},{lon_float}"
+            }
+
+            logger.info(f"Fetching weather from Azure Maps for coordinates {lat_float},{lon_float}")
+            if not quota.acquire("azure_maps"):
+                raise ProviderSkipped("azure_maps quota exhausted")
+            PROVIDER_CALLS["azure_maps"] += 1
+            weather_response = requests.get(weather_url, params=weather_params, timeout=10)
+            weather_response.raise_for_status()
+            weather_result = weather_response.json()
+
+            logger.info(f"Weather API response received")
+
+            if weather_result.get("results") and len(weather_result["results"]) > 0:
+                current = weather_result["results"][0]
+
+                # Convert Azure Maps Weather format to our format
+                # Temperature is in Celsius, convert to Fahrenheit
+                temp_c = current["temperature"]["value"]
+                temp_f = round(temp_c * 9/5 + 32)
+
+                # RealFeel temperature (if available)
+                realfeel_c = current.get("realFeelTemperature", {}).get("value", temp_c)
+                realfeel_f = round(realfeel_c * 9/5 + 32)
+
+                # Wind speed (convert from m/s to mph)
+                wind_mps = current.get("wind", {}).get("speed", {}).get("value", 0)
+                wind_mph = round(wind_mps * 2.237)
+
+                weather_data = {
+                    "temperature": temp_f,
+                    "feels_like": realfeel_f,
+                    "description": current["phrase"],
+                    "icon": None,  # Azure Maps doesn't provide icon codes like OpenWeatherMap
+                    "humidity": current.get("relativeHumidity", 0),
+                    "wind_speed": wind_mph,
+                    "city": city,
+                    "state": state,
+                    "country": "US",
+                    "timestamp": datetime.now().isoformat()
+                }
+
+                logger.info(f"Successfully fetched weather from Azure Maps: {temp_f}°F, {current['phrase']}")
+            else:
+                logger.warning("Azure Maps Weather API returned no results")
+                weather_data = None
+        else:
+            weather_data = None
+
+    except requests.exceptions.HTTPError as e:
+        error_text = e.response.text if hasattr(e, 'response') else str(e)
+        logger.error(f"Azure Maps HTTP error: {e.response.status_code} - {error_text}")
+        weather_data = None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Azure Maps request error: {str(e)}")
+        weather_data = None
+    except (KeyError, IndexError) as e:
+        logger.error(f"Azure Maps Weather data parsing error: {str(e)}")
+        weather_data = None
+    return weather_data
+
+def fetch_from_openweathermap(city: str, state: str, lat=None, lon=None):
+    """OpenWeatherMap current weather"""
+    openweather_api_key = os.environ.get("OPENWEATHER_API_KEY")
+    weather_data = None
+    try:
+        # OpenWeatherMap API
+        # Format: "City, State, Country" or just "City, Country"
+        query = f"{city},{state},US" if state else f"{city},US"
+        url = "https://api.openweathermap.org/data/2.5/weather"
+        params = {
+            "q": query,
+            "appid": openweather_api_key,
+            "units": "imperial"  # Fahrenheit
+        }
+
+        logger.info(f"Fetching weather from OpenWeatherMap for {query}")
+        if not quota.acquire("openweathermap"):
+            raise ProviderSkipped("openweathermap quota exhausted")
+        PROVIDER_CALLS["openweathermap"] += 1
+        response = requests.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+
+        # Convert OpenWeatherMap format to our format
+        weather_data = {
+            "temperature": round(data["main"]["temp"]),
+            "feels_like": round(data["main"]["feels_like"]),
+            "description": data["weather"][0]["description"].title(),
+            "icon": data["weather"][0]["icon"],
+            "humidity": data["main"]["humidity"],
+            "wind_speed": round(data["wind"].get("speed", 0)),
+            "city": data["name"],
+            "country": data["sys"].get("country", "US"),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"OpenWeatherMap error: {str(e)}")
+        weather_data = None
+    except (KeyError, IndexError) as e:
+        logger.error(f"OpenWeatherMap data parsing error: {str(e)}")
+        weather_data = None
+    return weather_data
+
+# Provider chain in default priority order; a provider is skipped when its key is not configured
+# or when its quota (see quota.py) is exhausted or into its reserve
+_provider_chain = ProviderChain(
+    "weather",
+    [
+        {"name": "weatherapi", "fetch": fetch_from_weatherapi, "enabled": lambda: bool(os.environ.get("WEATHERAPI_KEY")) and quota.available("weatherapi")},
+        {"name": "azure_maps", "fetch": fetch_from_azure_maps, "enabled": lambda: bool(os.environ.get("AZURE_MAPS_KEY")) and quota.available("azure_maps")},
+        {"name": "openweathermap", "fetch": fetch_from_openweathermap, "enabled": lambda: bool(os.environ.get("OPENWEATHER_API_KEY")) and quota.available("openweathermap")},
+    ],
+    mode=os.environ.get("WEATHER_PROVIDER_MODE", "sequential")
+)
+
 def get_mock_weather(city: str, state: str = ""):
     """Generate mock weather data for development"""
     # Simple mock data based on city (for testing)
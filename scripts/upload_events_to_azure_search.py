@@ -11,6 +11,27 @@ from azure.search.documents import SearchClient
 from azure.core.credentials import AzureKeyCredential
 from datetime import datetime
 
+# Market coordinates live with the API functions
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from markets import MARKETS
+
+def add_geo_point(event):
+    """
+    Set the event's location_geo (Edm.GeographyPoint, GeoJSON) from its lat/lon fields,
+    falling back to its market's coordinates. Returns False if no coordinates are known.
+    """
+    lat = event.pop('lat', None)
+    lon = event.pop('lon', None)
+    if lat is None or lon is None:
+        city = (event.get('city') or '').lower()
+        state = (event.get('state') or '').lower()
+        market = next((m for m in MARKETS if m['city'].lower() == city and m['state'].lower() == state), None)
+        if not market:
+            return False
+        lat, lon = market['lat'], market['lon']
+    event['location_geo'] = {"type": "Point", "coordinates": [float(lon), float(lat)]}
+    return True
+
 def upload_events(events_file, endpoint, key, index_name):
     """Upload events from JSON file to Azure Search"""
     
@@ -45,6 +66,10 @@ def upload_events(events_file, endpoint, key, index_name):
                 print(f"Warning: Invalid date format for event {event.get('id')}: {event.get('date')}")
                 continue
         
+        # Add a geo point so "events near me" (geo.distance) can find the event
+        if not event.get('location_geo') and not add_geo_point(event):
+            print(f"Warning: No coordinates for event {event.get('id')} ({event.get('city')}, {event.get('state')}), it will not match radius queries")
+        
         validated_events.append(event)
     
     print(f"Validated {len(validated_events)} events")